@@ -1,8 +1,92 @@
-from flask import Flask, request, render_template
+import io
+import json
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import pandas as pd
+from flask import (
+    Flask,
+    Response,
+    g,
+    jsonify,
+    request,
+    render_template,
+    stream_with_context,
+)
+from src.logger import dropped_records
+from src.metrics import REGISTRY, Counter, Gauge, Histogram, metrics_enabled, timed
+from src.pipeline.micro_batcher import MicroBatcher, MicroBatcherConfig
 from src.pipeline.prediction_pipeline import CustomData, PredictionPipeline
 
 app = Flask(__name__)
 
+# Number of predictions written per chunk of a streamed /predict_batch response
+BATCH_STREAM_CHUNK_SIZE = 1000
+
+# Load the model and preprocessor once at startup, every request reuses them
+prediction_pipeline = PredictionPipeline()
+prediction_pipeline.warm_up()
+
+# MICRO_BATCHING=1 coalesces concurrent /predict_data requests into micro-batches
+micro_batcher = None
+if os.environ.get("MICRO_BATCHING") == "1":
+    micro_batcher = MicroBatcher(
+        prediction_pipeline,
+        MicroBatcherConfig(
+            max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", 64)),
+            max_wait_ms=float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", 2.0)),
+            request_timeout=float(os.environ.get("MICRO_BATCH_TIMEOUT_S", 5.0)),
+        ),
+    ).start()
+
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Duration of the HTTP requests, by route and method.",
+        ("route", "method"),
+    )
+)
+REQUESTS = REGISTRY.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests, by route, method and status code.",
+        ("route", "method", "status"),
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "log_records_dropped",
+        "Log records dropped because the log queue was full.",
+        dropped_records,
+    )
+)
+if micro_batcher is not None:
+    REGISTRY.register(
+        Gauge(
+            "micro_batcher_queue_depth",
+            "Records waiting in the micro-batching queue.",
+            micro_batcher.queue_depth,
+        )
+    )
+
+
+@app.before_request
+def start_request_timer():
+    if metrics_enabled():
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get("request_start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, route=route, method=request.method
+        )
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
 
 @app.route("/")
 def index():
@@ -14,23 +98,118 @@ def predict_data():
     if request.method == "GET":
         return render_template("home.html")
     else:
-        data = CustomData(
-            gender=request.form.get("gender"),
-            race_ethnicity=request.form.get("race_ethnicity"),
-            parental_level_of_education=request.form.get("parental_level_of_education"),
-            lunch=request.form.get("lunch"),
-            test_preparation_course=request.form.get("test_preparation_course"),
-            writing_score=int(request.form.get("writing_score")),
-            reading_score=int(request.form.get("reading_score")),
-        )
+        with timed("serving", "parse_form"):
+            data = CustomData(
+                gender=request.form.get("gender"),
+                race_ethnicity=request.form.get("race_ethnicity"),
+                parental_level_of_education=request.form.get(
+                    "parental_level_of_education"
+                ),
+                lunch=request.form.get("lunch"),
+                test_preparation_course=request.form.get("test_preparation_course"),
+                writing_score=int(request.form.get("writing_score")),
+                reading_score=int(request.form.get("reading_score")),
+            )
+        with timed("serving", "build_record"):
+            record = data.get_data_as_dict()
+
+        if micro_batcher is not None:
+            # Includes the wait in the queue, the stages of the batch are timed inside
+            with timed("serving", "micro_batch"):
+                try:
+                    results = micro_batcher.predict(
+                        record, timeout=micro_batcher.batcher_config.request_timeout
+                    )
+                except FutureTimeoutError:
+                    return Response(
+                        "Prediction timed out, try again later",
+                        status=503,
+                        headers={"Retry-After": "1"},
+                    )
+        else:
+            results = prediction_pipeline.predict_record(record)
+        with timed("serving", "render"):
+            return render_template("home.html", results=results)
+
+
+@app.route("/metrics")
+def metrics():
+    # Metrics of this process only: under the prefork server, of the worker that
+    # accepted the scrape (see PreforkServer)
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/micro_batching/stats")
+def micro_batching_stats():
+    if micro_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **micro_batcher.get_stats()})
+
+
+def read_batch_records():
+    """
+    Parse the records of a /predict_batch request.
+
+    Accepts a JSON list of records (or {"records": [...]}), a CSV body (text/csv) or a
+    CSV file uploaded as the "file" form field.
+
+    Returns:
+        pd.DataFrame | list: The records.
+    """
+    if "file" in request.files:
+        return pd.read_csv(request.files["file"])
+    if request.mimetype == "text/csv":
+        return pd.read_csv(io.BytesIO(request.get_data()))
+
+    payload = request.get_json(force=True)
+    if isinstance(payload, dict):
+        payload = payload.get("records", [])
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON list of records")
+    return payload
+
+
+def stream_predictions(df, predictions, output_format):
+    """
+    Yield the predictions chunk by chunk as CSV (input columns + prediction) or JSON.
+    """
+    if output_format == "csv":
+        for start in range(0, len(df), BATCH_STREAM_CHUNK_SIZE):
+            chunk = df.iloc[start : start + BATCH_STREAM_CHUNK_SIZE].assign(
+                predicted_math_score=predictions[
+                    start : start + BATCH_STREAM_CHUNK_SIZE
+                ]
+            )
+            yield chunk.to_csv(index=False, header=start == 0)
+    else:
+        yield '{"predictions": ['
+        for start in range(0, len(predictions), BATCH_STREAM_CHUNK_SIZE):
+            chunk = predictions[start : start + BATCH_STREAM_CHUNK_SIZE]
+            separator = ", " if start else ""
+            yield separator + ", ".join(json.dumps(float(value)) for value in chunk)
+        yield "]}"
+
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    try:
+        records = read_batch_records()
+    except ValueError as e:
+        return jsonify({"errors": [f"Could not parse request body: {e}"]}), 400
+
+    df, errors = prediction_pipeline.validate_batch(records)
+    if errors:
+        return jsonify({"errors": errors}), 400
 
-        pred_df = data.get_data_as_dataframe()
-        print(pred_df)
-        prediction_pipeline = PredictionPipeline()
-        results = prediction_pipeline.predict(pred_df)
-        return render_template("home.html", results=results[0])
+    predictions = prediction_pipeline.predict_batch(df, validate=False)
+    output_format = request.args.get("format", "json")
+    mimetype = "text/csv" if output_format == "csv" else "application/json"
+    return Response(
+        stream_with_context(stream_predictions(df, predictions, output_format)),
+        mimetype=mimetype,
+    )
 
 
 if __name__ == "__main__":
     # by default port = 5000
-    app.run(host="0.0.0.0",port=8000)  # remove debug = true on deployment
+    app.run(host="0.0.0.0", port=8000)  # remove debug = true on deployment
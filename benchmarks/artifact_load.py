@@ -0,0 +1,136 @@
+"""
+Compare loading the serving artifacts from the dill .pkl files and from the artifact bundle.
+
+Every measurement runs in a fresh process, so library imports, load time and resident
+memory are those of a cold server start:
+
+    python -m benchmarks.artifact_load [--artifacts-dir artifacts] [--repeat 5]
+
+Without a published bundle, one is written from the .pkl files to a temporary directory.
+The results are printed as JSON.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ARTIFACT_FILES = {
+    "preprocessor": "preprocessing.pkl",
+    "compiled_preprocessor": "compiled_preprocessing.pkl",
+    "model": "model.pkl",
+    "compiled_model": "compiled_model.pkl",
+}
+
+
+def rss_bytes() -> int:
+    """
+    Returns:
+        int: Resident set size of the current process (Linux), else its peak RSS.
+    """
+    try:
+        with open("/proc/self/statm") as file_obj:
+            return int(file_obj.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(kind, source, repeat, queue):
+    baseline = rss_bytes()
+    start = time.perf_counter()
+    if kind == "dill":
+        from src.utils import load_object
+
+        def load():
+            return {name: load_object(path) for name, path in source.items()}
+
+    else:
+        from src.artifact_bundle import load_bundle_object, read_manifest
+
+        def load():
+            manifest = read_manifest(source)
+            return {
+                name: load_bundle_object(source, name, manifest=manifest)
+                for name in manifest["artifacts"]
+            }
+
+    objects = load()
+    cold_seconds = time.perf_counter() - start
+    rss_delta = rss_bytes() - baseline
+
+    warm_seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        warm_seconds.append(time.perf_counter() - start)
+    queue.put(
+        {
+            "format": kind,
+            "artifacts": sorted(objects),
+            "cold_load_s": cold_seconds,
+            "warm_load_s": min(warm_seconds) if warm_seconds else None,
+            "rss_delta_mb": rss_delta / 1e6,
+        }
+    )
+
+
+def measure(kind, source, repeat) -> dict:
+    """
+    Load the artifacts in a fresh spawned process and return its measurements.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(kind, source, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--artifacts-dir", default="artifacts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from src.artifact_bundle import (
+        ArtifactBundleConfig,
+        current_bundle_dir,
+        write_bundle,
+    )
+    from src.utils import load_object
+
+    pickle_paths = {
+        name: os.path.join(args.artifacts_dir, file_name)
+        for name, file_name in ARTIFACT_FILES.items()
+        if os.path.exists(os.path.join(args.artifacts_dir, file_name))
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bundle_dir = current_bundle_dir(
+            ArtifactBundleConfig(os.path.join(args.artifacts_dir, "bundles"))
+        )
+        if bundle_dir is None:
+            bundle_dir = write_bundle(
+                {name: load_object(path) for name, path in pickle_paths.items()},
+                config=ArtifactBundleConfig(bundle_root=tmp_dir),
+            )
+
+        results = {
+            "pickle_bytes": sum(os.path.getsize(p) for p in pickle_paths.values()),
+            "bundle": bundle_dir,
+            "runs": [
+                measure("dill", pickle_paths, args.repeat),
+                measure("bundle", bundle_dir, args.repeat),
+            ],
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
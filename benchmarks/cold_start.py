@@ -0,0 +1,136 @@
+"""
+Profile the cold start of the serving application: import time and first request.
+
+    python -m benchmarks.cold_start [--module application] [--runs 5] [--top 15]
+        [--output cold_start_results.json]
+
+Run from the project directory (importing the application loads artifacts/). Every run
+is a fresh interpreter started with `python -X importtime` that imports --module, as a
+new Elastic Beanstalk instance or prefork master does, then posts the /predict_data form
+and a one-record /predict_batch to its Flask app with the test client. Reported, as
+medians over --runs:
+
+    import_s               import of the module, artifact warm-up included
+    first_predict_data_s   first /predict_data request
+    first_predict_batch_s  first /predict_batch request (loads a deferred preprocessor)
+
+with the heavy libraries loaded by the import alone and the --top modules by cumulative
+import time, imported by the import or the requests (of the last run). The results are
+printed and written as JSON.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from benchmarks.prefork import FORM
+
+# Libraries whose import dominates a cold start, reported when the import loaded them
+HEAVY_PACKAGES = (
+    "sklearn",
+    "scipy",
+    "xgboost",
+    "catboost",
+    "pandas",
+    "pyarrow",
+    "flask",
+    "dill",
+)
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {module} as target
+result = {{"import_s": time.perf_counter() - start}}
+result["loaded"] = [p for p in {heavy!r} if p in sys.modules]
+app = getattr(target, "app", None)
+if app is not None:
+    client = app.test_client()
+    form = {form!r}
+    record = dict(form, writing_score=int(form["writing_score"]),
+                  reading_score=int(form["reading_score"]))
+    for key, path, kwargs in (
+        ("first_predict_data_s", "/predict_data", {{"data": form}}),
+        ("first_predict_batch_s", "/predict_batch", {{"json": [record]}}),
+    ):
+        start = time.perf_counter()
+        response = client.post(path, **kwargs)
+        response.get_data()
+        result[key] = time.perf_counter() - start
+        result[key.replace("_s", "_status")] = response.status_code
+print(json.dumps(result))
+"""
+
+
+def parse_importtime(stderr) -> list:
+    """
+    Parse the `-X importtime` report.
+
+    Returns:
+        list: (module, self us, cumulative us) of the top-level imports, that is the
+            modules imported by the profiled code itself, not by other modules.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # Nested imports are indented by two more spaces per level
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def run_once(module) -> dict:
+    code = CHILD.format(module=module, heavy=HEAVY_PACKAGES, form=FORM)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, sys.path))},
+    )
+    if completed.returncode:
+        raise RuntimeError(f"Profiling {module} failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="application")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", default="cold_start_results.json")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    last = runs[-1]
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        **{
+            key: statistics.median(run[key] for run in runs)
+            for key in ("import_s", "first_predict_data_s", "first_predict_batch_s")
+            if key in last
+        },
+        "status": {
+            key: value for key, value in last.items() if key.endswith("_status")
+        },
+        "heavy_packages_loaded": last["loaded"],
+        "top_imports_ms": {
+            name: round(cumulative_us / 1000, 1)
+            for name, _, cumulative_us in sorted(
+                last["imports"], key=lambda item: item[2], reverse=True
+            )[: args.top]
+        },
+    }
+    with open(args.output, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Load the HTTP application with concurrent clients and report throughput, latency
+percentiles and error rates.
+
+    python -m benchmarks.load_test [--concurrency 8] [--duration 30] [--warmup 5]
+        [--mix predict_data=9,predict_batch=1] [--batch-size 100]
+        [--workers 2] [--port 8100] [--url http://host:port]
+        [--output load_test_results.json] [--compare previous.json] [--threshold 0.2]
+
+Run from the project directory (the server loads artifacts/). Unless --url points to a
+running server, `python -m src.pipeline.prefork_server` is started with --workers
+workers on --port and stopped at the end. --concurrency client processes then send
+requests back to back (closed loop: a client sends its next request when the previous
+one answered) for --warmup seconds, which are not reported, and --duration seconds.
+Every request is drawn from --mix, weighted:
+
+    index          GET /
+    predict_data   POST /predict_data, the form of one student
+    predict_batch  POST /predict_batch, a JSON list of --batch-size students
+    metrics        GET /metrics
+
+Responses other than 2xx and failed connections count as errors. The report (JSON) has
+the requests per second, error rate and p50/p95/p99 latency of every request kind and
+of all requests. With --compare, the throughput and p99 latency of every request kind
+are compared with a previous report; the exit code is 1 if one is worse by more than
+--threshold.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.prefork import FORM, wait_until_ready
+
+REQUEST_KINDS = ("index", "predict_data", "predict_batch", "metrics")
+
+
+def build_requests(base_url, batch_size) -> dict:
+    """
+    Returns:
+        dict: {request kind: (url, body or None, headers)}
+    """
+    record = {
+        **FORM,
+        "writing_score": int(FORM["writing_score"]),
+        "reading_score": int(FORM["reading_score"]),
+    }
+    return {
+        "index": (f"{base_url}/", None, {}),
+        "predict_data": (
+            f"{base_url}/predict_data",
+            urllib.parse.urlencode(FORM).encode(),
+            {"Content-Type": "application/x-www-form-urlencoded"},
+        ),
+        "predict_batch": (
+            f"{base_url}/predict_batch",
+            json.dumps([record] * batch_size).encode(),
+            {"Content-Type": "application/json"},
+        ),
+        "metrics": (f"{base_url}/metrics", None, {}),
+    }
+
+
+def parse_mix(value) -> dict:
+    """
+    Parse a request mix such as "predict_data=9,predict_batch=1".
+    """
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(
+                f"Unknown request kind {kind}, choose from {REQUEST_KINDS}"
+            )
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _client(requests, mix, start_at, report_from, deadline, seed, queue):
+    """
+    Send requests back to back until deadline.
+
+    Puts on queue: {request kind: [(latency s, status), ...]} of the requests started
+    after report_from; status is the HTTP status, 0 for a failed connection.
+    """
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    samples = {kind: [] for kind in kinds}
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        url, body, headers = requests[kind]
+        request = urllib.request.Request(url, data=body, headers=headers)
+        started = time.time()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        if started >= report_from:
+            samples[kind].append((time.time() - started, status))
+    queue.put(samples)
+
+
+def summarize(samples, duration) -> dict:
+    """
+    Returns:
+        dict: requests, errors, error_rate, requests_per_s, latency percentiles (ms) and
+            status counts of the samples.
+    """
+    if not samples:
+        return {"requests": 0, "errors": 0, "error_rate": 0.0, "requests_per_s": 0.0}
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    statuses = Counter(status for _, status in samples)
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples),
+        "requests_per_s": len(samples) / duration,
+        "latency_ms_mean": float(latencies.mean()),
+        "latency_ms_p50": float(np.percentile(latencies, 50)),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "latency_ms_p99": float(np.percentile(latencies, 99)),
+        "latency_ms_max": float(latencies.max()),
+        "status_counts": {str(status): count for status, count in statuses.items()},
+    }
+
+
+def run_load(base_url, args, mix) -> dict:
+    """
+    Run the client processes against base_url and summarize their samples.
+    """
+    requests = build_requests(base_url, args.batch_size)
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    # The clients start together once all of them are up
+    start_at = time.time() + 2.0
+    report_from = start_at + args.warmup
+    deadline = report_from + args.duration
+    clients = [
+        context.Process(
+            target=_client,
+            args=(requests, mix, start_at, report_from, deadline, args.seed + i, queue),
+        )
+        for i in range(args.concurrency)
+    ]
+    for client in clients:
+        client.start()
+    outcomes = [queue.get() for _ in clients]
+    for client in clients:
+        client.join()
+
+    by_kind = {kind: [] for kind in mix}
+    for outcome in outcomes:
+        for kind, samples in outcome.items():
+            by_kind[kind].extend(samples)
+    return {
+        "all": summarize(
+            [sample for samples in by_kind.values() for sample in samples],
+            args.duration,
+        ),
+        **{
+            kind: summarize(samples, args.duration) for kind, samples in by_kind.items()
+        },
+    }
+
+
+def compare(results, baseline, threshold) -> list:
+    """
+    Compare the throughput and p99 latency of every request kind with a previous run.
+
+    Returns:
+        list: {request, metric, value, baseline, ratio} of every metric more than
+            threshold worse than its baseline.
+    """
+    regressions = []
+    for kind, summary in results.items():
+        previous = baseline["results"].get(kind)
+        if not previous or not summary["requests"] or not previous["requests"]:
+            continue
+        for metric, worse in (
+            ("requests_per_s", lambda ratio: ratio < 1 - threshold),
+            ("latency_ms_p99", lambda ratio: ratio > 1 + threshold),
+        ):
+            ratio = summary[metric] / previous[metric]
+            if worse(ratio):
+                regressions.append(
+                    {
+                        "request": kind,
+                        "metric": metric,
+                        "value": summary[metric],
+                        "baseline": previous[metric],
+                        "ratio": ratio,
+                    }
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--mix", default="predict_data=9,predict_batch=1")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--url", help="Load a running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--compare", help="Previous results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = None
+    base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    if not args.url:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.pipeline.prefork_server"],
+            env={**os.environ, "WORKERS": str(args.workers), "PORT": str(args.port)},
+        )
+    try:
+        wait_until_ready(f"{base_url}/")
+        results = run_load(base_url, args, mix)
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {"platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "settings": {
+            "url": base_url,
+            "server_workers": None if args.url else args.workers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "batch_size": args.batch_size,
+        },
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as file_obj:
+            report["regressions"] = compare(
+                results, json.load(file_obj), args.threshold
+            )
+    with open(args.output, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compare the memory and accuracy of the feature precision/sparsity modes.
+
+    python -m benchmarks.numeric_mode [--rows 100k] [--modes float64,float32,float32-sparse]
+        [--reference notebooks/data/stud.csv] [--output numeric_mode_results.json]
+
+A synthetic stud.csv of --rows rows (see benchmarks.synthetic_data) is ingested once in
+a temporary project directory, then transformed in every mode ("float64" is the
+default configuration, "float32" sets DataTransformationConfig.feature_dtype and a
+"-sparse" suffix sets sparse_features). For every mode the feature memory is reported
+against dense float64, and a fixed set of models (seeded, so the modes are comparable)
+is fitted and scored on the test set, with its fit and predict times and its test r2
+difference to the float64 mode. The results are printed and written as JSON.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from benchmarks.suite import parse_size
+from benchmarks.synthetic_data import fit_profile, write_students
+
+
+def get_benchmark_models() -> dict:
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    return {
+        "Linear Regression": LinearRegression(),
+        "Random Forest": RandomForestRegressor(n_estimators=32, random_state=42),
+        "Gradient Boosting": GradientBoostingRegressor(
+            n_estimators=64, random_state=42
+        ),
+        "XGBoost": XGBRegressor(n_estimators=64, random_state=42),
+    }
+
+
+def run_mode(mode, paths) -> dict:
+    """
+    Transform the ingested splits in one mode and fit the benchmark models.
+    """
+    from sklearn.metrics import r2_score
+    from src.component.data_transformation import DataTransformation
+    from src.component.numeric_mode import densify_for, memory_report
+    from src.utils import load_array
+
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.feature_dtype, _, sparse = mode.partition("-")
+    config.sparse_features = sparse == "sparse"
+    start = time.perf_counter()
+    train_set, test_set, _ = transformation.initiate_data_transformation(*paths)
+    transform_s = time.perf_counter() - start
+
+    # Read into memory, the trainer's working set
+    X_train, y_train = (load_array(path, mmap_mode=None) for path in train_set)
+    X_test, y_test = (load_array(path, mmap_mode=None) for path in test_set)
+    result = {
+        "mode": mode,
+        "transform_s": transform_s,
+        "features": {
+            **memory_report([X_train, X_test]),
+            "dtype": str(X_train.dtype),
+            "sparse": hasattr(X_train, "tocsr"),
+            "file_bytes": os.path.getsize(train_set[0]) + os.path.getsize(test_set[0]),
+        },
+        "models": {},
+    }
+    for model_name, model in get_benchmark_models().items():
+        start = time.perf_counter()
+        model.fit(densify_for(model, X_train), y_train)
+        fit_s = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(densify_for(model, X_test))
+        predict_s = time.perf_counter() - start
+        result["models"][model_name] = {
+            "fit_s": fit_s,
+            "predict_s": predict_s,
+            "test_r2": r2_score(y_test, y_pred),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="100k")
+    parser.add_argument("--modes", default="float64,float32,float32-sparse")
+    parser.add_argument("--reference", help="Fit the synthetic data to this CSV")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="numeric_mode_results.json")
+    args = parser.parse_args()
+
+    profile = None
+    if args.reference:
+        import pandas as pd
+
+        profile = fit_profile(pd.read_csv(args.reference))
+    n_rows = parse_size(args.rows)
+    output_path = os.path.abspath(args.output)
+
+    from src.component.data_ingestion import DataIngestion
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as project_dir:
+        os.chdir(project_dir)
+        try:
+            write_students(
+                os.path.join("notebooks", "data", "stud.csv"),
+                n_rows,
+                profile,
+                args.seed,
+            )
+            paths = DataIngestion().initiate_data_ingestion()
+            for mode in args.modes.split(","):
+                print(f"{mode} on {n_rows} rows", file=sys.stderr)
+                results.append(run_mode(mode.strip(), paths))
+        finally:
+            os.chdir(cwd)
+
+    baseline = next((r for r in results if r["mode"] == "float64"), None)
+    if baseline is not None:
+        for result in results:
+            for model_name, scores in result["models"].items():
+                scores["test_r2_delta"] = (
+                    scores["test_r2"] - baseline["models"][model_name]["test_r2"]
+                )
+    report = {"rows": n_rows, "seed": args.seed, "results": results}
+    with open(output_path, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Measure throughput and per-worker memory of the prefork server for several worker counts.
+
+    python -m benchmarks.prefork [--workers 1,2,4] [--clients 8] [--duration 10]
+        [--port 8100]
+
+Run from the project directory (the server loads artifacts/). For every worker count the
+server is started with `python -m src.pipeline.prefork_server`, loaded for --duration
+seconds by --clients client processes posting the /predict_data form, then stopped.
+Per worker, RSS counts the shared copy-on-write pages in full, PSS divides them among
+the processes sharing them and private memory is what the worker added on its own.
+The results are printed as JSON.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import numpy as np
+
+FORM = {
+    "gender": "female",
+    "race_ethnicity": "group B",
+    "parental_level_of_education": "bachelor's degree",
+    "lunch": "standard",
+    "test_preparation_course": "none",
+    "writing_score": "74",
+    "reading_score": "72",
+}
+
+
+def memory_mb(pid) -> dict:
+    """
+    Returns:
+        dict: rss, pss and private (clean + dirty) memory of a process in MB (Linux).
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file_obj:
+        for line in file_obj:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0)
+        + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def child_pids(pid) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as file_obj:
+        return [int(child) for child in file_obj.read().split()]
+
+
+def _client(url, deadline, queue):
+    body = urllib.parse.urlencode(FORM).encode()
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, data=body, timeout=10) as response:
+                response.read()
+            latencies.append(time.perf_counter() - start)
+        except (urllib.error.URLError, OSError):
+            errors += 1
+    queue.put((latencies, errors))
+
+
+def wait_until_ready(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise TimeoutError(f"Server not ready at {url} after {timeout}s")
+
+
+def measure(n_workers, args) -> dict:
+    """
+    Start the server with n_workers workers, load it and stop it.
+    """
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.pipeline.prefork_server"],
+        env={**os.environ, "WORKERS": str(n_workers), "PORT": str(args.port)},
+    )
+    try:
+        wait_until_ready(f"{base_url}/")
+        # Let every worker serve some requests before measuring its memory
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        deadline = time.perf_counter() + args.duration
+        clients = [
+            context.Process(
+                target=_client, args=(f"{base_url}/predict_data", deadline, queue)
+            )
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        outcomes = [queue.get() for _ in clients]
+        for client in clients:
+            client.join()
+
+        latencies = np.concatenate([latencies for latencies, _ in outcomes]) * 1000
+        workers = [memory_mb(pid) for pid in child_pids(server.pid)]
+        return {
+            "workers": n_workers,
+            "clients": args.clients,
+            "requests": len(latencies),
+            "errors": sum(errors for _, errors in outcomes),
+            "requests_per_s": len(latencies) / args.duration,
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p99": float(np.percentile(latencies, 99)),
+            "master": memory_mb(server.pid),
+            "per_worker": workers,
+            "total_pss_mb": memory_mb(server.pid)["pss_mb"]
+            + sum(worker["pss_mb"] for worker in workers),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    results = {
+        "cpu_count": os.cpu_count(),
+        "runs": [measure(int(n), args) for n in args.workers.split(",")],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
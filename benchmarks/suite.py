@@ -0,0 +1,420 @@
+"""
+Benchmark the training and serving code paths on synthetic data of growing size.
+
+    python -m benchmarks.suite [--sizes 1k,100k,1M] [--benchmarks ingestion,transformation]
+        [--repeat 3] [--output benchmark_results.json] [--reference notebooks/data/stud.csv]
+        [--compare previous_results.json] [--threshold 0.2]
+
+For every size a synthetic stud.csv is written to a temporary project directory (see
+benchmarks.synthetic_data). The components then run there with their default
+configuration, in pipeline order:
+
+    ingestion        DataIngestion.initiate_data_ingestion
+    transformation   DataTransformation.initiate_data_transformation
+    load_object      load_object of the preprocessor and model pickles
+    evaluate_model   evaluate_model on two small models (up to --evaluate-max-rows rows)
+    search_halving   evaluate_model in "halving" against "grid" search mode on the
+                     search_candidates grids (up to --evaluate-max-rows rows): the time
+                     of both, their best model (best test r2) and per-model test r2
+    predict_single   PredictionPipeline.predict of one-row DataFrames (latency)
+    predict_batch    PredictionPipeline.predict of the whole test set
+
+A LinearRegression fitted on the transformed training set (untimed) is the served model.
+The results are written as JSON. With --compare, every (benchmark, rows) median is
+compared with the same entry of a previous run; the exit code is 1 if one is slower by
+more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.artifact_load import rss_bytes
+from benchmarks.synthetic_data import fit_profile, write_students
+
+BENCHMARKS = [
+    "ingestion",
+    "transformation",
+    "load_object",
+    "evaluate_model",
+    "search_halving",
+    "predict_single",
+    "predict_batch",
+]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(value) -> int:
+    """
+    Parse a row count such as 1000, 10k or 10M.
+    """
+    value = value.strip().lower()
+    if value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def search_candidates() -> tuple:
+    """
+    The models and grids of the search_halving benchmark, large enough for the halving
+    search to drop candidates.
+
+    Returns:
+        tuple: ({model name: estimator}, {model name: parameter grid})
+    """
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from sklearn.tree import DecisionTreeRegressor
+
+    models = {
+        "Linear Regression": LinearRegression(),
+        "Decision Tree": DecisionTreeRegressor(random_state=42),
+        "Random Forest": RandomForestRegressor(random_state=42),
+        "Gradient Boosting": GradientBoostingRegressor(random_state=42),
+    }
+    params = {
+        "Linear Regression": {},
+        "Decision Tree": {"max_depth": [2, 3, 4, 6, 8, 12, 16, None]},
+        "Random Forest": {"n_estimators": [8, 16, 32], "max_depth": [4, 8, None]},
+        "Gradient Boosting": {
+            "learning_rate": [0.03, 0.1, 0.3],
+            "n_estimators": [16, 32, 64],
+        },
+    }
+    return models, params
+
+
+def measure(function, repeat) -> dict:
+    """
+    Run function repeat times.
+
+    Returns:
+        dict: The durations in seconds, their min and median, and the resident memory
+            after the runs.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return {
+        "seconds": seconds,
+        "min_s": min(seconds),
+        "median_s": statistics.median(seconds),
+        "rss_mb": rss_bytes() / 1e6,
+    }
+
+
+class BenchmarkRun:
+    def __init__(self, n_rows, repeat, evaluate_max_rows, single_calls):
+        """
+        The benchmarks of one dataset size, run in the current directory.
+
+        Attributes:
+            n_rows (int): Rows of the synthetic stud.csv.
+            repeat (int): Timed runs of every benchmark.
+            evaluate_max_rows (int): evaluate_model is skipped above this size.
+            single_calls (int): One-row predictions timed by predict_single.
+        """
+        self.n_rows = n_rows
+        self.repeat = repeat
+        self.evaluate_max_rows = evaluate_max_rows
+        self.single_calls = single_calls
+        self.paths = None
+        self.arrays = None
+        self.test_features = None
+
+    def ingestion(self) -> dict:
+        from src.component.data_ingestion import DataIngestion
+
+        result = measure(
+            lambda: setattr(self, "paths", DataIngestion().initiate_data_ingestion()),
+            self.repeat,
+        )
+        return {**result, "rows_per_s": self.n_rows / result["median_s"]}
+
+    def transformation(self) -> dict:
+        from src.component.data_transformation import DataTransformation
+        from src.utils import load_array, read_dataframe, save_object
+        from sklearn.linear_model import LinearRegression
+
+        train_path, test_path = self.paths
+        outputs = {}
+        result = measure(
+            lambda: outputs.update(
+                zip(
+                    ("train", "test", "preprocessor"),
+                    DataTransformation().initiate_data_transformation(
+                        train_path, test_path
+                    ),
+                )
+            ),
+            self.repeat,
+        )
+        # The served model of the prediction benchmarks
+        X_train, y_train = (load_array(path) for path in outputs["train"])
+        save_object(
+            os.path.join("artifacts", "model.pkl"),
+            LinearRegression().fit(X_train, y_train),
+        )
+        self.arrays = outputs
+        self.test_features = read_dataframe(test_path).drop(columns=["math_score"])
+        return {**result, "rows_per_s": self.n_rows / result["median_s"]}
+
+    def load_object(self) -> dict:
+        from src.utils import load_object
+
+        return measure(
+            lambda: [
+                load_object(os.path.join("artifacts", file_name))
+                for file_name in ("preprocessing.pkl", "model.pkl")
+            ],
+            self.repeat,
+        )
+
+    def evaluate_model(self) -> dict:
+        if self.n_rows > self.evaluate_max_rows:
+            return {
+                "skipped": f"more than --evaluate-max-rows={self.evaluate_max_rows}"
+            }
+        from sklearn.linear_model import LinearRegression
+        from sklearn.tree import DecisionTreeRegressor
+        from src.utils import evaluate_model, load_array
+
+        X_train, y_train = (load_array(path) for path in self.arrays["train"])
+        X_test, y_test = (load_array(path) for path in self.arrays["test"])
+        models = {
+            "Linear Regression": LinearRegression(),
+            "Decision Tree": DecisionTreeRegressor(random_state=42),
+        }
+        params = {"Linear Regression": {}, "Decision Tree": {"max_depth": [4, 8]}}
+        return measure(
+            lambda: evaluate_model(
+                X_train, y_train, X_test, y_test, models=models, param=params
+            ),
+            self.repeat,
+        )
+
+    def search_halving(self) -> dict:
+        if self.n_rows > self.evaluate_max_rows:
+            return {
+                "skipped": f"more than --evaluate-max-rows={self.evaluate_max_rows}"
+            }
+        from src.search.selection import select_model
+        from src.utils import evaluate_model, load_array
+
+        X_train, y_train = (load_array(path) for path in self.arrays["train"])
+        X_test, y_test = (load_array(path) for path in self.arrays["test"])
+        models, params = search_candidates()
+        reports = {}
+        timings = {}
+        for search_mode in ("grid", "halving"):
+            timings[search_mode] = measure(
+                lambda search_mode=search_mode: reports.update(
+                    {
+                        search_mode: evaluate_model(
+                            X_train,
+                            y_train,
+                            X_test,
+                            y_test,
+                            models=models,
+                            param=params,
+                            search_mode=search_mode,
+                        )
+                    }
+                ),
+                self.repeat,
+            )
+        best_model = {mode: select_model(report) for mode, report in reports.items()}
+        return {
+            **timings["halving"],
+            "grid_median_s": timings["grid"]["median_s"],
+            "speedup": timings["grid"]["median_s"] / timings["halving"]["median_s"],
+            "best_model": best_model,
+            "best_model_agrees": best_model["grid"] == best_model["halving"],
+            "test_r2": {
+                model_name: {
+                    mode: report[model_name]["Test r2 score"]
+                    for mode, report in reports.items()
+                }
+                for model_name in models
+            },
+        }
+
+    def _pipeline(self):
+        from src.pipeline.artifact_cache import ArtifactCache
+        from src.pipeline.prediction_pipeline import PredictionPipeline
+
+        # A cache of its own, the process-wide one may hold another size's artifacts
+        pipeline = PredictionPipeline(ArtifactCache())
+        pipeline.warm_up()
+        return pipeline
+
+    def predict_single(self) -> dict:
+        pipeline = self._pipeline()
+        rows = [
+            self.test_features.iloc[[i % len(self.test_features)]]
+            for i in range(self.single_calls)
+        ]
+        latencies = []
+        for row in rows:
+            start = time.perf_counter()
+            pipeline.predict(row)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies) * 1000
+        return {
+            "calls": self.single_calls,
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p99": float(np.percentile(latencies, 99)),
+            "median_s": float(np.median(latencies)) / 1000,
+            "rss_mb": rss_bytes() / 1e6,
+        }
+
+    def predict_batch(self) -> dict:
+        pipeline = self._pipeline()
+        result = measure(lambda: pipeline.predict(self.test_features), self.repeat)
+        n_rows = len(self.test_features)
+        return {
+            **result,
+            "batch_rows": n_rows,
+            "rows_per_s": n_rows / result["median_s"],
+        }
+
+
+def run_size(n_rows, benchmarks, args, profile) -> list:
+    """
+    Run the selected benchmarks on a synthetic dataset of n_rows rows.
+
+    The prerequisites of the selected benchmarks (ingestion and transformation produce
+    the arrays and artifacts of the others) are run too, reported with selected=False.
+    """
+    needed = set(benchmarks)
+    if needed - {"ingestion"}:
+        needed |= {"ingestion", "transformation"}
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as project_dir:
+        os.chdir(project_dir)
+        try:
+            write_students(
+                os.path.join("notebooks", "data", "stud.csv"),
+                n_rows,
+                profile,
+                args.seed,
+            )
+            run = BenchmarkRun(
+                n_rows, args.repeat, args.evaluate_max_rows, args.single_calls
+            )
+            for name in BENCHMARKS:
+                if name not in needed:
+                    continue
+                print(f"{name} on {n_rows} rows", file=sys.stderr)
+                result = getattr(run, name)()
+                results.append(
+                    {
+                        "benchmark": name,
+                        "rows": n_rows,
+                        "selected": name in benchmarks,
+                        **result,
+                    }
+                )
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold) -> list:
+    """
+    Compare the median durations with a previous run.
+
+    Returns:
+        list: {benchmark, rows, median_s, baseline_median_s, ratio} of every entry more
+            than threshold slower than its baseline.
+    """
+    previous = {
+        (entry["benchmark"], entry["rows"]): entry["median_s"]
+        for entry in baseline["results"]
+        if "median_s" in entry
+    }
+    regressions = []
+    for entry in results:
+        baseline_median = previous.get((entry["benchmark"], entry["rows"]))
+        if baseline_median is None or "median_s" not in entry:
+            continue
+        ratio = entry["median_s"] / baseline_median
+        if ratio > 1 + threshold:
+            regressions.append(
+                {
+                    "benchmark": entry["benchmark"],
+                    "rows": entry["rows"],
+                    "median_s": entry["median_s"],
+                    "baseline_median_s": baseline_median,
+                    "ratio": ratio,
+                }
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1k,10k,100k")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--reference", help="Fit the synthetic data to this CSV")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--evaluate-max-rows", type=int, default=1_000_000)
+    parser.add_argument("--single-calls", type=int, default=200)
+    parser.add_argument("--compare", help="Previous results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    benchmarks = [name.strip() for name in args.benchmarks.split(",")]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks {sorted(unknown)}, choose from {BENCHMARKS}")
+    profile = None
+    if args.reference:
+        import pandas as pd
+
+        profile = fit_profile(pd.read_csv(args.reference))
+
+    from src.artifact_bundle import library_versions
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            **library_versions(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "reference": args.reference,
+        },
+        "results": [],
+    }
+    for size in args.sizes.split(","):
+        report["results"].extend(run_size(parse_size(size), benchmarks, args, profile))
+
+    if args.compare:
+        with open(args.compare) as file_obj:
+            report["regressions"] = compare(
+                report["results"], json.load(file_obj), args.threshold
+            )
+    with open(args.output, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(json.dumps(report.get("regressions", report["results"]), indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Generate synthetic student records with the schema and distributions of stud.csv.
+
+    python -m benchmarks.synthetic_data --rows 1000000 --output artifacts/synthetic.csv
+        [--reference notebooks/data/stud.csv] [--seed 42]
+
+The categories are drawn with the stud.csv frequencies. Each score is its mean plus
+additive effects of the categories, plus correlated normal noise, then rounded and
+clipped to 0-100. So the scores keep their means, spreads, correlations and their
+dependence on the categories, and the regression models have something real to fit.
+With --reference, all of these are estimated from that CSV, otherwise the built-in
+STUDENT_PROFILE is used.
+"""
+
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMNS = ["math_score", "reading_score", "writing_score"]
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+]
+# Column order of stud.csv
+STUDENT_COLUMNS = CATEGORICAL_COLUMNS + SCORE_COLUMNS
+
+# Estimated from the 1000 rows of stud.csv
+STUDENT_PROFILE = {
+    "categories": {
+        "gender": {"female": 0.518, "male": 0.482},
+        "race_ethnicity": {
+            "group A": 0.089,
+            "group B": 0.190,
+            "group C": 0.319,
+            "group D": 0.262,
+            "group E": 0.140,
+        },
+        "parental_level_of_education": {
+            "associate's degree": 0.222,
+            "bachelor's degree": 0.118,
+            "high school": 0.196,
+            "master's degree": 0.059,
+            "some college": 0.226,
+            "some high school": 0.179,
+        },
+        "lunch": {"free/reduced": 0.355, "standard": 0.645},
+        "test_preparation_course": {"completed": 0.358, "none": 0.642},
+    },
+    "means": {"math_score": 66.09, "reading_score": 69.17, "writing_score": 68.05},
+    # Effect of each category relative to the first one of its column
+    "effects": {
+        "math_score": {
+            "gender": {"male": 5.1},
+            "race_ethnicity": {
+                "group B": 1.7,
+                "group C": 2.2,
+                "group D": 5.3,
+                "group E": 10.3,
+            },
+            "parental_level_of_education": {
+                "bachelor's degree": 2.3,
+                "high school": -3.6,
+                "master's degree": 2.0,
+                "some college": -0.5,
+                "some high school": -2.6,
+            },
+            "lunch": {"standard": 10.9},
+            "test_preparation_course": {"none": -5.5},
+        },
+        "reading_score": {
+            "gender": {"male": -7.2},
+            "race_ethnicity": {
+                "group B": 1.2,
+                "group C": 2.7,
+                "group D": 4.5,
+                "group E": 6.7,
+            },
+            "parental_level_of_education": {
+                "bachelor's degree": 2.0,
+                "high school": -4.5,
+                "master's degree": 4.0,
+                "some college": -0.3,
+                "some high school": -2.5,
+            },
+            "lunch": {"standard": 7.2},
+            "test_preparation_course": {"none": -7.3},
+        },
+        "writing_score": {
+            "gender": {"male": -9.3},
+            "race_ethnicity": {
+                "group B": 1.7,
+                "group C": 3.4,
+                "group D": 6.4,
+                "group E": 5.9,
+            },
+            "parental_level_of_education": {
+                "bachelor's degree": 3.5,
+                "high school": -5.6,
+                "master's degree": 5.0,
+                "some college": -0.3,
+                "some high school": -3.6,
+            },
+            "lunch": {"standard": 8.1},
+            "test_preparation_course": {"none": -9.9},
+        },
+    },
+    # Noise around the category effects, correlated across the three scores
+    "residual_std": {"math_score": 13.0, "reading_score": 13.0, "writing_score": 12.5},
+    "residual_corr": [[1.0, 0.80, 0.77], [0.80, 1.0, 0.94], [0.77, 0.94, 1.0]],
+}
+
+
+def fit_profile(df) -> dict:
+    """
+    Estimate a profile from a stud.csv-like frame.
+
+    Category frequencies are counted, the effects are the least-squares coefficients of
+    each score on the one-hot categories (first category of each column dropped), and
+    the residual standard deviations and correlations come from the fit residuals.
+
+    Arg:
+        df (pd.DataFrame): Records with the STUDENT_COLUMNS.
+
+    Returns:
+        dict: A profile in the STUDENT_PROFILE format.
+    """
+    categories = {
+        column: (df[column].value_counts(normalize=True).sort_index().to_dict())
+        for column in CATEGORICAL_COLUMNS
+    }
+    dummies = pd.get_dummies(
+        df[CATEGORICAL_COLUMNS].astype("category"), prefix_sep="\0", drop_first=True
+    )
+    design = np.column_stack([np.ones(len(df)), dummies.to_numpy(dtype=np.float64)])
+    scores = df[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+    coefficients = np.linalg.lstsq(design, scores, rcond=None)[0]
+    residuals = scores - design @ coefficients
+
+    effects = {
+        score: {column: {} for column in CATEGORICAL_COLUMNS} for score in SCORE_COLUMNS
+    }
+    for name, row in zip(dummies.columns, coefficients[1:]):
+        column, value = name.split("\0", 1)
+        for score, effect in zip(SCORE_COLUMNS, row.tolist()):
+            effects[score][column][value] = effect
+    return {
+        "categories": categories,
+        "means": dict(zip(SCORE_COLUMNS, scores.mean(axis=0).tolist())),
+        "effects": effects,
+        "residual_std": dict(zip(SCORE_COLUMNS, residuals.std(axis=0).tolist())),
+        "residual_corr": np.corrcoef(residuals, rowvar=False).tolist(),
+    }
+
+
+def generate_students(n_rows, profile=None, seed=42) -> pd.DataFrame:
+    """
+    Draw n_rows synthetic student records.
+
+    Arg:
+        n_rows (int): Number of records.
+        profile (dict): Distributions in the STUDENT_PROFILE format.
+        seed (int | np.random.Generator): Random seed or generator.
+
+    Returns:
+        pd.DataFrame: Records with the STUDENT_COLUMNS, scores as integers.
+    """
+    profile = profile or STUDENT_PROFILE
+    rng = np.random.default_rng(seed)
+    columns = {}
+    positions = {}
+    for column in CATEGORICAL_COLUMNS:
+        values = list(profile["categories"][column])
+        frequencies = np.array(list(profile["categories"][column].values()))
+        positions[column] = rng.choice(
+            len(values), size=n_rows, p=frequencies / frequencies.sum()
+        )
+        columns[column] = pd.Categorical.from_codes(positions[column], values)
+
+    std = np.array([profile["residual_std"][score] for score in SCORE_COLUMNS])
+    covariance = np.array(profile["residual_corr"]) * np.outer(std, std)
+    noise = rng.multivariate_normal(np.zeros(len(SCORE_COLUMNS)), covariance, n_rows)
+    for index, score in enumerate(SCORE_COLUMNS):
+        values = noise[:, index]
+        # Centred effects, so the mean of the score stays its profile mean
+        values += profile["means"][score]
+        for column in CATEGORICAL_COLUMNS:
+            column_effects = profile["effects"][score].get(column, {})
+            effect = np.array(
+                [
+                    column_effects.get(value, 0.0)
+                    for value in profile["categories"][column]
+                ]
+            )
+            frequencies = np.array(list(profile["categories"][column].values()))
+            effect -= effect @ frequencies / frequencies.sum()
+            values += effect[positions[column]]
+        columns[score] = np.clip(np.rint(values), 0, 100).astype(np.int64)
+    return pd.DataFrame(columns, columns=STUDENT_COLUMNS)
+
+
+def write_students(
+    file_path, n_rows, profile=None, seed=42, chunk_size=1_000_000
+) -> str:
+    """
+    Write n_rows synthetic records to a CSV file, chunk by chunk so 10M rows fit in memory.
+
+    Returns:
+        str: The file path.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with open(file_path, "w", newline="") as file_obj:
+        for start in range(0, n_rows, chunk_size):
+            chunk = generate_students(min(chunk_size, n_rows - start), profile, rng)
+            chunk.to_csv(file_obj, index=False, header=start == 0)
+    return file_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--reference", help="Fit the distributions from this CSV")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    profile = fit_profile(pd.read_csv(args.reference)) if args.reference else None
+    write_students(args.output, args.rows, profile, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import hashlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib import metadata
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import file_sha256
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+# Holds the name of the bundle directory in use, replaced atomically on publish
+CURRENT_FILE = "CURRENT"
+# Distributions whose versions are recorded, unpickling needs compatible versions
+RECORDED_LIBRARIES = (
+    "numpy",
+    "scipy",
+    "pandas",
+    "scikit-learn",
+    "xgboost",
+    "catboost",
+    "dill",
+)
+
+
+@dataclass
+class ArtifactBundleConfig:
+    bundle_root: str = os.path.join("artifacts", "bundles")
+    # Arrays at least this large are stored as .npy files and memory-mapped on load
+    min_array_bytes: int = 64 * 1024
+    # Bundles kept after a new one is written, the current one included; older ones are
+    # deleted. Servers switch to a new bundle at their next artifact check, the
+    # previous bundles must outlive it (None keeps every bundle)
+    keep_bundles: int = 5
+
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Pickler storing large numeric arrays out-of-band as .npy files.
+    """
+
+    def __init__(self, file_obj, arrays_dir, prefix, min_array_bytes):
+        super().__init__(file_obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_dir = arrays_dir
+        self.prefix = prefix
+        self.min_array_bytes = min_array_bytes
+        self.array_files = []
+
+    def persistent_id(self, obj):
+        if (
+            isinstance(obj, np.ndarray)
+            and not obj.dtype.hasobject
+            and obj.nbytes >= self.min_array_bytes
+        ):
+            file_name = f"{self.prefix}-{len(self.array_files)}.npy"
+            np.save(os.path.join(self.arrays_dir, file_name), np.asarray(obj))
+            self.array_files.append(file_name)
+            return ("ndarray", file_name)
+        return None
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file_obj, arrays_dir, mmap_mode):
+        super().__init__(file_obj)
+        self.arrays_dir = arrays_dir
+        self.mmap_mode = mmap_mode
+
+    def persistent_load(self, pid):
+        kind, file_name = pid
+        if kind != "ndarray":
+            raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+        return np.load(
+            os.path.join(self.arrays_dir, file_name), mmap_mode=self.mmap_mode
+        )
+
+
+@lru_cache(maxsize=None)
+def library_versions() -> dict:
+    """
+    Returns:
+        dict: Versions of python and of the installed RECORDED_LIBRARIES (looked up once,
+            do not modify).
+    """
+    versions = {"python": platform.python_version()}
+    for library in RECORDED_LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            continue
+    return versions
+
+
+def write_bundle(objects, metrics=None, data_sha256=None, config=None) -> str:
+    """
+    Write the serving artifacts as a new versioned bundle and make it the current one.
+
+    Layout of artifacts/bundles/<version>/:
+        manifest.json    format version, library versions, metrics, training data hash
+                         and the sha256 of every file
+        <name>.pkl       pickle of the object, without its large arrays
+        arrays/*.npy     the large numeric arrays, memory-mapped on load
+
+    The bundle is written to a temporary directory and renamed, then the CURRENT
+    pointer file is replaced, so a reader always sees a complete bundle. Bundles beyond
+    the newest keep_bundles are then deleted (see prune_bundles).
+
+    Arg:
+        objects (dict): {artifact name: object}, e.g. "preprocessor" and "model".
+        metrics (dict): JSON-serializable training metrics to record.
+        data_sha256 (str): Hash of the training data the objects were fitted on.
+        config (ArtifactBundleConfig): Bundle root and array threshold.
+
+    Returns:
+        str: The directory of the new bundle.
+    """
+    try:
+        config = config or ArtifactBundleConfig()
+        os.makedirs(config.bundle_root, exist_ok=True)
+        tmp_dir = os.path.join(
+            config.bundle_root, f".tmp-{os.getpid()}-{time.time_ns()}"
+        )
+        arrays_dir = os.path.join(tmp_dir, "arrays")
+        os.makedirs(arrays_dir)
+
+        artifacts = {}
+        for name, obj in objects.items():
+            pickle_file = f"{name}.pkl"
+            with open(os.path.join(tmp_dir, pickle_file), "wb") as file_obj:
+                pickler = _ArrayPickler(
+                    file_obj, arrays_dir, name, config.min_array_bytes
+                )
+                pickler.dump(obj)
+            files = [pickle_file] + [
+                os.path.join("arrays", file_name) for file_name in pickler.array_files
+            ]
+            artifacts[name] = {
+                "type": f"{type(obj).__module__}.{type(obj).__qualname__}",
+                "pickle": pickle_file,
+                "files": {
+                    file_name: file_sha256(os.path.join(tmp_dir, file_name))
+                    for file_name in files
+                },
+                "bytes": sum(
+                    os.path.getsize(os.path.join(tmp_dir, file_name))
+                    for file_name in files
+                ),
+            }
+
+        content_sha256 = hashlib.sha256(
+            json.dumps(
+                {name: artifact["files"] for name, artifact in artifacts.items()},
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+        version = f"{time.strftime('%Y%m%dT%H%M%S')}-{content_sha256[:12]}"
+        manifest = {
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "version": version,
+            "created_at": time.time(),
+            "content_sha256": content_sha256,
+            "data_sha256": data_sha256,
+            "metrics": metrics or {},
+            "libraries": library_versions(),
+            "artifacts": artifacts,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as file_obj:
+            json.dump(manifest, file_obj, indent=2, default=str)
+
+        bundle_dir = os.path.join(config.bundle_root, version)
+        if os.path.exists(bundle_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, bundle_dir)
+
+        pointer_path = os.path.join(config.bundle_root, CURRENT_FILE)
+        with open(f"{pointer_path}.tmp", "w") as file_obj:
+            file_obj.write(version)
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+        logging.info(f"Artifact bundle {version} written and made current")
+        try:
+            prune_bundles(config)
+        except CustomException as e:
+            # The new bundle is published, a failed cleanup is retried next time
+            logging.warning(f"Old artifact bundles not pruned: {e}")
+        return bundle_dir
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def prune_bundles(config=None) -> list:
+    """
+    Delete the bundles older than the newest keep_bundles, never the current one.
+
+    Bundles are ordered by the creation time of their manifest. Directories without a
+    manifest (e.g. a bundle being written) are left alone.
+
+    Arg:
+        config (ArtifactBundleConfig): Bundle root and number of bundles kept.
+
+    Returns:
+        list: The deleted bundle directories.
+    """
+    try:
+        config = config or ArtifactBundleConfig()
+        if config.keep_bundles is None or not os.path.isdir(config.bundle_root):
+            return []
+        current = current_bundle_dir(config)
+        bundles = []
+        for name in os.listdir(config.bundle_root):
+            bundle_dir = os.path.join(config.bundle_root, name)
+            manifest_path = os.path.join(bundle_dir, MANIFEST_FILE)
+            if name.startswith(".") or not os.path.isfile(manifest_path):
+                continue
+            with open(manifest_path) as file_obj:
+                bundles.append((json.load(file_obj).get("created_at", 0), bundle_dir))
+        bundles.sort(reverse=True)
+
+        deleted = []
+        for _, bundle_dir in bundles[max(config.keep_bundles, 1) :]:
+            if current is not None and os.path.abspath(bundle_dir) == os.path.abspath(
+                current
+            ):
+                continue
+            shutil.rmtree(bundle_dir)
+            deleted.append(bundle_dir)
+        if deleted:
+            logging.info(f"Deleted {len(deleted)} old artifact bundles: {deleted}")
+        return deleted
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def current_bundle_dir(config=None) -> str:
+    """
+    Returns:
+        str: The directory of the current bundle, None if no bundle was published.
+    """
+    config = config or ArtifactBundleConfig()
+    pointer_path = os.path.join(config.bundle_root, CURRENT_FILE)
+    if not os.path.exists(pointer_path):
+        return None
+    with open(pointer_path) as file_obj:
+        return os.path.join(config.bundle_root, file_obj.read().strip())
+
+
+def retire_current_bundle(config=None) -> str:
+    """
+    Remove the CURRENT pointer: servers go back to the .pkl files at their next check.
+    The bundle itself is kept, until pruned.
+
+    Returns:
+        str: The directory of the retired bundle, None if no bundle was current.
+    """
+    try:
+        config = config or ArtifactBundleConfig()
+        bundle_dir = current_bundle_dir(config)
+        if bundle_dir is not None:
+            os.remove(os.path.join(config.bundle_root, CURRENT_FILE))
+            logging.info(f"Artifact bundle {os.path.basename(bundle_dir)} retired")
+        return bundle_dir
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def read_manifest(bundle_dir) -> dict:
+    """
+    Read and check the manifest of a bundle.
+
+    Returns:
+        dict: The manifest.
+    """
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST_FILE)) as file_obj:
+            manifest = json.load(file_obj)
+        if manifest["format_version"] != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported bundle format {manifest['format_version']} in {bundle_dir}"
+            )
+        installed = library_versions()
+        for library, version in manifest["libraries"].items():
+            if installed.get(library, version) != version:
+                logging.warning(
+                    f"Bundle {manifest['version']} was written with {library} {version}, "
+                    f"{installed[library]} is installed"
+                )
+        return manifest
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_bundle_object(bundle_dir, name, manifest=None, mmap_mode="r", verify=False):
+    """
+    Load one artifact of a bundle. Its large arrays are memory-mapped (read-only), not read.
+
+    Arg:
+        bundle_dir (str): The bundle directory.
+        name (str): The artifact name, e.g. "model".
+        manifest (dict): The bundle manifest, read if not given.
+        mmap_mode (str): np.load memory-map mode of the arrays, None to read them.
+        verify (bool): Check the sha256 of the artifact's files first.
+
+    Returns:
+        object: The loaded artifact.
+    """
+    try:
+        manifest = manifest or read_manifest(bundle_dir)
+        artifact = manifest["artifacts"][name]
+        if verify:
+            for file_name, expected in artifact["files"].items():
+                if file_sha256(os.path.join(bundle_dir, file_name)) != expected:
+                    raise ValueError(f"{file_name} of bundle {bundle_dir} is corrupted")
+        with open(os.path.join(bundle_dir, artifact["pickle"]), "rb") as file_obj:
+            return _ArrayUnpickler(
+                file_obj, os.path.join(bundle_dir, "arrays"), mmap_mode
+            ).load()
+    except Exception as e:
+        raise CustomException(e, sys)
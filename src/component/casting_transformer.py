@@ -0,0 +1,41 @@
+from sklearn.compose import ColumnTransformer
+from src.component.numeric_mode import cast_features
+
+
+class CastingColumnTransformer(ColumnTransformer):
+    """
+    ColumnTransformer casting its output to dtype (e.g. float32).
+
+    Used by DataTransformation so that the training arrays and the features built at
+    serving time, with the same pickled preprocessor, share one dtype. With dtype None
+    it behaves as ColumnTransformer.
+    """
+
+    def __init__(
+        self,
+        transformers,
+        *,
+        dtype=None,
+        remainder="drop",
+        sparse_threshold=0.3,
+        n_jobs=None,
+        transformer_weights=None,
+        verbose=False,
+        verbose_feature_names_out=True,
+    ):
+        super().__init__(
+            transformers,
+            remainder=remainder,
+            sparse_threshold=sparse_threshold,
+            n_jobs=n_jobs,
+            transformer_weights=transformer_weights,
+            verbose=verbose,
+            verbose_feature_names_out=verbose_feature_names_out,
+        )
+        self.dtype = dtype
+
+    def fit_transform(self, X, y=None, **params):
+        return cast_features(super().fit_transform(X, y, **params), self.dtype)
+
+    def transform(self, X, **params):
+        return cast_features(super().transform(X, **params), self.dtype)
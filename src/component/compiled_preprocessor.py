@@ -0,0 +1,284 @@
+import sys
+from dataclasses import dataclass
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class NumericalBlock:
+    """
+    Imputer + scaler of numerical columns folded into flat arrays: out = (x - mean) / scale.
+    """
+
+    columns: list
+    fill_values: np.ndarray
+    mean: np.ndarray
+    scale: np.ndarray
+
+    @property
+    def width(self) -> int:
+        return len(self.columns)
+
+
+@dataclass
+class CategoricalBlock:
+    """
+    Imputer + one-hot encoder + scaler of categorical columns folded into lookup tables.
+
+    lookups[i] maps every category of columns[i] to (output column, value), or to None
+    for the dropped category, which encodes as all zeros.
+    """
+
+    columns: list
+    fill_values: list
+    lookups: list
+    width: int
+    ignore_unknown: bool = False
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _compile_numerical(columns, steps) -> NumericalBlock:
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    fill_values = np.full(len(columns), np.nan)
+    mean = np.zeros(len(columns))
+    scale = np.ones(len(columns))
+    for name, step in steps:
+        if isinstance(step, SimpleImputer):
+            fill_values = step.statistics_.astype(np.float64)
+        elif isinstance(step, StandardScaler):
+            if step.mean_ is not None:
+                mean = step.mean_.copy()
+            if step.scale_ is not None:
+                scale = step.scale_.copy()
+        else:
+            raise ValueError(
+                f"Cannot compile step {name} of type {type(step).__name__}"
+            )
+    return NumericalBlock(
+        columns=columns, fill_values=fill_values, mean=mean, scale=scale
+    )
+
+
+def _compile_categorical(columns, steps) -> CategoricalBlock:
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    fill_values = [None] * len(columns)
+    encoder = None
+    inverse_scale = None
+    for name, step in steps:
+        if isinstance(step, SimpleImputer) and encoder is None:
+            fill_values = list(step.statistics_)
+        elif isinstance(step, OneHotEncoder) and encoder is None:
+            if getattr(step, "_infrequent_enabled", False):
+                raise ValueError(
+                    "Cannot compile a OneHotEncoder with infrequent categories"
+                )
+            encoder = step
+        elif isinstance(step, StandardScaler) and encoder is not None:
+            if step.with_mean:
+                raise ValueError(
+                    "Cannot compile a centering scaler after a OneHotEncoder"
+                )
+            # Sparse scaling multiplies by the reciprocal, do the same for identical output
+            inverse_scale = 1 / step.scale_ if step.scale_ is not None else None
+        else:
+            raise ValueError(
+                f"Cannot compile step {name} of type {type(step).__name__}"
+            )
+    if encoder is None:
+        raise ValueError("Categorical pipeline has no OneHotEncoder")
+
+    lookups = []
+    offset = 0
+    drop_idx = encoder.drop_idx_
+    for feature_index, categories in enumerate(encoder.categories_):
+        dropped = None if drop_idx is None else drop_idx[feature_index]
+        lookup = {}
+        for category_index, category in enumerate(categories.tolist()):
+            if dropped is not None and category_index == dropped:
+                lookup[category] = None
+                continue
+            value = 1.0 if inverse_scale is None else 1.0 * inverse_scale[offset]
+            lookup[category] = (offset, value)
+            offset += 1
+        lookups.append(lookup)
+
+    return CategoricalBlock(
+        columns=columns,
+        fill_values=fill_values,
+        lookups=lookups,
+        width=offset,
+        ignore_unknown=encoder.handle_unknown != "error",
+    )
+
+
+class CompiledPreprocessor:
+    # Output dtype, also of compiled preprocessors pickled without one
+    dtype = np.float64
+
+    def __init__(self, blocks, source_sha256=None, dtype=np.float64):
+        """
+        A fitted ColumnTransformer folded into NumPy arrays and lookup tables.
+
+        Transforms a raw record (a dict) into the model input vector without pandas or
+        sklearn dispatch. Produced by compile_preprocessor at training time.
+
+        Attributes:
+            blocks (list): NumericalBlock/CategoricalBlock in ColumnTransformer output order.
+            source_sha256 (str): sha256 of the preprocessor pickle this was compiled from.
+            dtype (np.dtype): Output dtype, that of the sklearn preprocessor's output.
+        """
+        self.blocks = blocks
+        self.source_sha256 = source_sha256
+        self.dtype = np.dtype(dtype)
+        self.n_features_out = sum(block.width for block in blocks)
+
+    def categories(self) -> dict:
+        """
+        Returns:
+            dict: {column: set of categories} the one-hot encoders were fitted with.
+        """
+        return {
+            column: set(lookup)
+            for block in self.blocks
+            if isinstance(block, CategoricalBlock)
+            for column, lookup in zip(block.columns, block.lookups)
+        }
+
+    def transform_record(self, record) -> np.ndarray:
+        """
+        Transform a single raw record.
+
+        Arg:
+            record (dict): {column: value} for every input column.
+
+        Returns:
+            np.ndarray: Array of shape (1, n_features_out).
+        """
+        # Computed in float64 and stored in the output dtype, as the sklearn preprocessor
+        out = np.zeros((1, self.n_features_out), dtype=self.dtype)
+        row = out[0]
+        offset = 0
+        for block in self.blocks:
+            if isinstance(block, NumericalBlock):
+                for i, column in enumerate(block.columns):
+                    value = record.get(column)
+                    value = block.fill_values[i] if _is_missing(value) else float(value)
+                    row[offset + i] = (value - block.mean[i]) / block.scale[i]
+            else:
+                for i, column in enumerate(block.columns):
+                    value = record.get(column)
+                    if _is_missing(value):
+                        value = block.fill_values[i]
+                    lookup = block.lookups[i]
+                    if value not in lookup:
+                        if block.ignore_unknown:
+                            continue
+                        raise ValueError(
+                            f"Found unknown category {value!r} in column {column}"
+                        )
+                    entry = lookup[value]
+                    if entry is not None:
+                        row[offset + entry[0]] = entry[1]
+            offset += block.width
+        return out
+
+    def transform(self, features) -> np.ndarray:
+        """
+        Transform a DataFrame (or a list of records) row by row with the compiled tables.
+
+        Arg:
+            features (pd.DataFrame | list): The raw records.
+
+        Returns:
+            np.ndarray: Array of shape (n_rows, n_features_out).
+        """
+        if hasattr(features, "to_dict"):
+            features = features.to_dict(orient="records")
+        if not features:
+            return np.zeros((0, self.n_features_out), dtype=self.dtype)
+        return np.vstack([self.transform_record(record) for record in features])
+
+
+def compile_preprocessor(preprocessor, source_sha256=None) -> CompiledPreprocessor:
+    """
+    Fold a fitted ColumnTransformer (as built by DataTransformation.get_data_transformer)
+    into a CompiledPreprocessor.
+
+    Arg:
+        preprocessor (ColumnTransformer): The fitted preprocessor.
+        source_sha256 (str): sha256 of the saved preprocessor pickle, used by the serving
+            side to detect a stale compiled preprocessor.
+
+    Returns:
+        CompiledPreprocessor: The compiled preprocessor.
+    """
+    # Training-time only, serving unpickles CompiledPreprocessor without sklearn
+    from sklearn.preprocessing import OneHotEncoder
+
+    try:
+        blocks = []
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or name == "remainder":
+                continue
+            steps = getattr(transformer, "steps", None)
+            if steps is None:
+                raise ValueError(
+                    f"Cannot compile transformer {name}, expected a Pipeline"
+                )
+            if any(isinstance(step, OneHotEncoder) for _, step in steps):
+                blocks.append(_compile_categorical(list(columns), steps))
+            else:
+                blocks.append(_compile_numerical(list(columns), steps))
+        return CompiledPreprocessor(
+            blocks,
+            source_sha256=source_sha256,
+            dtype=getattr(preprocessor, "dtype", None) or np.float64,
+        )
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def verify_compiled_preprocessor(compiled, preprocessor, features, atol=1e-12) -> float:
+    """
+    Check that the compiled preprocessor reproduces the sklearn preprocessor on a frame.
+
+    Arg:
+        compiled (CompiledPreprocessor): The compiled preprocessor.
+        preprocessor (ColumnTransformer): The fitted sklearn preprocessor.
+        features (pd.DataFrame): Raw records to compare on, e.g. the training inputs.
+        atol (float): Maximum absolute difference allowed.
+
+    Returns:
+        float: The maximum absolute difference found.
+    """
+    try:
+        expected = preprocessor.transform(features)
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        actual = compiled.transform(features)
+        if actual.shape != expected.shape:
+            raise ValueError(
+                f"Compiled output shape {actual.shape} differs from {expected.shape}"
+            )
+        max_difference = (
+            float(np.max(np.abs(actual - expected))) if actual.size else 0.0
+        )
+        if max_difference > atol:
+            raise ValueError(
+                f"Compiled preprocessor differs from sklearn by {max_difference}"
+            )
+        logging.info(
+            f"Compiled preprocessor matches sklearn on {len(features)} rows, "
+            f"max difference {max_difference}"
+        )
+        return max_difference
+    except Exception as e:
+        raise CustomException(e, sys)
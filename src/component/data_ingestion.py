@@ -2,11 +2,11 @@ import os
 import sys
 from src.exception import CustomException
 from src.logger import logging
+from src.metrics import timed
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from dataclasses import dataclass
-from src.component.data_transformation import DataTransformation
-from src.component.model_trainer import ModelTrainer
 
 
 @dataclass
@@ -15,6 +15,52 @@ class DataIngestionConfig:
     train_data_path: str = os.path.join("artifacts", "train.csv")
     test_data_path: str = os.path.join("artifacts", "test.csv")
     raw_data_path: str = os.path.join("artifacts", "data.csv")
+    source_data_path: str = os.path.join("notebooks", "data", "stud.csv")
+    test_size: float = 0.3
+    # Read the source in chunks and write Parquet partitions instead of CSV copies
+    streaming: bool = False
+    chunk_size: int = 100_000
+    train_partitions_path: str = os.path.join("artifacts", "train.parquet")
+    test_partitions_path: str = os.path.join("artifacts", "test.parquet")
+    # 16 characters, salts the row hashes of the streaming split
+    split_hash_key: str = "student-split-42"
+
+
+# Compact dtypes of the student export, the scores are 0-100. Nullable Int8: a missing
+# score is read as NA and left to the numerical imputer (rows hash as with int8)
+INGESTION_DTYPES = {
+    "gender": "category",
+    "race_ethnicity": "category",
+    "parental_level_of_education": "category",
+    "lunch": "category",
+    "test_preparation_course": "category",
+    "math_score": "Int8",
+    "reading_score": "Int8",
+    "writing_score": "Int8",
+}
+
+
+def hash_split_mask(df, test_size, hash_key) -> np.ndarray:
+    """
+    Deterministic per-row train/test assignment.
+
+    Every row goes to the test set when the hash of its content falls in the lowest
+    test_size fraction of the hash range, so the split needs no global shuffle and does
+    not depend on chunking or row order (identical rows always land on the same side).
+
+    Arg:
+        df (pd.DataFrame): The rows to assign.
+        test_size (float): Expected fraction of test rows.
+        hash_key (str): 16 character salt of the row hashes.
+
+    Returns:
+        np.ndarray: Boolean mask, True for test rows.
+    """
+    if test_size >= 1:
+        # 2**64 does not fit the uint64 threshold
+        return np.ones(len(df), dtype=bool)
+    row_hashes = pd.util.hash_pandas_object(df, index=False, hash_key=hash_key)
+    return row_hashes.to_numpy() < np.uint64(max(test_size, 0.0) * float(2**64))
 
 
 class DataIngestion:
@@ -39,28 +85,36 @@ class DataIngestion:
             A tuple containing the file paths for the train and test data
         """
         logging.info("Enter data ingestion component")
+        if self.ingestion_config.streaming:
+            return self.initiate_streaming_data_ingestion()
         try:
-            df = pd.read_csv("notebooks/data/stud.csv")
+            with timed("training", "ingestion.read"):
+                df = pd.read_csv(self.ingestion_config.source_data_path)
             logging.info("Read the dataset as dataframe")
             directory = os.path.dirname(
                 self.ingestion_config.train_data_path
             )  # Create artifacts folder
             os.makedirs(directory, exist_ok=True)
 
-            df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
+            with timed("training", "ingestion.write_raw"):
+                df.to_csv(self.ingestion_config.raw_data_path, index=False, header=True)
             logging.info(
                 f"Dataframe shape: {df.shape}, \nDataframe columns: {list(df.columns)}"
             )
 
             logging.info("Train test split initiated")
-            train_set, test_set = train_test_split(df, test_size=0.3, random_state=42)
-            train_set.to_csv(
-                self.ingestion_config.train_data_path, index=False, header=True
-            )
+            with timed("training", "ingestion.split"):
+                train_set, test_set = train_test_split(
+                    df, test_size=self.ingestion_config.test_size, random_state=42
+                )
+            with timed("training", "ingestion.write_splits"):
+                train_set.to_csv(
+                    self.ingestion_config.train_data_path, index=False, header=True
+                )
+                test_set.to_csv(
+                    self.ingestion_config.test_data_path, index=False, header=True
+                )
             logging.info(f"Train dataframe shape: {train_set.shape}")
-            test_set.to_csv(
-                self.ingestion_config.test_data_path, index=False, header=True
-            )
             logging.info(f"Test dataframe shape: {test_set.shape}.")
             logging.info("Data ingestion process completed successfully.")
 
@@ -71,15 +125,82 @@ class DataIngestion:
         except Exception as e:
             raise CustomException(e, sys)
 
+    def initiate_streaming_data_ingestion(self):
+        """
+        Streaming variant of initiate_data_ingestion for exports too large for memory.
 
-if __name__ == "__main__":
-    obj = DataIngestion()
-    train_data, test_data = obj.initiate_data_ingestion()
-    data_transformation = DataTransformation()
-    train_array, test_array, _ = data_transformation.initiate_data_transformation(
-        train_data, test_data
-    )
+        The source CSV is read chunk_size rows at a time with compact dtypes (category
+        for the text columns, nullable Int8 for the scores). Each chunk is split with
+        hash_split_mask and its train and test rows are appended as one Parquet file to
+        the train and test partition directories, so peak memory is bounded by the chunk
+        size. The raw copy is not written, it is the union of the two partitions.
+
+        Return:
+            A tuple containing the train and test partition directories, readable with
+            src.utils.read_dataframe.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            config = self.ingestion_config
+            partition_paths = {
+                "train": config.train_partitions_path,
+                "test": config.test_partitions_path,
+            }
+            for partition_path in partition_paths.values():
+                # Partitions of a previous run must not be mixed in
+                if os.path.isdir(partition_path):
+                    for file_name in os.listdir(partition_path):
+                        if file_name.endswith(".parquet"):
+                            os.remove(os.path.join(partition_path, file_name))
+                os.makedirs(partition_path, exist_ok=True)
+
+            rows = {"train": 0, "test": 0}
+            chunks = pd.read_csv(
+                config.source_data_path,
+                dtype=INGESTION_DTYPES,
+                chunksize=config.chunk_size,
+            )
+            for chunk_index, chunk in enumerate(chunks):
+                with timed("training", "ingestion.split"):
+                    test_mask = hash_split_mask(
+                        chunk, config.test_size, config.split_hash_key
+                    )
+                for split, split_chunk in (
+                    ("train", chunk[~test_mask]),
+                    ("test", chunk[test_mask]),
+                ):
+                    if split_chunk.empty:
+                        continue
+                    with timed("training", "ingestion.write_splits"):
+                        pq.write_table(
+                            pa.Table.from_pandas(split_chunk, preserve_index=False),
+                            os.path.join(
+                                partition_paths[split],
+                                f"part-{chunk_index:05d}.parquet",
+                            ),
+                        )
+                    rows[split] += len(split_chunk)
+                logging.info(
+                    f"Ingested chunk {chunk_index}: {len(chunk)} rows, "
+                    f"{chunk.memory_usage(deep=True).sum() / 1e6:.2f} MB in memory"
+                )
 
-    model_trainer = ModelTrainer()
+            logging.info(
+                f"Streaming ingestion completed: {rows['train']} train rows, "
+                f"{rows['test']} test rows"
+            )
+            return (
+                config.train_partitions_path,
+                config.test_partitions_path,
+            )
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    # Ingestion, transformation and training, skipping the stages that are up to date
+    from src.pipeline.training_pipeline import TrainingPipeline
 
-    model_trainer.initiate_model_trainer(train_array, test_array)
+    TrainingPipeline().initiate_training_pipeline()
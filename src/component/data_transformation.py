@@ -2,19 +2,51 @@ import sys
 from dataclasses import dataclass
 import numpy as np
 import pandas as pd
-from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 import os
 from src.exception import CustomException
 from src.logger import logging
-from src.utils import save_object
+from src.metrics import timed
+from src.utils import (
+    file_sha256,
+    iter_dataframe,
+    read_dataframe,
+    save_array,
+    save_object,
+)
+from src.component.incremental_preprocessor import fit_preprocessor_incrementally
+from src.component.compiled_preprocessor import (
+    compile_preprocessor,
+    verify_compiled_preprocessor,
+)
+from src.component.casting_transformer import CastingColumnTransformer
+from src.component.numeric_mode import memory_report
 
 
 @dataclass
 class DataTransformationConfig:
-    preprocessor_file_path: str = os.path.join("artifacts", "Preprocessing.pkl")
+    preprocessor_file_path: str = os.path.join("artifacts", "preprocessing.pkl")
+    compiled_preprocessor_file_path: str = os.path.join(
+        "artifacts", "compiled_preprocessing.pkl"
+    )
+    # Features (.npy, or .npz when the preprocessor output is sparse) and targets handed
+    # to the trainer
+    train_features_file_path: str = os.path.join("artifacts", "train_features.npy")
+    train_target_file_path: str = os.path.join("artifacts", "train_target.npy")
+    test_features_file_path: str = os.path.join("artifacts", "test_features.npy")
+    test_target_file_path: str = os.path.join("artifacts", "test_target.npy")
+    # Fit the preprocessor and transform the data chunk by chunk, for data bigger than RAM
+    incremental: bool = False
+    chunk_size: int = 100_000
+    target_column: str = "math_score"
+    # dtype of the features, "float32" halves the arrays of the trainer and the serving
+    # inputs; the tree libraries compare float32 features anyway
+    feature_dtype: str = "float64"
+    # Keep the one-hot encoded features sparse (CSR) whatever their density, for the
+    # models that consume sparse input (see numeric_mode.DENSE_INPUT_MODULES)
+    sparse_features: bool = False
 
 
 class DataTransformation:
@@ -28,6 +60,7 @@ class DataTransformation:
             preprocessor: ColumnTransformer object that contains the numerical and categorical pipeline
         """
         try:
+            config = self.data_transformation_config
             numerical_features = ["writing_score", "reading_score"]
             categorical_features = [
                 "gender",
@@ -47,13 +80,16 @@ class DataTransformation:
             categorical_pipeline = Pipeline(
                 steps=[
                     ("imputer", SimpleImputer(strategy="most_frequent")),
-                    ("one_hot_encoder", OneHotEncoder(drop="first")),
+                    (
+                        "one_hot_encoder",
+                        OneHotEncoder(drop="first", dtype=config.feature_dtype),
+                    ),
                     ("scaler", StandardScaler(with_mean=False)),
                 ]
             )
             logging.info("Categorical columns transformed.")
 
-            preprocessor = ColumnTransformer(
+            preprocessor = CastingColumnTransformer(
                 transformers=[
                     ("numerical_pipeline", numerical_pipeline, numerical_features),
                     (
@@ -61,23 +97,170 @@ class DataTransformation:
                         categorical_pipeline,
                         categorical_features,
                     ),
-                ]
+                ],
+                dtype=config.feature_dtype,
+                # Sparse output below this density, 1.0 keeps it sparse
+                sparse_threshold=1.0 if config.sparse_features else 0.3,
             )
             return preprocessor
         except Exception as e:
             raise CustomException(e, sys)
 
+    def save_preprocessor(self, preprocessor_object, features):
+        """
+        Save the fitted preprocessor and its compiled single-row form.
+
+        Arg:
+            preprocessor_object (ColumnTransformer): The fitted preprocessor.
+            features (pd.DataFrame): Feature rows the compiled form is checked on.
+        """
+        with timed("training", "transformation.save_preprocessor"):
+            save_object(
+                file_path=self.data_transformation_config.preprocessor_file_path,
+                obj=preprocessor_object,
+            )
+
+        logging.info("Preprocessing object saved")
+
+        # Compiled single-row fast path for serving, checked against sklearn first
+        with timed("training", "transformation.compile_preprocessor"):
+            compiled_preprocessor = compile_preprocessor(
+                preprocessor_object,
+                source_sha256=file_sha256(
+                    self.data_transformation_config.preprocessor_file_path
+                ),
+            )
+            verify_compiled_preprocessor(
+                compiled_preprocessor, preprocessor_object, features
+            )
+            save_object(
+                file_path=self.data_transformation_config.compiled_preprocessor_file_path,
+                obj=compiled_preprocessor,
+            )
+        logging.info("Compiled preprocessing object saved")
+
+    def transform_to_files(
+        self, preprocessor_object, data_path, features_file_path, target_file_path
+    ) -> tuple:
+        """
+        Transform a dataset chunk by chunk into the feature and target array files.
+
+        Dense features are written into a memory-mapped .npy, sparse ones are stacked
+        (they are compact) and saved as .npz.
+
+        Returns:
+            tuple: (features path, target path)
+        """
+        config = self.data_transformation_config
+        n_rows = sum(
+            len(chunk)
+            for chunk in iter_dataframe(
+                data_path, config.chunk_size, columns=[config.target_column]
+            )
+        )
+        if not n_rows:
+            raise ValueError(f"{data_path} has no rows to transform")
+        features = None
+        targets = []
+        row = 0
+        for chunk in iter_dataframe(data_path, config.chunk_size):
+            with timed("training", "transformation.transform"):
+                transformed = preprocessor_object.transform(
+                    chunk.drop(columns=[config.target_column])
+                )
+            targets.append(chunk[config.target_column].to_numpy(dtype=np.float64))
+            if preprocessor_object.sparse_output_:
+                features = (features or []) + [transformed]
+                continue
+            if features is None:
+                tmp_path = f"{os.path.splitext(features_file_path)[0]}.tmp.npy"
+                os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+                features = np.lib.format.open_memmap(
+                    tmp_path,
+                    mode="w+",
+                    dtype=transformed.dtype,
+                    shape=(n_rows, transformed.shape[1]),
+                )
+            features[row : row + len(chunk)] = transformed
+            row += len(chunk)
+
+        if preprocessor_object.sparse_output_:
+            from scipy import sparse
+
+            features_file_path = save_array(features_file_path, sparse.vstack(features))
+        else:
+            features.flush()
+            del features
+            features_file_path = f"{os.path.splitext(features_file_path)[0]}.npy"
+            os.replace(tmp_path, features_file_path)
+        return (
+            features_file_path,
+            save_array(target_file_path, np.concatenate(targets)),
+        )
+
+    def initiate_incremental_data_transformation(self, train_path, test_path):
+        """
+        Out-of-core variant of initiate_data_transformation.
+
+        The preprocessor is fitted from chunks of the training set with
+        IncrementalPreprocessorFitter (same fitted preprocessor as one fit_transform),
+        then train and test are transformed chunk by chunk into the array files, so no
+        full dataset is ever held in memory.
+
+        Returns:
+            tuple: (train features path, train target path), (test features path, test
+                target path) and the preprocessor path.
+        """
+        try:
+            config = self.data_transformation_config
+            with timed("training", "transformation.fit"):
+                preprocessor_object = fit_preprocessor_incrementally(
+                    self.get_data_transformer(),
+                    (
+                        chunk.drop(columns=[config.target_column])
+                        for chunk in iter_dataframe(train_path, config.chunk_size)
+                    ),
+                )
+            # The compiled preprocessor is checked on the first chunk of each set
+            samples = [
+                next(iter_dataframe(path, config.chunk_size)).drop(
+                    columns=[config.target_column]
+                )
+                for path in (train_path, test_path)
+            ]
+            self.save_preprocessor(preprocessor_object, pd.concat(samples))
+
+            train_set = self.transform_to_files(
+                preprocessor_object,
+                train_path,
+                config.train_features_file_path,
+                config.train_target_file_path,
+            )
+            test_set = self.transform_to_files(
+                preprocessor_object,
+                test_path,
+                config.test_features_file_path,
+                config.test_target_file_path,
+            )
+            logging.info(f"Train and test arrays saved: {train_set}, {test_set}")
+            return train_set, test_set, config.preprocessor_file_path
+        except Exception as e:
+            raise CustomException(e, sys)
+
     def initiate_data_transformation(self, train_path, test_path):
+        if self.data_transformation_config.incremental:
+            return self.initiate_incremental_data_transformation(train_path, test_path)
         try:
-            train_df = pd.read_csv(train_path)
-            test_df = pd.read_csv(test_path)
+            with timed("training", "transformation.read"):
+                train_df = read_dataframe(train_path)
+                test_df = read_dataframe(test_path)
 
             logging.info("Load train and test data completed")
             logging.info("Obtaining preprocessing object")
             # start preprocessor object
             preprocessor_object = self.get_data_transformer()
 
-            target_column = "math_score"
+            target_column = self.data_transformation_config.target_column
             input_feature_train_df = train_df.drop(columns=[target_column], axis=1)
             target_feature_train_df = train_df[target_column]
 
@@ -87,31 +270,53 @@ class DataTransformation:
             logging.info(f"Training columns: {input_feature_train_df.columns.tolist()}")
             logging.info(f"Target columns: {[target_column]}")
 
-            input_feature_train_array = preprocessor_object.fit_transform(
-                input_feature_train_df
-            )
-            input_feature_test_array = preprocessor_object.transform(
-                input_feature_test_df
-            )
+            with timed("training", "transformation.fit"):
+                input_feature_train_array = preprocessor_object.fit_transform(
+                    input_feature_train_df
+                )
+            with timed("training", "transformation.transform"):
+                input_feature_test_array = preprocessor_object.transform(
+                    input_feature_test_df
+                )
 
-            # np.c_ used to concentate arrays horizontally -side by side
-            train_array = np.c_[
-                input_feature_train_array, np.array(target_feature_train_df)
-            ]
-            test_array = np.c_[
-                input_feature_test_array, np.array(target_feature_test_df)
-            ]
-
-            save_object(
-                file_path=self.data_transformation_config.preprocessor_file_path,
-                obj=preprocessor_object,
+            # Features and target are written separately (sparse output stays sparse) so
+            # the trainer can memory-map them instead of receiving a concatenated copy
+            config = self.data_transformation_config
+            with timed("training", "transformation.save_arrays"):
+                train_set = (
+                    save_array(
+                        config.train_features_file_path, input_feature_train_array
+                    ),
+                    save_array(
+                        config.train_target_file_path,
+                        np.asarray(target_feature_train_df, dtype=np.float64),
+                    ),
+                )
+                test_set = (
+                    save_array(
+                        config.test_features_file_path, input_feature_test_array
+                    ),
+                    save_array(
+                        config.test_target_file_path,
+                        np.asarray(target_feature_test_df, dtype=np.float64),
+                    ),
+                )
+            logging.info(
+                f"Feature memory with {config.feature_dtype}"
+                f"{' sparse' if config.sparse_features else ''} features: "
+                f"{memory_report([input_feature_train_array, input_feature_test_array])}"
             )
+            del input_feature_train_array, input_feature_test_array
+            logging.info(f"Train and test arrays saved: {train_set}, {test_set}")
 
-            logging.info("Preprocessing object saved")
+            self.save_preprocessor(
+                preprocessor_object,
+                pd.concat([input_feature_train_df, input_feature_test_df]),
+            )
 
             return (
-                train_array,
-                test_array,
+                train_set,
+                test_set,
                 self.data_transformation_config.preprocessor_file_path,
             )
         except Exception as e:
@@ -0,0 +1,284 @@
+import sys
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+
+
+class RunningMoments:
+    def __init__(self):
+        """
+        Count, mean and sum of squared deviations of a stream of values, merged chunk by
+        chunk (Chan et al.'s parallel form of Welford's algorithm).
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def merge(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            mean = values.mean()
+            self.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+
+class StreamingMedian:
+    def __init__(self, max_distinct=100_000, reservoir_size=100_000, random_state=42):
+        """
+        Median of a stream of values.
+
+        Exact while the stream has at most max_distinct distinct values (value counts are
+        kept, scores have about a hundred), then estimated from a uniform random sample of
+        reservoir_size values, which is maintained all along.
+        """
+        self.max_distinct = max_distinct
+        self.reservoir_size = reservoir_size
+        self.random_state = np.random.RandomState(random_state)
+        self.counts = {}
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if self.counts is not None:
+            unique, counts = np.unique(values, return_counts=True)
+            for value, count in zip(unique.tolist(), counts.tolist()):
+                self.counts[value] = self.counts.get(value, 0) + count
+            if len(self.counts) > self.max_distinct:
+                logging.info("Too many distinct values, the median is now estimated")
+                self.counts = None
+
+        # Keeping the values with the smallest random keys is a uniform sample of the stream
+        sample = np.concatenate([self.sample, values])
+        keys = np.concatenate([self.sample_keys, self.random_state.rand(len(values))])
+        if len(sample) > self.reservoir_size:
+            keep = np.argpartition(keys, self.reservoir_size)[: self.reservoir_size]
+            sample, keys = sample[keep], keys[keep]
+        self.sample, self.sample_keys = sample, keys
+
+    def is_exact(self) -> bool:
+        return self.counts is not None
+
+    def median(self) -> float:
+        if self.counts is None:
+            return float(np.median(self.sample))
+        if not self.counts:
+            return np.nan
+        values = np.array(sorted(self.counts))
+        cumulative = np.cumsum([self.counts[value] for value in values])
+        total = cumulative[-1]
+        # Values at the two middle ranks, averaged as np.median does
+        lower = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+        upper = values[np.searchsorted(cumulative, total // 2, side="right")]
+        return (lower + upper) / 2
+
+
+class IncrementalPreprocessorFitter:
+    def __init__(self, preprocessor, max_distinct=100_000, reservoir_size=100_000):
+        """
+        Fit the DataTransformation ColumnTransformer from chunks of the training set.
+
+        Every chunk only updates small per-column statistics: value counts (or a sample)
+        for the numerical medians, running count/mean/variance of the observed numerical
+        values, and category counts of the categorical columns. finalize() turns them into
+        the fitted ColumnTransformer that preprocessor.fit on the full frame would give:
+        median imputation, StandardScaler on the imputed numbers, most frequent category
+        imputation (smallest value on ties, as SimpleImputer), OneHotEncoder(drop="first")
+        with the sorted categories and StandardScaler(with_mean=False) of the one-hot
+        columns. Memory does not grow with the number of rows.
+
+        Attributes:
+            preprocessor (ColumnTransformer): Unfitted preprocessor from
+                DataTransformation.get_data_transformer.
+        """
+        self.preprocessor = preprocessor
+        self.numerical_features, self.categorical_features = self._feature_columns()
+        self.n_samples = 0
+        self.medians = {
+            column: StreamingMedian(max_distinct, reservoir_size)
+            for column in self.numerical_features
+        }
+        self.moments = {column: RunningMoments() for column in self.numerical_features}
+        self.missing = {column: 0 for column in self.numerical_features}
+        self.category_counts = {column: {} for column in self.categorical_features}
+        # Column order of the first chunk, the skeleton is fitted with the same
+        self.columns = None
+
+    def _feature_columns(self) -> tuple:
+        columns = dict(
+            (name, columns) for name, _, columns in self.preprocessor.transformers
+        )
+        return (
+            list(columns["numerical_pipeline"]),
+            list(columns["categorical_pipeline"]),
+        )
+
+    def partial_fit(self, df):
+        """
+        Update the statistics with one chunk of the training features.
+
+        Arg:
+            df (pd.DataFrame): A chunk with the numerical and categorical feature columns.
+        """
+        try:
+            if self.columns is None:
+                self.columns = list(df.columns)
+            self.n_samples += len(df)
+            for column in self.numerical_features:
+                values = pd.to_numeric(df[column]).to_numpy(dtype=np.float64)
+                observed = values[~np.isnan(values)]
+                self.missing[column] += len(values) - len(observed)
+                self.medians[column].update(observed)
+                self.moments[column].update(observed)
+            for column in self.categorical_features:
+                counts = self.category_counts[column]
+                values = df[column].astype(object)
+                for value, count in values[values.notna()].value_counts().items():
+                    if count:
+                        counts[value] = counts.get(value, 0) + int(count)
+            return self
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _skeleton(self) -> pd.DataFrame:
+        """
+        A small frame containing every category, fitting the preprocessor on it sets up
+        all the fitted structure (encoder categories, feature names) to be patched.
+        """
+        n_rows = max(2, *(len(counts) for counts in self.category_counts.values()))
+        skeleton = {}
+        for column in self.numerical_features:
+            skeleton[column] = np.arange(n_rows, dtype=np.float64)
+        for column in self.categorical_features:
+            categories = sorted(self.category_counts[column])
+            skeleton[column] = [categories[i % len(categories)] for i in range(n_rows)]
+        # Columns the preprocessor drops only need to exist
+        return pd.DataFrame(skeleton).reindex(columns=self.columns, fill_value=0)
+
+    def finalize(self):
+        """
+        Build the fitted preprocessor from the accumulated statistics.
+
+        Returns:
+            ColumnTransformer: The fitted preprocessor.
+        """
+        try:
+            for column, counts in self.category_counts.items():
+                if not counts:
+                    raise ValueError(f"No value seen in categorical column {column}")
+            preprocessor = self.preprocessor.fit(self._skeleton())
+            pipelines = {
+                name: pipeline for name, pipeline, _ in preprocessor.transformers_
+            }
+
+            # Numerical pipeline: median imputation, then the moments of the imputed
+            # column (the missing values become n_missing copies of the median)
+            numerical = pipelines["numerical_pipeline"]
+            medians = np.array(
+                [self.medians[column].median() for column in self.numerical_features]
+            )
+            means, variances = [], []
+            for column, median in zip(self.numerical_features, medians):
+                moments = RunningMoments()
+                moments.merge(
+                    self.moments[column].count,
+                    self.moments[column].mean,
+                    self.moments[column].m2,
+                )
+                moments.merge(self.missing[column], median, 0.0)
+                means.append(moments.mean)
+                variances.append(moments.variance())
+            numerical.named_steps["imputer"].statistics_ = medians
+            self._set_scaler(
+                numerical.named_steps["scaler"],
+                np.array(means),
+                np.array(variances),
+                np.int64(self.n_samples),
+            )
+
+            # Categorical pipeline: the most frequent category fills the missing values,
+            # each one-hot column is then a Bernoulli variable
+            categorical = pipelines["categorical_pipeline"]
+            most_frequent = []
+            column_means = []
+            nonzero = 0
+            encoder = categorical.named_steps["one_hot_encoder"]
+            for index, column in enumerate(self.categorical_features):
+                counts = dict(self.category_counts[column])
+                top_count = max(counts.values())
+                top = min(
+                    value for value, count in counts.items() if count == top_count
+                )
+                most_frequent.append(top)
+                counts[top] += self.n_samples - sum(counts.values())
+                categories = encoder.categories_[index]
+                kept = np.delete(categories, encoder.drop_idx_[index])
+                frequencies = (
+                    np.array([counts[value] for value in kept]) / self.n_samples
+                )
+                column_means.append(frequencies)
+                nonzero += sum(counts[value] for value in kept)
+            column_means = np.concatenate(column_means)
+            categorical.named_steps["imputer"].statistics_ = np.array(
+                most_frequent, dtype=object
+            )
+            self._set_scaler(
+                categorical.named_steps["scaler"],
+                column_means,
+                column_means * (1 - column_means),
+                np.float64(self.n_samples),
+            )
+
+            # ColumnTransformer picks sparse output from the density of the whole output,
+            # counting dense blocks as full
+            n_numerical = len(self.numerical_features)
+            total = self.n_samples * (n_numerical + len(column_means))
+            density = (self.n_samples * n_numerical + nonzero) / total
+            preprocessor.sparse_output_ = density < preprocessor.sparse_threshold
+
+            logging.info(
+                f"Preprocessor fitted incrementally on {self.n_samples} rows, exact "
+                f"medians: {all(m.is_exact() for m in self.medians.values())}"
+            )
+            return preprocessor
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @staticmethod
+    def _set_scaler(scaler, mean, variance, n_samples):
+        scale = np.sqrt(variance)
+        # Constant columns are left unscaled, as StandardScaler does
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        scaler.mean_ = mean
+        scaler.var_ = variance
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = n_samples
+
+
+def fit_preprocessor_incrementally(preprocessor, chunks, **kwargs):
+    """
+    Fit the preprocessor from an iterable of feature DataFrames.
+
+    Arg:
+        preprocessor (ColumnTransformer): Unfitted DataTransformation preprocessor.
+        chunks (iterable): DataFrames with the feature columns.
+
+    Returns:
+        ColumnTransformer: The fitted preprocessor.
+    """
+    fitter = IncrementalPreprocessorFitter(preprocessor, **kwargs)
+    for chunk in chunks:
+        fitter.partial_fit(chunk)
+    return fitter.finalize()
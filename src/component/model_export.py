@@ -0,0 +1,306 @@
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+
+
+class LinearModel:
+    def __init__(self, coef, intercept, source_sha256=None):
+        """
+        A fitted linear regressor reduced to its coefficient vector.
+
+        Attributes:
+            coef (np.ndarray): Coefficients, shape (n_features,).
+            intercept (float): The intercept.
+            source_sha256 (str): sha256 of the model pickle this was exported from.
+        """
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.source_sha256 = source_sha256
+
+    def predict(self, X) -> np.ndarray:
+        X = X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+        return X @ self.coef + self.intercept
+
+
+class TreeEnsembleModel:
+    def __init__(
+        self,
+        trees,
+        weights,
+        base_score,
+        strict=False,
+        source_sha256=None,
+    ):
+        """
+        A tree ensemble flattened into node arrays and evaluated from NumPy alone.
+
+        The nodes of all trees are packed into shared arrays; children are global node
+        indices and -1 marks a leaf. Every row walks every tree at once, one level per
+        step, so a batch costs max_depth vectorized gathers.
+
+        prediction = base_score + sum(weights[t] * leaf_value(tree t))
+
+        Arg:
+            trees (list): One dict per tree with the local node arrays feature, threshold,
+                left, right, value and default_left (branch taken by missing values).
+            weights (array): Weight of every tree in the sum.
+            base_score (float): Constant added to the sum.
+            strict (bool): Go left when x < threshold (XGBoost) instead of x <= threshold.
+            source_sha256 (str): sha256 of the model pickle this was exported from.
+        """
+        packed = {key: [] for key in ("feature", "threshold", "left", "right", "value")}
+        packed["default_left"] = []
+        roots = []
+        offset = 0
+        for tree in trees:
+            left = np.asarray(tree["left"], dtype=np.int64)
+            right = np.asarray(tree["right"], dtype=np.int64)
+            roots.append(offset)
+            packed["feature"].append(np.asarray(tree["feature"], dtype=np.int64))
+            packed["threshold"].append(np.asarray(tree["threshold"], dtype=np.float64))
+            packed["left"].append(np.where(left >= 0, left + offset, -1))
+            packed["right"].append(np.where(right >= 0, right + offset, -1))
+            packed["value"].append(np.asarray(tree["value"], dtype=np.float64))
+            packed["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+            offset += len(left)
+        packed = {key: np.concatenate(arrays) for key, arrays in packed.items()}
+
+        is_leaf = packed["left"] < 0
+        # Leaves point to themselves, the traversal then needs no leaf mask
+        node_ids = np.arange(offset)
+        self.left = np.where(is_leaf, node_ids, packed["left"])
+        self.right = np.where(is_leaf, node_ids, packed["right"])
+        self.feature = np.where(is_leaf, 0, packed["feature"])
+        self.threshold = packed["threshold"]
+        self.value = packed["value"]
+        self.default_left = packed["default_left"]
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.base_score = float(base_score)
+        self.strict = strict
+        self.source_sha256 = source_sha256
+        self.max_depth = self._max_depth(is_leaf)
+
+    def _max_depth(self, is_leaf) -> int:
+        depth = 0
+        nodes = self.roots
+        while not is_leaf[nodes].all():
+            nodes = np.concatenate(
+                [self.left[nodes[~is_leaf[nodes]]], self.right[nodes[~is_leaf[nodes]]]]
+            )
+            depth += 1
+        return depth
+
+    def predict(self, X) -> np.ndarray:
+        X = X.toarray() if hasattr(X, "toarray") else np.asarray(X)
+        # Tree libraries compare float32 features
+        X = X.astype(np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            threshold = self.threshold[nodes]
+            go_left = x < threshold if self.strict else x <= threshold
+            go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.base_score + self.value[nodes] @ self.weights
+
+
+def _sklearn_tree(estimator) -> dict:
+    tree = estimator.tree_
+    missing_go_to_left = getattr(tree, "missing_go_to_left", None)
+    return {
+        "feature": tree.feature,
+        "threshold": tree.threshold,
+        "left": tree.children_left,
+        "right": tree.children_right,
+        "value": tree.value[:, 0, 0],
+        "default_left": (
+            missing_go_to_left.astype(bool)
+            if missing_go_to_left is not None
+            else np.zeros(tree.node_count, dtype=bool)
+        ),
+    }
+
+
+def _export_xgboost(model, source_sha256) -> TreeEnsembleModel:
+    learner = json.loads(model.get_booster().save_raw("json"))["learner"]
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise ValueError("Only gbtree XGBoost boosters can be exported")
+    if learner["objective"]["name"] not in ("reg:squarederror", "reg:absoluteerror"):
+        raise ValueError(
+            f"Unsupported XGBoost objective {learner['objective']['name']}"
+        )
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+    trees = []
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        left = np.asarray(tree["left_children"])
+        trees.append(
+            {
+                "feature": tree["split_indices"],
+                # Leaf values are stored in split_conditions on leaf nodes
+                "threshold": np.asarray(tree["split_conditions"], dtype=np.float32),
+                "left": left,
+                "right": tree["right_children"],
+                "value": np.where(left < 0, tree["split_conditions"], 0.0),
+                "default_left": tree["default_left"],
+            }
+        )
+    return TreeEnsembleModel(
+        trees, np.ones(len(trees)), base_score, strict=True, source_sha256=source_sha256
+    )
+
+
+def _oblivious_tree(splits, leaf_values, flat_index) -> dict:
+    """
+    Expand a CatBoost oblivious tree into explicit nodes. The split at depth d sets bit d
+    of the leaf index when x > border.
+    """
+    depth = len(splits)
+    tree = {key: [] for key in ("feature", "threshold", "left", "right", "value")}
+
+    def add_node(level, leaf_index):
+        node = len(tree["left"])
+        for key in tree:
+            tree[key].append(0)
+        if level == depth:
+            tree["left"][node] = tree["right"][node] = -1
+            tree["value"][node] = leaf_values[leaf_index]
+            return node
+        split = splits[level]
+        tree["feature"][node] = flat_index[split["float_feature_index"]]
+        tree["threshold"][node] = np.float32(split["border"])
+        tree["left"][node] = add_node(level + 1, leaf_index)
+        tree["right"][node] = add_node(level + 1, leaf_index | (1 << level))
+        return node
+
+    add_node(0, 0)
+    # CatBoost's default nan treatment ("Min") sends missing values to the x <= border side
+    tree["default_left"] = [True] * len(tree["left"])
+    return tree
+
+
+def _export_catboost(model, source_sha256) -> TreeEnsembleModel:
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "model.json")
+        model.save_model(file_path, format="json")
+        with open(file_path) as file_obj:
+            model_json = json.load(file_obj)
+
+    features_info = model_json["features_info"]
+    if features_info.get("categorical_features"):
+        raise ValueError("CatBoost models with categorical features cannot be exported")
+    flat_index = {
+        feature["feature_index"]: feature["flat_feature_index"]
+        for feature in features_info["float_features"]
+    }
+    scale, bias = model_json["scale_and_bias"]
+    trees = [
+        _oblivious_tree(tree["splits"], tree["leaf_values"], flat_index)
+        for tree in model_json["oblivious_trees"]
+    ]
+    return TreeEnsembleModel(
+        trees,
+        np.full(len(trees), scale),
+        bias[0] if isinstance(bias, list) else bias,
+        source_sha256=source_sha256,
+    )
+
+
+def export_model(model, source_sha256=None):
+    """
+    Convert a fitted regressor into a compact NumPy-only model.
+
+    Supported: linear models, DecisionTree, RandomForest/ExtraTrees, GradientBoosting,
+    XGBoost (gbtree) and CatBoost regressors.
+
+    Arg:
+        model (object): The fitted estimator.
+        source_sha256 (str): sha256 of the saved model pickle, used by the serving side to
+            detect a stale export.
+
+    Returns:
+        LinearModel | TreeEnsembleModel: The exported model.
+    """
+    try:
+        model_type = type(model).__name__
+        if hasattr(model, "coef_") and hasattr(model, "intercept_"):
+            return LinearModel(model.coef_, model.intercept_, source_sha256)
+
+        if model_type == "DecisionTreeRegressor":
+            return TreeEnsembleModel(
+                [_sklearn_tree(model)], [1.0], 0.0, source_sha256=source_sha256
+            )
+
+        if model_type in ("RandomForestRegressor", "ExtraTreesRegressor"):
+            trees = [_sklearn_tree(estimator) for estimator in model.estimators_]
+            return TreeEnsembleModel(
+                trees,
+                np.full(len(trees), 1 / len(trees)),
+                0.0,
+                source_sha256=source_sha256,
+            )
+
+        if model_type == "GradientBoostingRegressor":
+            trees = [_sklearn_tree(estimator) for estimator in model.estimators_[:, 0]]
+            if model.init_ == "zero":
+                base_score = 0.0
+            else:
+                base_score = float(
+                    np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[
+                        0
+                    ]
+                )
+            return TreeEnsembleModel(
+                trees,
+                np.full(len(trees), model.learning_rate),
+                base_score,
+                source_sha256=source_sha256,
+            )
+
+        if model_type == "XGBRegressor":
+            return _export_xgboost(model, source_sha256)
+
+        if model_type == "CatBoostRegressor":
+            return _export_catboost(model, source_sha256)
+
+        raise ValueError(f"Export of {model_type} is not supported")
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def verify_exported_model(exported, model, X, atol=1e-3) -> float:
+    """
+    Check that the exported model reproduces the original model's predictions.
+
+    Arg:
+        exported (object): The model returned by export_model.
+        model (object): The original fitted estimator.
+        X (array): Inputs to compare on, e.g. the test features.
+        atol (float): Maximum absolute difference allowed.
+
+    Returns:
+        float: The maximum absolute difference found.
+    """
+    try:
+        expected = np.ravel(model.predict(X))
+        actual = exported.predict(X)
+        max_difference = (
+            float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+        )
+        if max_difference > atol:
+            raise ValueError(
+                f"Exported model differs from the original by {max_difference}"
+            )
+        logging.info(
+            f"Exported {type(exported).__name__} matches {type(model).__name__} on "
+            f"{len(expected)} rows, max difference {max_difference}"
+        )
+        return max_difference
+    except Exception as e:
+        raise CustomException(e, sys)
@@ -1,122 +1,579 @@
 import os
 import sys
 from dataclasses import dataclass
-from catboost import CatBoostRegressor
-from sklearn.ensemble import (
-    AdaBoostRegressor,
-    GradientBoostingRegressor,
-    RandomForestRegressor,
-)
-from sklearn.linear_model import LinearRegression
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.tree import DecisionTreeRegressor
-from xgboost import XGBRegressor
+import numpy as np
 from src.exception import CustomException
 from src.logger import logging
-from src.utils import save_object, evaluate_model
+from src.metrics import timed
+from src.search.selection import pareto_front, select_model
+from src.utils import file_sha256, load_array, load_object, save_object, evaluate_model
+from src.artifact_bundle import (
+    ArtifactBundleConfig,
+    current_bundle_dir,
+    read_manifest,
+    retire_current_bundle,
+    write_bundle,
+)
+from src.component.warm_start import warm_start_model
+from src.component.numeric_mode import densify_for, is_sparse, prefers_dense
+from src.component.model_export import export_model, verify_exported_model
+from src.component.prediction_table import (
+    build_prediction_table,
+    load_prediction_table,
+    save_prediction_table,
+)
 from sklearn.metrics import r2_score
 
 
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path: str = os.path.join("artifacts", "model.pkl")
+    compiled_model_file_path: str = os.path.join("artifacts", "compiled_model.pkl")
+    # "grid" (grid search per model on shared folds), "parallel" (process pool over all fits) or
+    # "halving" (budgeted successive halving)
+    search_mode: str = "grid"
+    # Worker processes in "parallel" search mode, defaults to the number of cores
+    n_jobs: int = None
+    # Wall-clock budget in seconds of the "halving" search mode
+    search_time_budget: float = None
+    # Memoize fold scores and fitted models on disk across runs
+    use_evaluation_cache: bool = False
+    evaluation_cache_dir: str = os.path.join("artifacts", "evaluation_cache")
+    evaluation_cache_max_bytes: int = 1024**3
+    # Preprocessors written by the transformation stage, bundled with the model
+    preprocessor_file_path: str = os.path.join("artifacts", "preprocessing.pkl")
+    compiled_preprocessor_file_path: str = os.path.join(
+        "artifacts", "compiled_preprocessing.pkl"
+    )
+    # Predictions over the whole input domain, served with an array read
+    build_prediction_table: bool = True
+    prediction_table_file_path: str = os.path.join("artifacts", "prediction_table.npy")
+    # Publish the serving artifacts as a versioned bundle after training; without, the
+    # current bundle is retired, as it would be served over the new .pkl files
+    write_bundle: bool = True
+    bundle_root: str = os.path.join("artifacts", "bundles")
+    # Record each candidate's single-row/batch latency and pickle size in model_report
+    measure_inference: bool = True
+    # "best_r2", "latency_budget" (best r2 within the budgets) or "pareto" (fastest
+    # model of the r2/latency/size Pareto front within r2_tolerance of the best r2)
+    selection_policy: str = "best_r2"
+    latency_budget_ms: float = None
+    size_budget_bytes: int = None
+    r2_tolerance: float = 0.01
+    # Continue training the saved model on the updated training set instead of running
+    # the search again; the search still runs if the continued model scores more than
+    # r2_tolerance below the saved one, or if there is no saved model
+    warm_start: bool = False
+    # Trees/boosting rounds added by a warm start, as a fraction of the current ones
+    warm_start_extra_fraction: float = 0.25
+
+
+def get_models() -> dict:
+    """
+    The candidate models of the search, {model name: unfitted estimator}.
+
+    The model libraries are imported here, not at module load: importing the trainer
+    (e.g. for its config) does not pay for catboost, xgboost and the sklearn ensembles.
+    """
+    from catboost import CatBoostRegressor
+    from sklearn.ensemble import (
+        AdaBoostRegressor,
+        GradientBoostingRegressor,
+        RandomForestRegressor,
+    )
+    from sklearn.linear_model import LinearRegression
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.tree import DecisionTreeRegressor
+    from xgboost import XGBRegressor
+
+    return {
+        "Linear Regression": LinearRegression(),
+        "Decision Tree": DecisionTreeRegressor(),
+        "Random Forest": RandomForestRegressor(),
+        "Gradient Boosting": GradientBoostingRegressor(),
+        "AdaBoost": AdaBoostRegressor(),
+        "K-Nearest Neighbors": KNeighborsRegressor(),
+        "XGBoost": XGBRegressor(),
+        "CatBoost": CatBoostRegressor(verbose=False),
+    }
+
+
+def get_param_grids() -> dict:
+    """
+    The hyperparameter grid searched for each model of get_models.
+    """
+    return {
+        "Decision Tree": {
+            "criterion": [
+                "squared_error",
+                "friedman_mse",
+                "absolute_error",
+                "poisson",
+            ],
+        },
+        "Random Forest": {"n_estimators": [8, 16, 32, 64, 128, 256]},
+        "Gradient Boosting": {
+            "learning_rate": [0.1, 0.01, 0.05, 0.001],
+            "subsample": [0.6, 0.7, 0.75, 0.8, 0.85, 0.9],
+            "n_estimators": [8, 16, 32, 64, 128, 256],
+        },
+        "Linear Regression": {},  # No hyperparameters for Linear Regression
+        "XGBoost": {  # Match the key name from the models dictionary
+            "learning_rate": [0.1, 0.01, 0.05, 0.001],
+            "n_estimators": [8, 16, 32, 64, 128, 256],
+        },
+        "CatBoost": {  # Match the key name from the models dictionary
+            "depth": [6, 8, 10],
+            "learning_rate": [0.01, 0.05, 0.1],
+            "iterations": [30, 50, 100],
+        },
+        "AdaBoost": {  # Match the key name from the models dictionary
+            "learning_rate": [0.1, 0.01, 0.5, 0.001],
+            "n_estimators": [8, 16, 32, 64, 128, 256],
+        },
+        "K-Nearest Neighbors": {},  # No hyperparameters for KNN
+    }
 
 
 class ModelTrainer:
     def __init__(self):
         self.model_trainer_config = ModelTrainerConfig()
 
-    def initiate_model_trainer(self, train_array, test_array):
-        try:
-            logging.info("Splitting training and test input data")
-            X_train, y_train, X_test, y_test = (
-                train_array[:, :-1],  # all rows, ex-last column
-                train_array[:, -1],  # all rows, last column
-                test_array[:, :-1],
-                test_array[:, -1],
+    def get_search_config(self):
+        """
+        Returns:
+            object: The configuration of the selected search mode, None for "grid".
+        """
+        if self.model_trainer_config.search_mode == "halving":
+            from src.search.halving import HalvingSearchConfig
+
+            return HalvingSearchConfig(
+                time_budget=self.model_trainer_config.search_time_budget
+            )
+        return None
+
+    def get_evaluation_cache(self):
+        """
+        Returns:
+            EvaluationCache: The on-disk evaluation cache, None if disabled.
+        """
+        if not self.model_trainer_config.use_evaluation_cache:
+            return None
+        from src.search.cache import EvaluationCache, EvaluationCacheConfig
+
+        return EvaluationCache(
+            EvaluationCacheConfig(
+                cache_dir=self.model_trainer_config.evaluation_cache_dir,
+                max_bytes=self.model_trainer_config.evaluation_cache_max_bytes,
             )
+        )
 
-            models = {
-                "Linear Regression": LinearRegression(),
-                "Decision Tree": DecisionTreeRegressor(),
-                "Random Forest": RandomForestRegressor(),
-                "Gradient Boosting": GradientBoostingRegressor(),
-                "AdaBoost": AdaBoostRegressor(),
-                "K-Nearest Neighbors": KNeighborsRegressor(),
-                "XGBoost": XGBRegressor(),
-                "CatBoost": CatBoostRegressor(verbose=False),
+    def search_models(self, X_train, y_train, X_test, y_test, models, params, cache):
+        """
+        Run evaluate_model with the configured search over the models.
+
+        With sparse features, the models that prefer dense input (see
+        numeric_mode.prefers_dense) are searched in a second run on dense copies of the
+        features, the others keep the sparse ones.
+
+        Returns:
+            dict: The evaluate_model report, in the order of models.
+        """
+        config = self.model_trainer_config
+        groups = [(models, X_train, X_test)]
+        if is_sparse(X_train):
+            dense = {
+                name: model for name, model in models.items() if prefers_dense(model)
             }
+            groups = [
+                (
+                    {
+                        name: model
+                        for name, model in models.items()
+                        if name not in dense
+                    },
+                    X_train,
+                    X_test,
+                ),
+                (dense, X_train.toarray(), X_test.toarray()),
+            ]
+            logging.info(f"Searching {list(dense)} on dense features")
 
-            params = {
-                "Decision Tree": {
-                    "criterion": [
-                        "squared_error",
-                        "friedman_mse",
-                        "absolute_error",
-                        "poisson",
-                    ],
-                },
-                "Random Forest": {"n_estimators": [8, 16, 32, 64, 128, 256]},
-                "Gradient Boosting": {
-                    "learning_rate": [0.1, 0.01, 0.05, 0.001],
-                    "subsample": [0.6, 0.7, 0.75, 0.8, 0.85, 0.9],
-                    "n_estimators": [8, 16, 32, 64, 128, 256],
-                },
-                "Linear Regression": {},  # No hyperparameters for Linear Regression
-                "XGBoost": {  # Match the key name from the models dictionary
-                    "learning_rate": [0.1, 0.01, 0.05, 0.001],
-                    "n_estimators": [8, 16, 32, 64, 128, 256],
-                },
-                "CatBoost": {  # Match the key name from the models dictionary
-                    "depth": [6, 8, 10],
-                    "learning_rate": [0.01, 0.05, 0.1],
-                    "iterations": [30, 50, 100],
-                },
-                "AdaBoost": {  # Match the key name from the models dictionary
-                    "learning_rate": [0.1, 0.01, 0.5, 0.001],
-                    "n_estimators": [8, 16, 32, 64, 128, 256],
+        model_report = {}
+        for group_models, group_X_train, group_X_test in groups:
+            if group_models:
+                model_report.update(
+                    evaluate_model(
+                        group_X_train,
+                        y_train,
+                        group_X_test,
+                        y_test,
+                        models=group_models,
+                        param=params,
+                        search_mode=config.search_mode,
+                        n_jobs=config.n_jobs,
+                        search_config=self.get_search_config(),
+                        cache=cache,
+                        measure_inference=config.measure_inference,
+                    )
+                )
+        return {name: model_report[name] for name in models}
+
+    def export_compiled_model(self, model, X_test):
+        """
+        Export the saved model to its NumPy-only form for serving.
+
+        The export is checked against the original model on the test set. Models that
+        cannot be exported are served with the original pickle.
+
+        Arg:
+            model (object): The fitted model saved as trained_model_file_path.
+            X_test (array): The test features, used for the parity check.
+
+        Returns:
+            bool: True if a compiled model was saved.
+        """
+        try:
+            exported = export_model(
+                model,
+                source_sha256=file_sha256(
+                    self.model_trainer_config.trained_model_file_path
+                ),
+            )
+            verify_exported_model(exported, model, X_test)
+        except CustomException as e:
+            logging.warning(f"Model not exported, serving the original model: {e}")
+            return False
+
+        save_object(
+            file_path=self.model_trainer_config.compiled_model_file_path,
+            obj=exported,
+        )
+        logging.info("Compiled model saved")
+        return True
+
+    def verify_serving_parity(self, model, X_test, n_rows=1000, atol=1e-6) -> float:
+        """
+        Check that the model scores the features of a single record as those of a batch.
+
+        Batches are transformed by the sklearn preprocessor, sparse with sparse features,
+        single records by the compiled preprocessor into dense rows with explicit zeros
+        (checked equal to the dense sklearn output). A model trained on sparse input must
+        not tell them apart; the models that do belong to DENSE_INPUT_MODULES.
+
+        Arg:
+            model (object): The fitted model.
+            X_test (array): The test features, as the trainer and batch scoring get them.
+            n_rows (int): Number of test rows compared.
+            atol (float): Maximum absolute difference allowed.
+
+        Returns:
+            float: The maximum absolute difference found.
+        """
+        if not is_sparse(X_test):
+            return 0.0
+        X_test = X_test[:n_rows]
+        batch = model.predict(densify_for(model, X_test))
+        single = model.predict(densify_for(model, X_test.toarray()))
+        max_difference = (
+            float(np.max(np.abs(np.asarray(batch) - np.asarray(single))))
+            if len(batch)
+            else 0.0
+        )
+        if max_difference > atol:
+            raise ValueError(
+                f"{type(model).__name__} scores sparse and dense features differently "
+                f"(max difference {max_difference}), single records would be scored "
+                "differently from batches"
+            )
+        logging.info(
+            f"Sparse batch and dense single-record predictions match, "
+            f"max difference {max_difference}"
+        )
+        return max_difference
+
+    def build_prediction_table(self, model):
+        """
+        Precompute the model's predictions over the whole input domain for serving.
+
+        Arg:
+            model (object): The fitted model saved as trained_model_file_path.
+
+        Returns:
+            bool: True if the table was saved.
+        """
+        config = self.model_trainer_config
+        try:
+            table = build_prediction_table(
+                load_object(config.preprocessor_file_path),
+                model,
+                source_sha256=file_sha256(config.trained_model_file_path),
+                preprocessor_sha256=file_sha256(config.preprocessor_file_path),
+            )
+            save_prediction_table(table, config.prediction_table_file_path)
+        except CustomException as e:
+            logging.warning(f"Prediction table not built: {e}")
+            return False
+        logging.info("Prediction table saved")
+        return True
+
+    def write_artifact_bundle(self, metrics, data_sha256):
+        """
+        Publish the saved preprocessor and model, and their compiled forms when they were
+        built from them, as the current artifact bundle.
+
+        Arg:
+            metrics (dict): Training metrics recorded in the manifest.
+            data_sha256 (str): Hash of the training arrays.
+
+        Returns:
+            str: The bundle directory.
+        """
+        config = self.model_trainer_config
+        sources = {
+            "preprocessor": config.preprocessor_file_path,
+            "model": config.trained_model_file_path,
+        }
+        # Derived artifact: (file, loader, {attribute: file it must hold the sha256 of})
+        derived = {
+            "compiled_preprocessor": (
+                config.compiled_preprocessor_file_path,
+                load_object,
+                {"source_sha256": config.preprocessor_file_path},
+            ),
+            "compiled_model": (
+                config.compiled_model_file_path,
+                load_object,
+                {"source_sha256": config.trained_model_file_path},
+            ),
+            "prediction_table": (
+                config.prediction_table_file_path,
+                load_prediction_table,
+                {
+                    "source_sha256": config.trained_model_file_path,
+                    "preprocessor_sha256": config.preprocessor_file_path,
                 },
-                "K-Nearest Neighbors": {},  # No hyperparameters for KNN
-            }
+            ),
+        }
+        objects = {name: load_object(file_path) for name, file_path in sources.items()}
+        for name, (file_path, loader, source_paths) in derived.items():
+            if not os.path.exists(file_path):
+                continue
+            derived_object = loader(file_path)
+            # Leftovers of an earlier training run are not bundled
+            if all(
+                getattr(derived_object, attribute) == file_sha256(source_path)
+                for attribute, source_path in source_paths.items()
+            ):
+                objects[name] = derived_object
+        return write_bundle(
+            objects,
+            metrics=metrics,
+            data_sha256=data_sha256,
+            config=ArtifactBundleConfig(bundle_root=config.bundle_root),
+        )
 
-            # Running through a list of models and appending the scores
-            model_report: dict = evaluate_model(
-                X_train, y_train, X_test, y_test, models=models, param=params
+    def load_dataset(self, dataset) -> tuple:
+        """
+        Open a train or test set handed over by the transformation stage.
+
+        Arg:
+            dataset (tuple | np.ndarray): (features, target) as arrays or as paths written
+                by save_array (memory-mapped, not copied), or a single array with the
+                target as its last column.
+
+        Returns:
+            tuple: (features, target)
+        """
+        if isinstance(dataset, tuple):
+            return tuple(
+                load_array(part) if isinstance(part, str) else part for part in dataset
+            )
+        return dataset[:, :-1], dataset[:, -1]  # all rows ex-last column, last column
+
+    def publish_model(self, model, metrics, X_train, y_train, X_test, y_test) -> float:
+        """
+        Save the selected fitted model with its compiled form, prediction table and
+        artifact bundle.
+
+        Arg:
+            model (object): The fitted model to serve.
+            metrics (dict): Training metrics recorded in the bundle manifest.
+
+        Returns:
+            float: The test r2 score of the model.
+        """
+        # Before anything is saved, a failing model is not published
+        self.verify_serving_parity(model, X_test)
+        with timed("training", "trainer.save_model"):
+            save_object(
+                file_path=self.model_trainer_config.trained_model_file_path,
+                obj=model,
+            )
+
+        with timed("training", "trainer.export_compiled_model"):
+            self.export_compiled_model(model, densify_for(model, X_test))
+        if self.model_trainer_config.build_prediction_table:
+            with timed("training", "trainer.prediction_table"):
+                self.build_prediction_table(model)
+
+        with timed("training", "trainer.evaluate"):
+            y_pred = model.predict(densify_for(model, X_test))
+            r2_square = r2_score(y_test, y_pred)
+
+        if self.model_trainer_config.write_bundle:
+            from src.search.cache import array_digest
+
+            with timed("training", "trainer.bundle"):
+                self.write_artifact_bundle(
+                    metrics={**metrics, "test_r2_score": r2_square},
+                    data_sha256=array_digest(X_train, y_train),
+                )
+        else:
+            retire_current_bundle(
+                ArtifactBundleConfig(bundle_root=self.model_trainer_config.bundle_root)
             )
+        return r2_square
 
-            best_model = None
-            # To make sure score is always sorted by the smallest value
-            best_model_score = float("-inf")
-            best_model_params = None
-            # To obtain best score from list of scores from model
-            for model_name, scores in model_report.items():
-                test_scores = scores["Test r2 score"]
-                # Sort model k,v by the score
-                if test_scores > best_model_score:
-                    best_model_name = model_name
-                    best_model_score = test_scores
-                    best_model_params = scores["Best params"]
-            # Get the best model object from the models dictionary
-            best_model = models[best_model_name]
+    def previous_model_name(self) -> str:
+        """
+        Returns:
+            str: The model name recorded in the current bundle, None if unknown.
+        """
+        bundle_dir = current_bundle_dir(
+            ArtifactBundleConfig(bundle_root=self.model_trainer_config.bundle_root)
+        )
+        if bundle_dir is None:
+            return None
+        return read_manifest(bundle_dir).get("metrics", {}).get("model_name")
+
+    def warm_start_training(self, X_train, y_train, X_test, y_test) -> float:
+        """
+        Continue training the saved model on the updated training set (see
+        warm_start_model) and publish it if it scores at least as well as the saved
+        model on the test set, within r2_tolerance.
+
+        Returns:
+            float: The test r2 score of the published model, None if the saved model
+                could not be continued or the continued one scored worse.
+        """
+        config = self.model_trainer_config
+        try:
+            previous = load_object(config.trained_model_file_path)
+            X_train, X_test = (
+                densify_for(previous, X_train),
+                densify_for(previous, X_test),
+            )
+            previous_score = r2_score(y_test, previous.predict(X_test))
+            with timed("training", "trainer.warm_start"):
+                model, method = warm_start_model(
+                    previous,
+                    X_train,
+                    y_train,
+                    extra_fraction=config.warm_start_extra_fraction,
+                )
+            score = r2_score(y_test, model.predict(X_test))
+        except Exception as e:
+            # e.g. the features changed with the new data
+            logging.warning(f"Warm start not possible, running the search: {e}")
+            return None
+
+        model_name = self.previous_model_name() or type(model).__name__
+        logging.info(
+            f"Warm start of {model_name}: {method}, test r2 score "
+            f"{previous_score:.4f} -> {score:.4f}"
+        )
+        if score < previous_score - config.r2_tolerance or score < 0.6:
+            logging.warning("Warm-started model scores worse, running the search")
+            return None
+        return self.publish_model(
+            model,
+            {"model_name": model_name, "warm_start": method},
+            X_train,
+            y_train,
+            X_test,
+            y_test,
+        )
+
+    def initiate_model_trainer(self, train_array, test_array):
+        try:
+            logging.info("Loading training and test input data")
+            with timed("training", "trainer.load_data"):
+                X_train, y_train = self.load_dataset(train_array)
+                X_test, y_test = self.load_dataset(test_array)
+
+            if self.model_trainer_config.warm_start and os.path.exists(
+                self.model_trainer_config.trained_model_file_path
+            ):
+                r2_square = self.warm_start_training(X_train, y_train, X_test, y_test)
+                if r2_square is not None:
+                    return r2_square
+
+            models = get_models()
+            params = get_param_grids()
+
+            cache = self.get_evaluation_cache()
+            # Running through a list of models and appending the scores
+            with timed("training", "trainer.model_search"):
+                model_report: dict = self.search_models(
+                    X_train, y_train, X_test, y_test, models, params, cache
+                )
+            if cache is not None:
+                logging.info(f"Evaluation cache stats: {cache.stats()}")
+
+            config = self.model_trainer_config
+            if config.measure_inference:
+                front = pareto_front(model_report)
+                for model_name, scores in model_report.items():
+                    scores["Pareto optimal"] = model_name in front
+            elif config.selection_policy != "best_r2":
+                raise ValueError(
+                    f"Selection policy {config.selection_policy} needs measure_inference"
+                )
+            best_model_name = select_model(
+                model_report,
+                policy=config.selection_policy,
+                latency_budget_ms=config.latency_budget_ms,
+                size_budget_bytes=config.size_budget_bytes,
+                r2_tolerance=config.r2_tolerance,
+            )
+            best_model_score = model_report[best_model_name]["Test r2 score"]
+            best_model_params = model_report[best_model_name]["Best params"]
+            # The estimator the search fitted with the best params, not the unfitted
+            # template of the models dictionary
+            best_model = model_report[best_model_name]["Best estimator"]
 
             # Log and return model name and test score
             logging.info(
-                f"\nBest model name: {best_model_name},  \nBest test r2 score : {best_model_score}, \nBest params: {best_model_params}"
+                f"\nBest model name: {best_model_name},  \nBest test r2 score : {best_model_score}, \nBest params: {best_model_params}, "
+                f"\nSelection policy: {config.selection_policy}"
             )
 
             if best_model_score < 0.6:
                 raise CustomException("No best model found")
             logging.info("Best model found on training and test dataset")
 
-            save_object(
-                file_path=self.model_trainer_config.trained_model_file_path,
-                obj=best_model,
+            return self.publish_model(
+                best_model,
+                {
+                    "model_name": best_model_name,
+                    "selection_policy": config.selection_policy,
+                    "best_params": best_model_params,
+                    # The manifest is JSON, the estimators are saved on their own
+                    "model_report": {
+                        model_name: {
+                            key: value
+                            for key, value in scores.items()
+                            if key != "Best estimator"
+                        }
+                        for model_name, scores in model_report.items()
+                    },
+                },
+                X_train,
+                y_train,
+                X_test,
+                y_test,
             )
 
-            y_pred = best_model.predict(X_test)
-            r2_square = r2_score(y_test, y_pred)
-
-            return r2_square
-
         except Exception as e:
             raise CustomException(e, sys)
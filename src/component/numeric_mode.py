@@ -0,0 +1,92 @@
+import numpy as np
+
+# Model modules given dense features even when they are sparse. sklearn trees and the
+# ensembles built on them convert to CSC/CSR per tree or per stage, neighbors fall back
+# to brute force: their sparse input path is much slower. XGBoost treats the entries
+# absent from a sparse matrix as missing values, not zeros, and CatBoost is kept on the
+# same footing: trained on sparse input they would score the explicit zeros built by the
+# compiled preprocessor at serving time differently. Linear models and Gradient Boosting
+# consume sparse input directly, with the same result as the dense one.
+DENSE_INPUT_MODULES = (
+    "sklearn.tree",
+    "sklearn.ensemble._forest",
+    "sklearn.ensemble._weight_boosting",
+    "sklearn.neighbors",
+    "xgboost",
+    "catboost",
+)
+
+
+def is_sparse(X) -> bool:
+    return hasattr(X, "tocsr")
+
+
+def cast_features(X, dtype=None):
+    """
+    X with the given floating dtype, without a copy if it already has it.
+
+    Arg:
+        X (np.ndarray | scipy sparse matrix): The features.
+        dtype (str | np.dtype): Target dtype, None to keep X as is.
+    """
+    if dtype is None or X.dtype == np.dtype(dtype):
+        return X
+    if is_sparse(X):
+        return X.astype(dtype)
+    return np.asarray(X, dtype=dtype)
+
+
+def prefers_dense(model) -> bool:
+    """
+    True if the model should be given dense features even when they are sparse.
+    """
+    return type(model).__module__.startswith(DENSE_INPUT_MODULES)
+
+
+def densify_for(model, X):
+    """
+    X as the model consumes it best: dense for the models of DENSE_INPUT_MODULES, as is
+    for the others.
+    """
+    if is_sparse(X) and prefers_dense(model):
+        return X.toarray()
+    return X
+
+
+def feature_nbytes(X) -> int:
+    """
+    Bytes held by a dense array or a CSR/CSC matrix (data, indices and indptr).
+    """
+    if is_sparse(X):
+        X = X.tocsr()
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+
+def memory_report(arrays) -> dict:
+    """
+    Memory of the feature arrays against the dense float64 arrays they replace.
+
+    Arg:
+        arrays (list): The feature arrays (dense or sparse).
+
+    Returns:
+        dict: {"bytes", "float64 dense bytes", "saved fraction"}
+    """
+    used = sum(feature_nbytes(X) for X in arrays)
+    dense = sum(int(np.prod(X.shape)) * 8 for X in arrays)
+    return {
+        "bytes": used,
+        "float64 dense bytes": dense,
+        "saved fraction": 1 - used / dense if dense else 0.0,
+    }
+
+
+def __getattr__(name):
+    # Preprocessors pickled before CastingColumnTransformer moved to its own module
+    # refer to it here; importing it on demand keeps sklearn out of the serving imports
+    if name == "CastingColumnTransformer":
+        from src.component.casting_transformer import CastingColumnTransformer
+
+        return CastingColumnTransformer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,274 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+from src.component.numeric_mode import densify_for
+from src.utils import load_array, save_array
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class PredictionTable:
+    def __init__(
+        self,
+        categorical_columns,
+        categories,
+        numerical_columns,
+        score_range,
+        fill_values,
+        predictions,
+        source_sha256=None,
+        preprocessor_sha256=None,
+        max_error=0.0,
+    ):
+        """
+        Predictions of the model over the whole finite input domain.
+
+        The domain is every combination of the encoder's categories with every integer
+        score in score_range. predictions is a flat array indexed like
+        np.ravel_multi_index of (category positions..., scores - low), so a lookup is a
+        few dict reads and one array read. Missing values are looked up as the value the
+        preprocessor imputes for them.
+
+        Attributes:
+            categorical_columns (list): Categorical input columns, in index order.
+            categories (list): The categories of every categorical column.
+            numerical_columns (list): Integer score columns, after the categorical ones.
+            score_range (tuple): (low, high) of the scores, inclusive.
+            fill_values (dict): {column: imputed value} used for missing inputs.
+            predictions (np.ndarray): The flat predictions (usually memory-mapped).
+            source_sha256 (str): sha256 of the model pickle the table was built from.
+            preprocessor_sha256 (str): sha256 of the preprocessor pickle.
+            max_error (float): Largest difference to the model's predictions, due to
+                the storage dtype.
+        """
+        self.categorical_columns = list(categorical_columns)
+        self.categories = [list(values) for values in categories]
+        self.numerical_columns = list(numerical_columns)
+        self.score_range = tuple(score_range)
+        self.fill_values = dict(fill_values)
+        self.predictions = predictions
+        self.source_sha256 = source_sha256
+        self.preprocessor_sha256 = preprocessor_sha256
+        self.max_error = float(max_error)
+
+        self._positions = [
+            {value: position for position, value in enumerate(values)}
+            for values in self.categories
+        ]
+        n_scores = self.score_range[1] - self.score_range[0] + 1
+        score_shape = (n_scores,) * len(self.numerical_columns)
+        self.shape = tuple(len(values) for values in self.categories) + score_shape
+        self._strides = np.cumprod((1,) + self.shape[:0:-1])[::-1].tolist()
+
+    def metadata(self) -> dict:
+        """
+        Returns:
+            dict: Everything but the predictions, JSON-serializable.
+        """
+        return {
+            "categorical_columns": self.categorical_columns,
+            "categories": self.categories,
+            "numerical_columns": self.numerical_columns,
+            "score_range": list(self.score_range),
+            "fill_values": self.fill_values,
+            "source_sha256": self.source_sha256,
+            "preprocessor_sha256": self.preprocessor_sha256,
+            "max_error": self.max_error,
+        }
+
+    def index(self, record) -> int:
+        """
+        Flat index of a raw record, None if it is outside the domain.
+
+        Arg:
+            record (dict): {column: value} for every input column.
+        """
+        index = 0
+        stride = iter(self._strides)
+        for column, positions in zip(self.categorical_columns, self._positions):
+            value = record.get(column)
+            if _is_missing(value):
+                value = self.fill_values.get(column)
+            position = positions.get(value)
+            if position is None:
+                return None
+            index += position * next(stride)
+        low, high = self.score_range
+        for column in self.numerical_columns:
+            value = record.get(column)
+            if _is_missing(value):
+                value = self.fill_values.get(column)
+            try:
+                score = int(value)
+            except (TypeError, ValueError):
+                return None
+            if score != value or not low <= score <= high:
+                return None
+            index += (score - low) * next(stride)
+        return index
+
+    def lookup(self, record) -> float:
+        """
+        Returns:
+            float: The precomputed prediction of the record, None if out of domain.
+        """
+        index = self.index(record)
+        return None if index is None else float(self.predictions[index])
+
+    def domain(self, categorical_index) -> pd.DataFrame:
+        """
+        The records of one categorical combination with every score combination, in
+        table order.
+
+        Arg:
+            categorical_index (tuple): Position of the category of every column.
+        """
+        low, high = self.score_range
+        scores = np.arange(low, high + 1)
+        grids = np.meshgrid(*([scores] * len(self.numerical_columns)), indexing="ij")
+        n_rows = grids[0].size if grids else 1
+        columns = {
+            column: [values[position]] * n_rows
+            for column, values, position in zip(
+                self.categorical_columns, self.categories, categorical_index
+            )
+        }
+        for column, grid in zip(self.numerical_columns, grids):
+            columns[column] = grid.ravel()
+        return pd.DataFrame(columns)
+
+
+def _preprocessor_columns(preprocessor) -> tuple:
+    """
+    Categorical columns with their categories and fill values, and numerical columns
+    with their fill values, of a fitted DataTransformation preprocessor.
+    """
+    categorical, categories, numerical, fill_values = [], [], [], {}
+    for _, transformer, columns in preprocessor.transformers_:
+        steps = dict(getattr(transformer, "steps", []))
+        if "imputer" not in steps:
+            continue
+        statistics = steps["imputer"].statistics_
+        if "one_hot_encoder" in steps:
+            categorical.extend(columns)
+            categories.extend(
+                values.tolist() for values in steps["one_hot_encoder"].categories_
+            )
+        else:
+            numerical.extend(columns)
+        for column, value in zip(columns, statistics.tolist()):
+            fill_values[column] = value
+    return categorical, categories, numerical, fill_values
+
+
+def build_prediction_table(
+    preprocessor,
+    model,
+    score_range=(0, 100),
+    dtype=np.float32,
+    source_sha256=None,
+    preprocessor_sha256=None,
+) -> PredictionTable:
+    """
+    Score the whole input domain once, one categorical combination at a time.
+
+    Arg:
+        preprocessor (ColumnTransformer): The fitted preprocessor.
+        model (object): The fitted model.
+        score_range (tuple): (low, high) of the integer scores, inclusive.
+        dtype (np.dtype): Storage dtype of the predictions.
+        source_sha256 (str): sha256 of the saved model pickle.
+        preprocessor_sha256 (str): sha256 of the saved preprocessor pickle.
+
+    Returns:
+        PredictionTable: The table, with its predictions in memory.
+    """
+    try:
+        start = time.perf_counter()
+        categorical, categories, numerical, fill_values = _preprocessor_columns(
+            preprocessor
+        )
+        table = PredictionTable(
+            categorical,
+            categories,
+            numerical,
+            score_range,
+            fill_values,
+            predictions=None,
+            source_sha256=source_sha256,
+            preprocessor_sha256=preprocessor_sha256,
+        )
+        n_categorical = int(np.prod(table.shape[: len(categorical)]))
+        block_size = int(np.prod(table.shape[len(categorical) :]))
+        predictions = np.empty(n_categorical * block_size, dtype=dtype)
+        max_error = 0.0
+        for block, categorical_index in enumerate(
+            np.ndindex(*table.shape[: len(categorical)])
+        ):
+            records = table.domain(categorical_index)
+            block_predictions = np.ravel(
+                model.predict(densify_for(model, preprocessor.transform(records)))
+            )
+            stored = block_predictions.astype(dtype)
+            max_error = max(max_error, float(np.abs(stored - block_predictions).max()))
+            predictions[block * block_size : (block + 1) * block_size] = stored
+        table.predictions = predictions
+        table.max_error = max_error
+        logging.info(
+            f"Prediction table of {len(predictions)} entries built in "
+            f"{time.perf_counter() - start:.1f}s, max storage error {max_error:.2e}"
+        )
+        return table
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def prediction_table_metadata_path(file_path) -> str:
+    """
+    Returns:
+        str: The .json file the metadata of the table saved as file_path is kept in.
+    """
+    return f"{os.path.splitext(file_path)[0]}.json"
+
+
+def save_prediction_table(table, file_path) -> str:
+    """
+    Save the predictions as a .npy file and the rest next to it as .json.
+
+    Both files are replaced atomically, the .json last: its source fingerprints name the
+    new model only once the new predictions are in place, so a reload in between finds
+    a table stale for the new model rather than old predictions under new metadata.
+    ArtifactCache watches both files, replacing the .json reloads the complete table.
+
+    Returns:
+        str: The path of the .npy file.
+    """
+    try:
+        metadata_path = prediction_table_metadata_path(file_path)
+        os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+        file_path = save_array(file_path, table.predictions)
+        with open(f"{metadata_path}.tmp", "w") as file_obj:
+            json.dump(table.metadata(), file_obj, default=str)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+        return file_path
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_prediction_table(file_path) -> PredictionTable:
+    """
+    Load a table saved by save_prediction_table, with its predictions memory-mapped.
+    """
+    try:
+        with open(prediction_table_metadata_path(file_path)) as file_obj:
+            metadata = json.load(file_obj)
+        return PredictionTable(predictions=load_array(file_path), **metadata)
+    except Exception as e:
+        raise CustomException(e, sys)
@@ -0,0 +1,67 @@
+import copy
+import math
+import sys
+from sklearn.base import clone
+from src.exception import CustomException
+from src.logger import logging
+
+
+def _extra_rounds(current, extra_fraction, min_extra) -> int:
+    return max(min_extra, math.ceil(current * extra_fraction))
+
+
+def warm_start_model(model, X, y, extra_fraction=0.25, min_extra=8) -> tuple:
+    """
+    Continue training a fitted model on an updated training set.
+
+    The previous model is left untouched, a continued copy is returned:
+        sklearn ensembles with warm_start (Random Forest, Gradient Boosting): keep the
+            fitted trees/stages and add extra ones fitted on X, y.
+        XGBoost: add extra boosting rounds on top of the previous booster.
+        CatBoost: add extra iterations with the previous model as init_model.
+        Other models (Linear Regression, KNN, Decision Tree, AdaBoost) cannot be
+            continued and are refitted on X, y with their tuned parameters, which is
+            cheap for all of them.
+
+    Arg:
+        model (object): The previously trained model.
+        X, y (array): The training set with the newly labeled rows.
+        extra_fraction (float): Trees/rounds added, as a fraction of the current ones.
+        min_extra (int): Minimum number of trees/rounds added.
+
+    Returns:
+        tuple: (continued model, description of what was done)
+    """
+    try:
+        if type(model).__module__.startswith("xgboost"):
+            booster = model.get_booster()
+            rounds = booster.num_boosted_rounds()
+            extra = _extra_rounds(rounds, extra_fraction, min_extra)
+            continued = copy.deepcopy(model).set_params(n_estimators=extra)
+            continued.fit(X, y, xgb_model=booster)
+            continued.set_params(n_estimators=rounds + extra)
+            return continued, f"added {extra} boosting rounds to {rounds}"
+
+        if type(model).__module__.startswith("catboost"):
+            trees = model.tree_count_
+            extra = _extra_rounds(trees, extra_fraction, min_extra)
+            # A fitted CatBoost model is immutable, the continuation is a new model
+            continued = type(model)(**{**model.get_params(), "iterations": extra})
+            continued.fit(X, y, init_model=model)
+            return continued, f"added {extra} iterations to {trees}"
+
+        params = model.get_params()
+        if "warm_start" in params and "n_estimators" in params:
+            current = params["n_estimators"]
+            extra = _extra_rounds(current, extra_fraction, min_extra)
+            continued = copy.deepcopy(model)
+            continued.set_params(warm_start=True, n_estimators=current + extra)
+            continued.fit(X, y)
+            # A later plain fit() of the saved model must start from scratch again
+            continued.set_params(warm_start=False)
+            return continued, f"added {extra} estimators to {current}"
+
+        return clone(model).fit(X, y), "refitted with the tuned parameters"
+    except Exception as e:
+        logging.error(f"Warm start of {type(model).__name__} failed: {e}")
+        raise CustomException(e, sys)
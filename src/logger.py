@@ -1,19 +1,319 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 
-LOG_FILE=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log" # Creates dynamic logfile
-logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE) # Setting up log path
-os.makedirs(logs_path, exist_ok=True) # creating logs folder
+# Attributes every LogRecord has, anything else was passed with extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE) # Creates log directory
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+def _parse_mapping(value) -> dict:
+    """
+    Parse "name=value,name=value" (as used by the LOG_* environment variables).
+    """
+    mapping = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, setting = item.partition("=")
+        mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+@dataclass
+class LoggerConfig:
+    log_dir: str = os.path.join(os.getcwd(), "logs")
+    # One file per process start, in a single logs/ directory
+    log_file: str = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}_{os.getpid()}.log"
+    level: str = "INFO"
+    # Per-logger levels, e.g. {"werkzeug": "WARNING"}
+    levels: dict = field(default_factory=dict)
+    # Keep one record in N per logger, e.g. {"werkzeug": 100}
+    sampling: dict = field(default_factory=dict)
+    # "json" (one object per line) or "text"
+    format: str = "json"
+    # Records waiting for the writer thread; beyond this they are dropped, not waited for
+    queue_size: int = 10_000
+    # Seconds shutdown_logging waits for room in a full queue for its stop marker, the
+    # oldest queued records are dropped after that
+    stop_timeout: float = 1.0
+    # The log file is rotated at max_bytes, keeping backup_count old files
+    max_bytes: int = 50 * 1024 * 1024
+    backup_count: int = 5
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the configuration from LOG_DIR, LOG_LEVEL, LOG_LEVELS ("name=LEVEL,..."),
+        LOG_SAMPLING ("name=N,..."), LOG_FORMAT, LOG_QUEUE_SIZE, LOG_STOP_TIMEOUT,
+        LOG_MAX_BYTES and LOG_BACKUP_COUNT.
+        """
+        config = cls()
+        env = os.environ
+        config.log_dir = env.get("LOG_DIR", config.log_dir)
+        config.level = env.get("LOG_LEVEL", config.level).upper()
+        config.levels = {
+            name: level.upper()
+            for name, level in _parse_mapping(env.get("LOG_LEVELS")).items()
+        }
+        config.sampling = {
+            name: int(every)
+            for name, every in _parse_mapping(env.get("LOG_SAMPLING")).items()
+        }
+        config.format = env.get("LOG_FORMAT", config.format)
+        config.queue_size = int(env.get("LOG_QUEUE_SIZE", config.queue_size))
+        config.stop_timeout = float(env.get("LOG_STOP_TIMEOUT", config.stop_timeout))
+        config.max_bytes = int(env.get("LOG_MAX_BYTES", config.max_bytes))
+        config.backup_count = int(env.get("LOG_BACKUP_COUNT", config.backup_count))
+        return config
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, location, process and
+    thread, the fields passed with extra={...} and the formatted exception if any.
+    """
+
+    def format(self, record) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sampling=None, max_keys=10_000):
+        """
+        Keep one record in N of high-frequency messages.
+
+        N is taken from the record's sample_every attribute (logging.info(...,
+        extra={"sample_every": 100})), else from the sampling setting of its logger or
+        closest parent logger. Records are counted per call site (file and line, the
+        messages are f-strings formatted before logging), or per the sample_key
+        attribute when given (extra={"sample_key": ...}); warnings and errors are never
+        sampled. Beyond max_keys counted keys the counts start over.
+
+        Attributes:
+            sampling (dict): {logger name: N}.
+            max_keys (int): Maximum number of counted call sites and sample keys.
+        """
+        super().__init__()
+        self.sampling = dict(sampling or {})
+        self.max_keys = max_keys
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _sample_every(self, record) -> int:
+        every = getattr(record, "sample_every", None)
+        if every is not None:
+            return every
+        name = record.name
+        while name:
+            if name in self.sampling:
+                return self.sampling[name]
+            name = name.rpartition(".")[0]
+        return self.sampling.get("root", 1)
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        every = self._sample_every(record)
+        if every <= 1:
+            return True
+        key = getattr(record, "sample_key", None) or (record.pathname, record.lineno)
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                self._counts.clear()
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % every:
+            return False
+        record.sampled_one_in = every
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records (and counts them) when the queue is full, so a
+    request thread never waits for the log writer.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only resolve the message and exception text, the writer thread formats
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DroppingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose stop() does not wait on a full queue: the writer gets
+    stop_timeout seconds to make room for the stop marker, then the oldest queued
+    records are dropped (and counted) to make room.
+    """
+
+    def __init__(
+        self, log_queue, *handlers, respect_handler_level=False, stop_timeout=1.0
+    ):
+        super().__init__(
+            log_queue, *handlers, respect_handler_level=respect_handler_level
+        )
+        self.stop_timeout = stop_timeout
+        self.dropped = 0
+
+    def enqueue_sentinel(self):
+        try:
+            self.queue.put(self._sentinel, timeout=self.stop_timeout)
+            return
+        except queue.Full:
+            pass
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(self._sentinel)
+                return
+            except queue.Full:
+                continue
+
+
+class LazyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler that creates its directory and file on the first record, so
+    importing the logger touches no filesystem.
+    """
+
+    def __init__(self, file_path, max_bytes, backup_count):
+        super().__init__(
+            file_path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+_listener = None
+_queue_handler = None
+
+
+def configure_logging(config=None) -> logging.handlers.QueueListener:
+    """
+    Route every log record through an in-memory queue to a background writer thread.
+
+    Request threads only filter and enqueue the record (or drop it if the queue is
+    full); the QueueListener thread formats it and writes it to the rotating log file.
+    Calling it again replaces the previous setup.
+
+    Arg:
+        config (LoggerConfig): Defaults to LoggerConfig.from_env().
+
+    Returns:
+        QueueListener: The running writer.
+    """
+    global _listener, _queue_handler
+    config = config or LoggerConfig.from_env()
+    shutdown_logging()
+
+    file_handler = LazyRotatingFileHandler(
+        os.path.join(config.log_dir, config.log_file),
+        config.max_bytes,
+        config.backup_count,
+    )
+    file_handler.setFormatter(
+        JsonFormatter()
+        if config.format == "json"
+        else logging.Formatter(
+            "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+        )
+    )
+
+    log_queue = queue.Queue(maxsize=config.queue_size)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(config.sampling))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(config.level)
+    for name, level in config.levels.items():
+        logging.getLogger(None if name == "root" else name).setLevel(level)
+
+    _listener = DroppingQueueListener(
+        log_queue,
+        file_handler,
+        respect_handler_level=True,
+        stop_timeout=config.stop_timeout,
+    )
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """
+    Write out the queued records and stop the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        if _queue_handler is not None:
+            _queue_handler.dropped += _listener.dropped
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """
+    Returns:
+        int: Records dropped because the log queue was full.
+    """
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+configure_logging()
+atexit.register(shutdown_logging)
+
+# Kept for compatibility, the file is created on the first record
+LOG_FILE_PATH = _listener.handlers[0].baseFilename
 
 # For testing purposes
 # if __name__ == "__main__":
-#     logging.info("Logging has started")
\ No newline at end of file
+#     logging.info("Logging has started")
@@ -0,0 +1,271 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from src.exception import CustomException
+
+# Latency buckets in seconds, from 50us (table lookups) to 60s (training stages)
+DEFAULT_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# METRICS_ENABLED=0 turns every timer into a no-op
+_enabled = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def set_metrics_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        A monotonically increasing count per label set.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for key, value in sorted(values.items()):
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, function=None):
+        """
+        A value that goes up and down, set directly or read from function at scrape time.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def collect(self) -> list:
+        value = self.function() if self.function is not None else self.value
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(value)}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Distribution of observed values per label set, as cumulative bucket counts, sum
+        and count.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        self.observe_key(tuple(labels[name] for name in self.labelnames), value)
+
+    def observe_key(self, key, value):
+        """
+        observe() with the label values already as a tuple, in labelnames order.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [count per bucket (+Inf last), sum]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> list:
+        with self._lock:
+            series = {
+                key: (list(counts), total)
+                for key, (counts, total) in self._series.items()
+            }
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, [("le", le)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {repr(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        The metrics of the process, rendered in the Prometheus text exposition format.
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric, or return the already registered metric of the same name.
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "stage_duration_seconds",
+        "Duration of each stage of the serving and training pipelines.",
+        ("pipeline", "stage"),
+    )
+)
+STAGE_ERRORS = REGISTRY.register(
+    Counter(
+        "stage_errors_total",
+        "Stages that raised an exception.",
+        ("pipeline", "stage"),
+    )
+)
+
+
+class _StageTimer:
+    __slots__ = ("key", "start")
+
+    def __init__(self, pipeline, stage):
+        self.key = (pipeline, stage)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        STAGE_SECONDS.observe_key(self.key, time.perf_counter() - self.start)
+        if exc_type is not None:
+            pipeline, stage = self.key
+            STAGE_ERRORS.inc(pipeline=pipeline, stage=stage)
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(pipeline, stage):
+    """
+    Time a stage into stage_duration_seconds{pipeline, stage}.
+
+        with timed("serving", "transform"):
+            data_scaled = preprocessor.transform(features)
+
+    With metrics disabled this returns a shared no-op context manager.
+
+    Arg:
+        pipeline (str): "serving" or "training".
+        stage (str): The stage name.
+    """
+    if not _enabled:
+        return _NO_TIMER
+    return _StageTimer(pipeline, stage)
+
+
+def write_metrics(file_path, registry=None):
+    """
+    Write the metrics to a file in the Prometheus text format, e.g. for the node
+    exporter textfile collector after a training run.
+
+    Arg:
+        file_path (str): The .prom file to write.
+        registry (MetricsRegistry): Defaults to the process registry.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        with open(f"{file_path}.tmp", "w") as file_obj:
+            file_obj.write((registry or REGISTRY).render())
+        os.replace(f"{file_path}.tmp", file_path)
+    except Exception as e:
+        raise CustomException(e, sys)
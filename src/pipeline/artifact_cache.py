@@ -0,0 +1,493 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from src.artifact_bundle import (
+    CURRENT_FILE,
+    ArtifactBundleConfig,
+    current_bundle_dir,
+    load_bundle_object,
+    read_manifest,
+)
+from src.component.prediction_table import (
+    load_prediction_table,
+    prediction_table_metadata_path,
+)
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import file_sha256, load_object
+
+# Serializes the loading of deferred artifacts, at most once per snapshot
+_deferred_lock = threading.Lock()
+
+
+@dataclass
+class ArtifactCacheConfig:
+    model_path: str = os.path.join("artifacts", "model.pkl")
+    preprocessor_path: str = os.path.join("artifacts", "preprocessing.pkl")
+    compiled_preprocessor_path: str = os.path.join(
+        "artifacts", "compiled_preprocessing.pkl"
+    )
+    compiled_model_path: str = os.path.join("artifacts", "compiled_model.pkl")
+    prediction_table_path: str = os.path.join("artifacts", "prediction_table.npy")
+    # Minimum number of seconds between two checks of the artifact files on disk
+    check_interval: float = 2.0
+    # Serve the current artifact bundle when one was published, the .pkl files otherwise
+    use_bundle: bool = True
+    bundle_root: str = os.path.join("artifacts", "bundles")
+    # With a fresh compiled preprocessor, unpickle the sklearn one (and import sklearn)
+    # when a batch first needs it instead of at load time
+    defer_preprocessor: bool = True
+
+
+@dataclass(frozen=True)
+class ArtifactSnapshot:
+    """
+    An immutable set of loaded artifacts.
+
+    A snapshot is never modified after creation; a reload builds a new snapshot and swaps
+    it in, so a request holding a reference keeps using a consistent model/preprocessor pair.
+    The only exception are the deferred artifacts (see ArtifactCacheConfig.
+    defer_preprocessor): their loader runs on first access and checks that it loads the
+    version the snapshot was built with.
+    """
+
+    objects: dict
+    fingerprints: dict
+    load_times: dict
+    version: int
+    loaded_at: float = field(default_factory=time.time)
+    # Manifest of the artifact bundle the snapshot was loaded from, None for .pkl files
+    manifest: dict = None
+    # {artifact name: callable loading it}, for the artifacts loaded on first access
+    deferred: dict = field(default_factory=dict)
+
+    def _deferred_object(self, name):
+        if name not in self.objects and name in self.deferred:
+            with _deferred_lock:
+                if name not in self.objects:
+                    start = time.perf_counter()
+                    self.objects[name] = self.deferred[name]()
+                    self.load_times[name] = time.perf_counter() - start
+                    logging.info(
+                        f"Loaded deferred artifact {name} of snapshot v{self.version} "
+                        f"in {self.load_times[name] * 1000:.1f} ms"
+                    )
+        return self.objects[name]
+
+    def load_deferred(self):
+        """
+        Load the deferred artifacts now, e.g. before forking workers that share them.
+        """
+        for name in self.deferred:
+            self._deferred_object(name)
+
+    @property
+    def model(self):
+        return self.objects["model"]
+
+    @property
+    def preprocessor(self):
+        return self._deferred_object("preprocessor")
+
+    @property
+    def compiled_model(self):
+        return self.objects.get("compiled_model")
+
+    @property
+    def compiled_preprocessor(self):
+        return self.objects.get("compiled_preprocessor")
+
+    @property
+    def prediction_table(self):
+        return self.objects.get("prediction_table")
+
+
+def file_fingerprint(file_path) -> tuple:
+    """
+    Return a cheap (mtime_ns, size) fingerprint of a file.
+
+    Arg:
+        file_path (str): The path to the file.
+
+    Returns:
+        tuple: (mtime_ns, size) of the file.
+    """
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ArtifactCache:
+    # Artifacts served when present on disk, the pipeline falls back without them
+    OPTIONAL_ARTIFACTS = ("compiled_preprocessor", "compiled_model", "prediction_table")
+    # Files read along with an artifact, watched like the artifacts themselves
+    OPTIONAL_FILES = OPTIONAL_ARTIFACTS + ("prediction_table_metadata",)
+
+    def __init__(self, config=None):
+        """
+        Process-wide cache of the serving artifacts (model and preprocessor).
+
+        The artifacts are unpickled once and kept resident, from the current artifact
+        bundle if one was published (see src.artifact_bundle), else from the .pkl files.
+        The files are watched by mtime/size; when they change, their sha256 is compared to
+        the loaded version and a new snapshot is loaded and swapped in atomically. Requests already running keep the
+        snapshot they started with.
+
+        Attributes:
+            cache_config (ArtifactCacheConfig): Paths of the artifacts and the check interval.
+        """
+        self.cache_config = config or ArtifactCacheConfig()
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+        # (path, mtime_ns) of the .pkl files last warned about as newer than the bundle
+        self._newer_sources = ()
+
+    def artifact_paths(self) -> dict:
+        """
+        Returns:
+            dict: Mapping of artifact name to the file it is loaded from.
+        """
+        return {
+            "model": self.cache_config.model_path,
+            "preprocessor": self.cache_config.preprocessor_path,
+            "compiled_preprocessor": self.cache_config.compiled_preprocessor_path,
+            "compiled_model": self.cache_config.compiled_model_path,
+            "prediction_table": self.cache_config.prediction_table_path,
+        }
+
+    def watched_paths(self) -> dict:
+        """
+        Returns:
+            dict: The artifact_paths and the other files an artifact is loaded from: the
+                .json metadata of the prediction table, replaced after its .npy.
+        """
+        paths = self.artifact_paths()
+        paths["prediction_table_metadata"] = prediction_table_metadata_path(
+            self.cache_config.prediction_table_path
+        )
+        return paths
+
+    def _bundle_pointer(self) -> str:
+        """
+        Returns:
+            str: Path of the CURRENT file of the artifact bundles, None when not serving
+                from a bundle.
+        """
+        if not self.cache_config.use_bundle:
+            return None
+        pointer_path = os.path.join(self.cache_config.bundle_root, CURRENT_FILE)
+        return pointer_path if os.path.exists(pointer_path) else None
+
+    def _warn_newer_sources(self, snapshot):
+        """
+        Warn, once per change, when the model or preprocessor .pkl file is newer than
+        the bundle served: it comes from a training run that did not publish a bundle
+        and is not served.
+        """
+        if snapshot.manifest is None:
+            return
+        newer = tuple(
+            (file_path, os.stat(file_path).st_mtime_ns)
+            for file_path in (
+                self.cache_config.model_path,
+                self.cache_config.preprocessor_path,
+            )
+            if os.path.exists(file_path)
+            and os.path.getmtime(file_path) > snapshot.manifest["created_at"]
+        )
+        if newer and newer != self._newer_sources:
+            logging.warning(
+                f"{[file_path for file_path, _ in newer]} newer than the artifact "
+                f"bundle {snapshot.manifest['version']} served, they are not served "
+                "until a bundle is published or the current one retired"
+            )
+        self._newer_sources = newer
+
+    def _drop_stale(self, objects, fingerprints):
+        """
+        Drop derived artifacts that were not built from the current source artifacts.
+        """
+        sources = {
+            "compiled_preprocessor": {
+                "source_sha256": self.cache_config.preprocessor_path
+            },
+            "compiled_model": {"source_sha256": self.cache_config.model_path},
+            "prediction_table": {
+                "source_sha256": self.cache_config.model_path,
+                "preprocessor_sha256": self.cache_config.preprocessor_path,
+            },
+        }
+        for name, source_paths in sources.items():
+            derived = objects.get(name)
+            if derived is None:
+                continue
+            for attribute, source_path in source_paths.items():
+                if getattr(derived, attribute) != fingerprints[source_path][2]:
+                    logging.warning(
+                        f"{name} is stale (not built from the current {source_path}), "
+                        "ignoring it"
+                    )
+                    del objects[name]
+                    break
+
+    def should_defer(self, name, available) -> bool:
+        """
+        True if the artifact can be loaded on first access: the sklearn preprocessor,
+        when the compiled preprocessor serving the single records is available.
+
+        Arg:
+            name (str): The artifact name.
+            available: The names of the other artifacts of the snapshot.
+        """
+        return (
+            self.cache_config.defer_preprocessor
+            and name == "preprocessor"
+            and "compiled_preprocessor" in available
+        )
+
+    def _deferred_loader(self, name, fingerprints):
+        """
+        Returns:
+            Callable: Loads the artifact file, failing if its content is no longer the
+                one fingerprinted (the next reload picks up the new version).
+        """
+        file_path = self.artifact_paths()[name]
+        sha256 = fingerprints[file_path][2]
+
+        def load():
+            # Files are replaced atomically: hashing after loading detects a
+            # replacement before or during the load
+            obj = load_object(file_path=file_path)
+            if file_sha256(file_path) != sha256:
+                raise ValueError(
+                    f"{file_path} changed since the snapshot was loaded, "
+                    "it is served after the next reload"
+                )
+            return obj
+
+        return load
+
+    def _load_artifact(self, name, objects, load_times):
+        file_path = self.artifact_paths()[name]
+        start = time.perf_counter()
+        if name == "prediction_table":
+            # Memory-mapped, not unpickled
+            objects[name] = load_prediction_table(file_path)
+        else:
+            objects[name] = load_object(file_path=file_path)
+        load_times[name] = time.perf_counter() - start
+        logging.info(
+            f"Loaded artifact {name} from {file_path} in {load_times[name] * 1000:.1f} ms"
+        )
+
+    def _load_bundle_snapshot(self, fingerprints) -> ArtifactSnapshot:
+        """
+        Load the current artifact bundle. Its compiled artifacts were verified against
+        their sources when the bundle was written, and its arrays are memory-mapped.
+        """
+        bundle_dir = current_bundle_dir(
+            ArtifactBundleConfig(bundle_root=self.cache_config.bundle_root)
+        )
+        manifest = read_manifest(bundle_dir)
+        names = list(manifest["artifacts"])
+        if "compiled_model" in names:
+            # Same as with .pkl files: the compiled model replaces the original one
+            names.remove("model")
+
+        objects = {}
+        load_times = {}
+        deferred = {}
+        if "preprocessor" in names and self.should_defer("preprocessor", names):
+            # Bundles are never modified, the deferred load reads the same version
+            names.remove("preprocessor")
+            deferred["preprocessor"] = lambda: load_bundle_object(
+                bundle_dir, "preprocessor", manifest=manifest
+            )
+        for name in names:
+            start = time.perf_counter()
+            objects[name] = load_bundle_object(bundle_dir, name, manifest=manifest)
+            load_times[name] = time.perf_counter() - start
+        if "model" not in objects:
+            objects["model"] = objects["compiled_model"]
+        logging.info(
+            f"Loaded artifact bundle {manifest['version']} in "
+            f"{sum(load_times.values()) * 1000:.1f} ms"
+        )
+
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        return ArtifactSnapshot(
+            objects=objects,
+            fingerprints=fingerprints,
+            load_times=load_times,
+            version=version,
+            manifest=manifest,
+            deferred=deferred,
+        )
+
+    def _load_snapshot(self, fingerprints) -> ArtifactSnapshot:
+        if self._bundle_pointer() in fingerprints:
+            return self._load_bundle_snapshot(fingerprints)
+        objects = {}
+        load_times = {}
+        paths = self.artifact_paths()
+        for name in self.OPTIONAL_ARTIFACTS:
+            if fingerprints.get(paths[name]) is not None:
+                self._load_artifact(name, objects, load_times)
+        self._drop_stale(objects, fingerprints)
+
+        deferred = {}
+        for name in paths:
+            if name in self.OPTIONAL_ARTIFACTS:
+                continue
+            if self.should_defer(name, objects):
+                deferred[name] = self._deferred_loader(name, fingerprints)
+                continue
+            # A fresh compiled model makes unpickling model.pkl (and importing its
+            # library) unnecessary
+            if name == "model" and "compiled_model" in objects:
+                objects["model"] = objects["compiled_model"]
+                continue
+            self._load_artifact(name, objects, load_times)
+
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        return ArtifactSnapshot(
+            objects=objects,
+            fingerprints=fingerprints,
+            load_times=load_times,
+            version=version,
+            deferred=deferred,
+        )
+
+    def _current_fingerprints(self, previous=None) -> dict:
+        """
+        Fingerprint every artifact as {path: (mtime_ns, size, sha256)}.
+
+        The sha256 of a file is only recomputed when its mtime/size changed. Missing
+        optional artifacts are fingerprinted as None. When serving from a bundle only its
+        CURRENT pointer is fingerprinted, bundles themselves are never modified.
+        """
+        pointer_path = self._bundle_pointer()
+        artifact_paths = (
+            {"bundle": pointer_path} if pointer_path else self.watched_paths()
+        )
+        fingerprints = {}
+        for name, file_path in artifact_paths.items():
+            if name in self.OPTIONAL_FILES and not os.path.exists(file_path):
+                fingerprints[file_path] = None
+                continue
+            stat = file_fingerprint(file_path)
+            if previous is not None and previous.get(file_path) is not None:
+                if previous[file_path][:2] == stat:
+                    fingerprints[file_path] = previous[file_path]
+                    continue
+            fingerprints[file_path] = stat + (file_sha256(file_path),)
+        return fingerprints
+
+    def reload(self, force=False) -> ArtifactSnapshot:
+        """
+        Reload the artifacts if their content changed on disk (or unconditionally if forced).
+
+        Arg:
+            force (bool): Reload even if the artifact hashes are unchanged.
+
+        Returns:
+            ArtifactSnapshot: The snapshot in use after the call.
+        """
+        try:
+            with self._reload_lock:
+                self._last_check = time.monotonic()
+                current = self._snapshot
+                previous = current.fingerprints if current is not None else None
+                fingerprints = self._current_fingerprints(previous)
+
+                if current is not None and not force:
+                    hashes = {path: fp and fp[2] for path, fp in fingerprints.items()}
+                    loaded = {path: fp and fp[2] for path, fp in previous.items()}
+                    if hashes == loaded:
+                        if fingerprints != previous:
+                            # Touched but identical content, remember the new mtimes
+                            self._snapshot = ArtifactSnapshot(
+                                objects=current.objects,
+                                fingerprints=fingerprints,
+                                load_times=current.load_times,
+                                version=current.version,
+                                loaded_at=current.loaded_at,
+                                manifest=current.manifest,
+                                deferred=current.deferred,
+                            )
+                        self._warn_newer_sources(self._snapshot)
+                        return self._snapshot
+
+                snapshot = self._load_snapshot(fingerprints)
+                # Single reference assignment, readers see either the old or the new snapshot
+                self._snapshot = snapshot
+                self._warn_newer_sources(snapshot)
+                logging.info(
+                    f"Artifact snapshot v{snapshot.version} in use, "
+                    f"total load time {sum(snapshot.load_times.values()) * 1000:.1f} ms"
+                )
+                return snapshot
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def warm_up(self, deferred=False) -> dict:
+        """
+        Load the artifacts ahead of the first request.
+
+        Arg:
+            deferred (bool): Also load the artifacts deferred to their first access.
+
+        Returns:
+            dict: The load time in seconds of every loaded artifact.
+        """
+        snapshot = self.reload()
+        if deferred:
+            snapshot.load_deferred()
+        return snapshot.load_times
+
+    def get(self) -> ArtifactSnapshot:
+        """
+        Return the current snapshot, loading it on first use.
+
+        At most once per check interval the artifact files are checked for changes. If the
+        check or the reload fails (e.g. a file is being rewritten), the current snapshot is
+        kept and served, and the check is retried at the next interval.
+
+        Returns:
+            ArtifactSnapshot: The snapshot to serve the request with.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.reload()
+
+        if time.monotonic() - self._last_check < self.cache_config.check_interval:
+            return snapshot
+
+        # Another thread is already checking/reloading, keep serving the current snapshot
+        if self._reload_lock.locked():
+            return snapshot
+        try:
+            return self.reload()
+        except CustomException as e:
+            logging.error(
+                f"Artifact reload failed, serving snapshot v{snapshot.version}: {e}"
+            )
+            return snapshot
+
+
+_artifact_cache = None
+_artifact_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """
+    Return the process-wide ArtifactCache, creating it on first use.
+    """
+    global _artifact_cache
+    if _artifact_cache is None:
+        with _artifact_cache_lock:
+            if _artifact_cache is None:
+                _artifact_cache = ArtifactCache()
+    return _artifact_cache
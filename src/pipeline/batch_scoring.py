@@ -0,0 +1,374 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.prediction_pipeline import PredictionPipeline
+
+PROGRESS_FILE = "_progress.json"
+
+# Pipeline of the worker process, loaded once by _init_worker
+_worker = {}
+
+
+@dataclass
+class BatchScoringConfig:
+    # CSV file, or Parquet file or directory of Parquet partitions
+    input_path: str = os.path.join("artifacts", "test.csv")
+    # A .csv file, or a directory of Parquet parts (one part-NNNNN.parquet per chunk)
+    output_path: str = os.path.join("artifacts", "predictions")
+    chunk_size: int = 100_000
+    # Worker processes scoring chunks in parallel, 1 scores in this process
+    workers: int = 1
+    # Write the input columns next to the predictions
+    include_inputs: bool = True
+    prediction_column: str = "predicted_math_score"
+    # Continue after the last completed chunk of a previous run with the same input,
+    # chunk size and model; start over otherwise
+    resume: bool = True
+
+
+def _pinned_pipeline() -> PredictionPipeline:
+    """
+    A PredictionPipeline whose artifacts are loaded once and never reloaded, so that
+    every chunk of a run is scored by the same model. Every chunk is transformed by the
+    sklearn preprocessor, it is not deferred.
+    """
+    pipeline = PredictionPipeline(
+        ArtifactCache(
+            ArtifactCacheConfig(check_interval=float("inf"), defer_preprocessor=False)
+        )
+    )
+    pipeline.warm_up()
+    return pipeline
+
+
+def artifact_version(pipeline) -> dict:
+    """
+    Returns:
+        dict: {artifact path: sha256} of the artifacts the pipeline scores with.
+    """
+    return {
+        file_path: fingerprint and fingerprint[2]
+        for file_path, fingerprint in pipeline.artifact_cache.get().fingerprints.items()
+    }
+
+
+def score_chunk(pipeline, index, chunk) -> tuple:
+    """
+    Validate and score one chunk. Invalid rows are not scored, their prediction is NaN.
+
+    Returns:
+        tuple: (pd.Series of the predictions, indexed as the chunk; list of the
+            validation errors, rows numbered within the chunk)
+    """
+    df, errors, invalid_rows = pipeline.validate_rows(chunk)
+    predictions = pd.Series(np.nan, index=chunk.index)
+    if not invalid_rows.all():
+        valid = df[~invalid_rows]
+        predictions[~invalid_rows] = pipeline.predict_batch(valid, validate=False)
+    return predictions, errors
+
+
+def _init_worker(threads):
+    from threadpoolctl import threadpool_limits
+
+    # The workers share the cores, each gets its part for the BLAS/OpenMP pools
+    _worker["thread_limits"] = threadpool_limits(limits=threads)
+    _worker["pipeline"] = _pinned_pipeline()
+
+
+def _score_in_worker(index, chunk):
+    predictions, errors = score_chunk(_worker["pipeline"], index, chunk)
+    return predictions.to_numpy(), errors
+
+
+def iter_chunks(path, chunk_size, start_chunk=0):
+    """
+    Read chunk_size rows at a time, starting at chunk start_chunk.
+
+    Yields:
+        tuple: (chunk index, pd.DataFrame)
+    """
+    if not (os.path.isdir(path) or path.endswith(".parquet")):
+        skipped = start_chunk * chunk_size
+        # The skipped rows are not parsed. A callable, pandas turns a range into a set
+        # of every skipped row number
+        chunks = pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            skiprows=lambda row: 0 < row <= skipped,
+        )
+        yield from enumerate(chunks, start=start_chunk)
+        return
+
+    from src.utils import iter_dataframe
+
+    for index, chunk in enumerate(iter_dataframe(path, chunk_size)):
+        if index >= start_chunk:
+            yield index, chunk
+
+
+class BatchScoring:
+    def __init__(self, config=None):
+        """
+        Offline scoring of a file of student records with the served model.
+
+        The input is streamed chunk_size rows at a time and every chunk is validated
+        and scored with PredictionPipeline.predict_batch (one transform and one predict
+        call per chunk), then appended to the output, so memory is bounded by a few
+        chunks whatever the input size. Invalid rows do not stop the run: they are
+        written with an empty prediction, and their errors are logged and counted in
+        the summary. With several workers, the chunks are scored in
+        a process pool whose workers load the artifacts once; at most two chunks per
+        worker are in flight and they are written in input order.
+
+        After each written chunk the progress file records the number of completed
+        chunks (and for CSV output the output size), with the input, chunk size and
+        artifact hashes. A rerun with resume continues after the last completed chunk;
+        a CSV written past it by an interrupted run is truncated first.
+
+        Attributes:
+            scoring_config (BatchScoringConfig): Input, output and parallelism.
+        """
+        self.scoring_config = config or BatchScoringConfig()
+
+    def is_csv_output(self) -> bool:
+        return self.scoring_config.output_path.endswith(".csv")
+
+    def progress_path(self) -> str:
+        output_path = self.scoring_config.output_path
+        if self.is_csv_output():
+            return f"{output_path}.progress.json"
+        return os.path.join(output_path, PROGRESS_FILE)
+
+    def read_progress(self, run) -> dict:
+        """
+        Returns:
+            dict: The progress of the previous run if it can be resumed, else a fresh one.
+        """
+        fresh = {
+            **run,
+            "completed_chunks": 0,
+            "rows": 0,
+            "invalid_rows": 0,
+            "output_bytes": 0,
+        }
+        path = self.progress_path()
+        if not self.scoring_config.resume or not os.path.exists(path):
+            return fresh
+        with open(path) as file_obj:
+            progress = json.load(file_obj)
+        if any(progress.get(key) != value for key, value in run.items()):
+            logging.warning(
+                "Input, chunk size or model changed since the previous run, "
+                "scoring from the start"
+            )
+            return fresh
+        output_path = self.scoring_config.output_path
+        if self.is_csv_output() and (
+            not os.path.exists(output_path)
+            or os.path.getsize(output_path) < progress["output_bytes"]
+        ):
+            logging.warning("Output of the previous run is incomplete, starting over")
+            return fresh
+        return progress
+
+    def write_progress(self, progress):
+        path = self.progress_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(progress, file_obj, indent=2)
+        os.replace(tmp_path, path)
+
+    def prepare_output(self, progress):
+        """
+        Remove what the previous run wrote after its last completed chunk.
+        """
+        output_path = self.scoring_config.output_path
+        if self.is_csv_output():
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            if progress["completed_chunks"] == 0:
+                open(output_path, "w").close()
+            else:
+                with open(output_path, "r+b") as file_obj:
+                    file_obj.truncate(progress["output_bytes"])
+            return
+        os.makedirs(output_path, exist_ok=True)
+        for file_name in os.listdir(output_path):
+            if file_name.startswith("part-"):
+                index = int(file_name[len("part-") :].split(".")[0])
+                if index >= progress["completed_chunks"]:
+                    os.remove(os.path.join(output_path, file_name))
+
+    def write_chunk(self, index, chunk, predictions) -> int:
+        """
+        Append a scored chunk to the output.
+
+        Returns:
+            int: The size of the CSV output after the chunk, 0 for Parquet.
+        """
+        config = self.scoring_config
+        frame = chunk if config.include_inputs else pd.DataFrame(index=chunk.index)
+        frame = frame.assign(**{config.prediction_column: predictions})
+        if self.is_csv_output():
+            with open(config.output_path, "a", newline="") as file_obj:
+                frame.to_csv(file_obj, index=False, header=index == 0)
+                return file_obj.tell()
+        part_path = os.path.join(config.output_path, f"part-{index:05d}.parquet")
+        frame.to_parquet(f"{part_path}.tmp", index=False)
+        os.replace(f"{part_path}.tmp", part_path)
+        return 0
+
+    def scored_chunks(self, chunks, pipeline):
+        """
+        Score the chunks, in this process or in the worker pool.
+
+        Yields:
+            tuple: (chunk index, chunk, (predictions, validation errors)) in input order.
+        """
+        config = self.scoring_config
+        if config.workers <= 1:
+            for index, chunk in chunks:
+                predictions, errors = score_chunk(pipeline, index, chunk)
+                yield index, chunk, (predictions.to_numpy(), errors)
+            return
+
+        threads = max(1, (os.cpu_count() or 1) // config.workers)
+        # spawn: forking after OpenMP/BLAS initialised their threads can deadlock
+        with ProcessPoolExecutor(
+            max_workers=config.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        ) as executor:
+            in_flight = []
+            for index, chunk in chunks:
+                in_flight.append(
+                    (index, chunk, executor.submit(_score_in_worker, index, chunk))
+                )
+                # Bounded memory: wait for the oldest chunk before reading more
+                if len(in_flight) >= 2 * config.workers:
+                    index, chunk, future = in_flight.pop(0)
+                    yield index, chunk, future.result()
+            for index, chunk, future in in_flight:
+                yield index, chunk, future.result()
+
+    def initiate_batch_scoring(self) -> dict:
+        """
+        Score the input file into the output.
+
+        Returns:
+            dict: rows, invalid rows and chunks scored by this run, rows, invalid rows
+                and chunks in the output, seconds and rows per second of this run.
+        """
+        try:
+            config = self.scoring_config
+            # Loaded here for the artifact hashes of the progress file, and for
+            # scoring when there are no workers
+            pipeline = _pinned_pipeline()
+            run = {
+                "input_path": os.path.abspath(config.input_path),
+                "chunk_size": config.chunk_size,
+                "include_inputs": config.include_inputs,
+                "artifacts": artifact_version(pipeline),
+            }
+            progress = self.read_progress(run)
+            self.prepare_output(progress)
+            if progress["completed_chunks"]:
+                logging.info(
+                    f"Resuming after chunk {progress['completed_chunks'] - 1}, "
+                    f"{progress['rows']} rows already scored"
+                )
+
+            start = time.perf_counter()
+            rows = chunks = invalid_rows = 0
+            for index, chunk, (predictions, errors) in self.scored_chunks(
+                iter_chunks(
+                    config.input_path, config.chunk_size, progress["completed_chunks"]
+                ),
+                pipeline,
+            ):
+                output_bytes = self.write_chunk(index, chunk, predictions)
+                invalid = int(np.isnan(predictions).sum())
+                if errors:
+                    logging.warning(
+                        f"Chunk {index}: {invalid} invalid rows not scored "
+                        f"(rows from {index * config.chunk_size}): " + "; ".join(errors)
+                    )
+                rows += len(chunk)
+                chunks += 1
+                invalid_rows += invalid
+                progress.update(
+                    completed_chunks=index + 1,
+                    rows=progress["rows"] + len(chunk),
+                    invalid_rows=progress.get("invalid_rows", 0) + invalid,
+                    output_bytes=output_bytes,
+                )
+                self.write_progress(progress)
+                elapsed = time.perf_counter() - start
+                logging.info(
+                    f"Chunk {index} scored: {progress['rows']} rows, "
+                    f"{rows / elapsed:.0f} rows/s"
+                )
+
+            seconds = time.perf_counter() - start
+            summary = {
+                "rows": rows,
+                "chunks": chunks,
+                "invalid_rows": invalid_rows,
+                "total_rows": progress["rows"],
+                "total_invalid_rows": progress.get("invalid_rows", 0),
+                "total_chunks": progress["completed_chunks"],
+                "seconds": seconds,
+                "rows_per_s": rows / seconds if seconds else 0.0,
+                "output_path": config.output_path,
+            }
+            logging.info(f"Batch scoring completed: {summary}")
+            return summary
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main():
+    defaults = BatchScoringConfig()
+    parser = argparse.ArgumentParser(
+        description="Score a CSV/Parquet file of student records with the served model."
+    )
+    parser.add_argument("input_path")
+    parser.add_argument(
+        "output_path", help="A .csv file or a directory of Parquet parts"
+    )
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument(
+        "--predictions-only",
+        action="store_true",
+        help="Write only the prediction column",
+    )
+    parser.add_argument("--no-resume", action="store_true", help="Score from the start")
+    args = parser.parse_args()
+
+    summary = BatchScoring(
+        BatchScoringConfig(
+            input_path=args.input_path,
+            output_path=args.output_path,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            include_inputs=not args.predictions_only,
+            resume=not args.no_resume,
+        )
+    ).initiate_batch_scoring()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
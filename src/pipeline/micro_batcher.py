@@ -0,0 +1,279 @@
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class MicroBatcherConfig:
+    # A batch is scored as soon as it has this many records...
+    max_batch_size: int = 64
+    # ...or when its oldest record has waited this long
+    max_wait_ms: float = 2.0
+    # Submissions beyond this many queued records are rejected
+    max_queue_size: int = 10_000
+    # Number of recent batches the wait time and batch size percentiles are computed on
+    stats_window: int = 10_000
+    # Seconds a request waits for its prediction (queue wait included), None to wait
+    # indefinitely
+    request_timeout: float = 5.0
+
+
+# Queued by stop(): the worker scores what was queued before it and exits
+_STOP = object()
+
+
+def _percentile(values, q) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+class MicroBatcherStats:
+    def __init__(self, window):
+        """
+        Counters of the micro-batcher, updated by its worker thread.
+
+        Attributes:
+            batch_sizes (dict): {batch size: number of batches of that size}.
+            waits (deque): Queue wait in seconds of the oldest record of recent batches.
+            sizes (deque): Sizes of the recent batches.
+        """
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+        self.batch_sizes = {}
+        self.waits = deque(maxlen=window)
+        self.sizes = deque(maxlen=window)
+
+    def record_batch(self, size, wait, failures):
+        with self._lock:
+            self.requests += size
+            self.batches += 1
+            self.failures += failures
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self.waits.append(wait)
+            self.sizes.append(size)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            waits = np.array(self.waits) * 1000
+            sizes = np.array(self.sizes)
+            batches = max(self.batches, 1)
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "mean_batch_size": self.requests / batches,
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "batch_size_p50": _percentile(sizes, 50),
+                "batch_size_p99": _percentile(sizes, 99),
+                "wait_ms_p50": _percentile(waits, 50),
+                "wait_ms_p99": _percentile(waits, 99),
+                "wait_ms_max": _percentile(waits, 100),
+            }
+
+
+class MicroBatcher:
+    def __init__(self, prediction_pipeline, config=None):
+        """
+        Coalesce concurrent single-record predictions into micro-batches.
+
+        Request threads put their record in a queue and wait on a Future. One worker
+        thread takes the first queued record, keeps collecting until the batch has
+        max_batch_size records or the first record has waited max_wait_ms, and scores
+        the whole batch with a single PredictionPipeline.predict_records call. If the
+        batch fails, its records are scored one by one so an invalid record only fails
+        its own request.
+
+        Attributes:
+            prediction_pipeline (PredictionPipeline): Scores the batches.
+            batcher_config (MicroBatcherConfig): Batch size, wait and queue limits.
+            stats (MicroBatcherStats): Batch size and wait time statistics.
+        """
+        self.prediction_pipeline = prediction_pipeline
+        self.batcher_config = config or MicroBatcherConfig()
+        self.stats = MicroBatcherStats(self.batcher_config.stats_window)
+        self._queue = queue.Queue(maxsize=self.batcher_config.max_queue_size)
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker thread, if not running yet.
+        """
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True
+                )
+                self._worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker thread after it scored the records queued so far; start()
+        restarts it.
+
+        Call before the process forks: the thread does not survive the fork, and its
+        wait on the queue would stay registered in the child's copy of the queue, so a
+        new worker thread there would miss the records put in it.
+
+        Arg:
+            timeout (float): Maximum seconds to wait for room in a full queue and for
+                the thread, None to wait until it exits.
+        """
+        with self._start_lock:
+            worker = self._worker
+            if worker is not None and worker.is_alive():
+                deadline = None if timeout is None else time.monotonic() + timeout
+                try:
+                    self._queue.put(_STOP, timeout=timeout)
+                except queue.Full:
+                    logging.warning(
+                        f"Micro-batching queue still full after {timeout}s, "
+                        "worker not stopped"
+                    )
+                else:
+                    worker.join(
+                        None if deadline is None else deadline - time.monotonic()
+                    )
+            self._worker = None
+        return self
+
+    def submit(self, record) -> Future:
+        """
+        Queue a record for scoring.
+
+        Arg:
+            record (dict): {column: value} for every input column.
+
+        Returns:
+            Future: Resolves to the prediction (float).
+        """
+        if self._worker is None:
+            self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((record, future, time.perf_counter()))
+        except queue.Full:
+            self.stats.record_rejected()
+            future.set_exception(
+                RuntimeError("Micro-batching queue is full, try again later")
+            )
+        return future
+
+    def predict(self, record, timeout=None) -> float:
+        """
+        Score a record through the micro-batcher and wait for the prediction.
+
+        Arg:
+            record (dict): {column: value} for every input column.
+            timeout (float): Maximum seconds to wait, None to wait indefinitely.
+
+        Returns:
+            float: The prediction.
+
+        Raises:
+            concurrent.futures.TimeoutError: No prediction within timeout, e.g. the
+                worker thread stalled. The record is cancelled if not scored yet.
+        """
+        future = self.submit(record)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> dict:
+        """
+        Returns:
+            dict: Current queue depth, batch size distribution and wait times (ms).
+        """
+        return {
+            "queue_depth": self.queue_depth(),
+            "max_batch_size": self.batcher_config.max_batch_size,
+            "max_wait_ms": self.batcher_config.max_wait_ms,
+            **self.stats.as_dict(),
+        }
+
+    def _next_batch(self) -> list:
+        """
+        Returns:
+            list: The queued (record, future, queued at) of the next batch, ending with
+                _STOP if stop() was called.
+        """
+        batch = [self._queue.get()]
+        if batch[0] is _STOP:
+            return batch
+        deadline = batch[0][2] + self.batcher_config.max_wait_ms / 1000
+        while len(batch) < self.batcher_config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Records already queued are taken without waiting
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is _STOP:
+                break
+        return batch
+
+    def _score(self, batch) -> int:
+        """
+        Score a batch and resolve its futures. Returns the number of failed records.
+        """
+        records = [record for record, _, _ in batch]
+        try:
+            predictions = self.prediction_pipeline.predict_records(records)
+            for (_, future, _), prediction in zip(batch, predictions):
+                future.set_result(float(prediction))
+            return 0
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return 1
+            logging.warning(f"Micro-batch of {len(batch)} failed, scoring one by one")
+            # Futures resolved before the failure keep their result
+            return sum(self._score([item]) for item in batch if not item[1].done())
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stopping = batch[-1] is _STOP
+            if stopping:
+                batch.pop()
+            # Records cancelled by their caller (e.g. after a timeout) are skipped, the
+            # others can no longer be cancelled and are resolved exactly once
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            try:
+                if batch:
+                    wait = time.perf_counter() - batch[0][2]
+                    failures = self._score(batch)
+                    self.stats.record_batch(len(batch), wait, failures)
+            except Exception as e:
+                # The worker must outlive any batch
+                logging.error(f"Micro-batcher worker error: {e}")
+            if stopping:
+                return
@@ -1,29 +1,313 @@
 import sys
+import numpy as np
 import pandas as pd
 from src.exception import CustomException
-from src.utils import load_object
-from src.logger import logging
+from src.metrics import timed
+from src.component.numeric_mode import densify_for
+from src.pipeline.artifact_cache import get_artifact_cache
 from typing import Union
 
+CATEGORICAL_FEATURES = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+]
+NUMERICAL_FEATURES = ["writing_score", "reading_score"]
+FEATURE_COLUMNS = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+# Columns that may be left empty, the preprocessor imputes them
+OPTIONAL_FEATURES = ["test_preparation_course"]
+SCORE_RANGE = (0, 100)
+# Maximum number of offending rows listed per validation error
+MAX_REPORTED_ROWS = 10
+
+
+def known_categories(preprocessor) -> dict:
+    """
+    Collect the categories the preprocessor's OneHotEncoder was fitted with.
+
+    Arg:
+        preprocessor (ColumnTransformer): The fitted preprocessor.
+
+    Returns:
+        dict: {column: set of categories}, empty if no encoder is found.
+    """
+    categories = {}
+    for _, transformer, columns in getattr(preprocessor, "transformers_", []):
+        steps = getattr(transformer, "steps", [("", transformer)])
+        for _, step in steps:
+            if hasattr(step, "categories_"):
+                for column, values in zip(columns, step.categories_):
+                    categories[column] = set(values.tolist())
+    return categories
+
+
+def _describe_rows(mask) -> str:
+    rows = np.flatnonzero(np.asarray(mask))
+    listed = ", ".join(str(row) for row in rows[:MAX_REPORTED_ROWS])
+    more = (
+        f" and {len(rows) - MAX_REPORTED_ROWS} more"
+        if len(rows) > MAX_REPORTED_ROWS
+        else ""
+    )
+    return f"{len(rows)} rows ({listed}{more})"
+
+
+def validate_rows(df, categories=None) -> tuple:
+    """
+    Validate a batch of records column by column, without looping over the rows.
+
+    Numeric columns are coerced to numbers and empty categorical values are set to NaN,
+    in place.
+
+    Arg:
+        df (pd.DataFrame): The records to validate.
+        categories (dict): Optional {column: allowed values} for the categorical columns.
+
+    Returns:
+        tuple: (human readable error messages, empty if the batch is valid; boolean
+            np.ndarray marking the invalid rows)
+    """
+    errors = []
+    invalid_rows = np.zeros(len(df), dtype=bool)
+    missing_columns = [column for column in FEATURE_COLUMNS if column not in df.columns]
+    if missing_columns:
+        return [f"Missing columns: {missing_columns}"], ~invalid_rows
+
+    for column in CATEGORICAL_FEATURES:
+        values = df[column]
+        empty = values.isna()
+        # The imputer only recognises NaN as missing, not None
+        values = df[column] = values.astype(object).where(~empty, np.nan)
+        if column not in OPTIONAL_FEATURES and empty.any():
+            errors.append(f"{column} is empty in {_describe_rows(empty)}")
+            invalid_rows |= empty.to_numpy()
+        if categories and column in categories:
+            unknown = ~empty & ~values.isin(categories[column])
+            if unknown.any():
+                invalid_rows |= unknown.to_numpy()
+                errors.append(
+                    f"{column} has unknown values {sorted(values[unknown].astype(str).unique())[:MAX_REPORTED_ROWS]} "
+                    f"in {_describe_rows(unknown)}"
+                )
+
+    low, high = SCORE_RANGE
+    for column in NUMERICAL_FEATURES:
+        numbers = pd.to_numeric(df[column], errors="coerce")
+        invalid = numbers.isna()
+        if invalid.any():
+            errors.append(f"{column} is not a number in {_describe_rows(invalid)}")
+            invalid_rows |= invalid.to_numpy()
+        out_of_range = ~invalid & ((numbers < low) | (numbers > high))
+        if out_of_range.any():
+            invalid_rows |= out_of_range.to_numpy()
+            errors.append(
+                f"{column} is outside [{low}, {high}] in {_describe_rows(out_of_range)}"
+            )
+        df[column] = numbers
+
+    return errors, invalid_rows
+
+
+def validate_batch(df, categories=None) -> list:
+    """
+    Validate a batch of records (see validate_rows).
+
+    Returns:
+        list: Human readable error messages, empty if the batch is valid.
+    """
+    return validate_rows(df, categories)[0]
+
 
 class PredictionPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, artifact_cache=None):
+        """
+        Arg:
+            artifact_cache (ArtifactCache): Cache serving the model and preprocessor.
+                Defaults to the process-wide cache.
+        """
+        self.artifact_cache = artifact_cache or get_artifact_cache()
+
+    def warm_up(self) -> dict:
+        """
+        Load the artifacts before the first request is served.
+
+        Returns:
+            dict: The load time in seconds of every artifact.
+        """
+        try:
+            return self.artifact_cache.warm_up()
+        except Exception as e:
+            raise CustomException(e, sys)
 
     def predict(self, features):
         try:
-            model_path = "artifacts\model.pkl"
-            preprocessor_path = "artifacts\preprocessing.pkl"
+            # Model and preprocessor come from the same snapshot, even during a reload
+            with timed("serving", "artifact_get"):
+                snapshot = self.artifact_cache.get()
 
-            logging.info(f"{model_path}")
-            logging.info(f"{preprocessor_path}")
+            with timed("serving", "transform"):
+                data_scaled = snapshot.preprocessor.transform(features)
+            with timed("serving", "predict"):
+                preds = snapshot.model.predict(densify_for(snapshot.model, data_scaled))
+            return preds
+        except Exception as e:
+            raise CustomException(e, sys)
 
-            model = load_object(file_path=model_path)
-            preprocessor = load_object(file_path=preprocessor_path)
+    def predict_record(self, record) -> float:
+        """
+        Score a single raw record.
 
-            data_scaled = preprocessor.transform(features)
-            preds = model.predict(data_scaled)
-            return preds
+        Reads the precomputed prediction table when the record is inside its domain.
+        Otherwise uses the compiled preprocessor when one matching the loaded
+        preprocessor is available, and the sklearn preprocessor on a one-row DataFrame.
+
+        Arg:
+            record (dict): {column: value} for every input column.
+
+        Returns:
+            float: The prediction.
+        """
+        try:
+            with timed("serving", "artifact_get"):
+                snapshot = self.artifact_cache.get()
+            if snapshot.prediction_table is not None:
+                with timed("serving", "table_lookup"):
+                    prediction = snapshot.prediction_table.lookup(record)
+                if prediction is not None:
+                    return prediction
+            compiled_preprocessor = snapshot.compiled_preprocessor
+            if compiled_preprocessor is not None:
+                with timed("serving", "transform"):
+                    data_scaled = compiled_preprocessor.transform_record(record)
+            else:
+                with timed("serving", "build_dataframe"):
+                    features = pd.DataFrame([record], columns=FEATURE_COLUMNS)
+                with timed("serving", "transform"):
+                    data_scaled = snapshot.preprocessor.transform(features)
+            with timed("serving", "predict"):
+                data_scaled = densify_for(snapshot.model, data_scaled)
+                return snapshot.model.predict(data_scaled)[0]
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_records(self, records) -> np.ndarray:
+        """
+        Score a small list of raw records (e.g. a micro-batch) with one predict call.
+
+        Like predict_record, reads the prediction table first and uses the compiled
+        preprocessor when available; records outside the table are scored together.
+
+        Arg:
+            records (list): {column: value} dicts for every input column.
+
+        Returns:
+            np.ndarray: One prediction per record, in input order.
+        """
+        try:
+            with timed("serving", "artifact_get"):
+                snapshot = self.artifact_cache.get()
+            predictions = np.full(len(records), np.nan)
+            missing = list(range(len(records)))
+            if snapshot.prediction_table is not None:
+                with timed("serving", "table_lookup"):
+                    looked_up = [snapshot.prediction_table.lookup(r) for r in records]
+                missing = [i for i, value in enumerate(looked_up) if value is None]
+                for i, value in enumerate(looked_up):
+                    if value is not None:
+                        predictions[i] = value
+            if not missing:
+                return predictions
+
+            remaining = [records[i] for i in missing]
+            compiled_preprocessor = snapshot.compiled_preprocessor
+            if compiled_preprocessor is not None:
+                with timed("serving", "transform"):
+                    data_scaled = compiled_preprocessor.transform(remaining)
+            else:
+                with timed("serving", "build_dataframe"):
+                    features = pd.DataFrame.from_records(
+                        remaining, columns=FEATURE_COLUMNS
+                    )
+                with timed("serving", "transform"):
+                    data_scaled = snapshot.preprocessor.transform(features)
+            with timed("serving", "predict"):
+                predictions[missing] = snapshot.model.predict(
+                    densify_for(snapshot.model, data_scaled)
+                )
+            return predictions
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def validate_batch(self, records) -> tuple:
+        """
+        Build a DataFrame from a batch of records and validate it in bulk.
+
+        Arg:
+            records (pd.DataFrame | list): The records, as a DataFrame or a list of dicts.
+
+        Returns:
+            tuple: (features DataFrame, list of error messages)
+        """
+        df, errors, _ = self.validate_rows(records)
+        return df, errors
+
+    def validate_rows(self, records) -> tuple:
+        """
+        Like validate_batch, also telling which rows are invalid.
+
+        Returns:
+            tuple: (features DataFrame, list of error messages, boolean np.ndarray
+                marking the invalid rows)
+        """
+        try:
+            with timed("serving", "build_dataframe"):
+                if isinstance(records, pd.DataFrame):
+                    df = records.copy()
+                else:
+                    df = pd.DataFrame.from_records(records)
+            with timed("serving", "artifact_get"):
+                snapshot = self.artifact_cache.get()
+            with timed("serving", "validate"):
+                # Read from the compiled tables when available, which does not need
+                # the (possibly deferred) sklearn preprocessor
+                compiled_preprocessor = snapshot.compiled_preprocessor
+                categories = (
+                    compiled_preprocessor.categories()
+                    if compiled_preprocessor is not None
+                    else known_categories(snapshot.preprocessor)
+                )
+                errors, invalid_rows = validate_rows(df, categories)
+            return df, errors, invalid_rows
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def predict_batch(self, records, validate=True):
+        """
+        Score a batch of records with a single transform and a single predict call.
+
+        Arg:
+            records (pd.DataFrame | list): The records, as a DataFrame or a list of dicts.
+            validate (bool): Validate the records first. Pass False for a DataFrame
+                already returned by validate_batch without errors.
+
+        Returns:
+            np.ndarray: One prediction per record, in input order.
+        """
+        try:
+            df = records
+            if validate:
+                df, errors = self.validate_batch(records)
+                if errors:
+                    raise ValueError("Invalid batch: " + "; ".join(errors))
+
+            with timed("serving", "artifact_get"):
+                snapshot = self.artifact_cache.get()
+            with timed("serving", "transform"):
+                data_scaled = snapshot.preprocessor.transform(df[FEATURE_COLUMNS])
+            with timed("serving", "predict"):
+                return snapshot.model.predict(densify_for(snapshot.model, data_scaled))
         except Exception as e:
             raise CustomException(e, sys)
 
@@ -47,6 +331,17 @@ class CustomData:
         self.writing_score = writing_score
         self.reading_score = reading_score
 
+    def get_data_as_dict(self) -> dict:
+        return {
+            "gender": self.gender,
+            "race_ethnicity": self.race_ethnicity,
+            "parental_level_of_education": self.parental_level_of_education,
+            "lunch": self.lunch,
+            "test_preparation_course": self.test_preparation_course,
+            "writing_score": self.writing_score,
+            "reading_score": self.reading_score,
+        }
+
     def get_data_as_dataframe(self):
         try:
             Custom_input_dict = {
@@ -0,0 +1,197 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from src.exception import CustomException
+from src.logger import LoggerConfig, configure_logging, logging, shutdown_logging
+
+
+@dataclass
+class PreforkServerConfig:
+    host: str = "0.0.0.0"
+    port: int = 8000
+    # Worker processes, each serving requests with a pool of threads
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    backlog: int = 1024
+    # Seconds the workers get to finish their requests on shutdown
+    graceful_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the configuration from HOST, PORT, WORKERS and GRACEFUL_TIMEOUT.
+        """
+        config = cls()
+        env = os.environ
+        config.host = env.get("HOST", config.host)
+        config.port = int(env.get("PORT", config.port))
+        config.workers = int(env.get("WORKERS", config.workers))
+        config.graceful_timeout = float(
+            env.get("GRACEFUL_TIMEOUT", config.graceful_timeout)
+        )
+        return config
+
+
+class PreforkServer:
+    def __init__(self, config=None):
+        """
+        Serve application.py from several forked worker processes.
+
+        The master imports the application, which loads and warms the model,
+        preprocessor and prediction table, opens the listening socket, then forks the
+        workers. The workers inherit the loaded artifacts: their memory pages are shared
+        copy-on-write instead of every worker loading its own copy (memory-mapped bundle
+        arrays and prediction table are shared through the page cache anyway).
+        gc.freeze() before the fork moves the loaded objects out of the garbage
+        collector's reach, so collections in the workers do not write to, and thereby
+        copy, their pages. Every worker accepts connections on the inherited socket with
+        a threaded werkzeug server. The master only restarts workers that exit and
+        forwards SIGTERM/SIGINT to them.
+
+        The metrics are kept per process: a /metrics scrape through the shared socket
+        returns the counters of whichever worker accepted it, not a total over the
+        workers, and the series restart from zero when a worker is restarted. Dashboards
+        should treat them as samples (rates and latency percentiles of one worker).
+
+        Attributes:
+            server_config (PreforkServerConfig): Address and number of workers.
+            workers (dict): {pid: worker index} of the running workers.
+        """
+        self.server_config = config or PreforkServerConfig.from_env()
+        self.workers = {}
+        # Monotonic time of the shutdown request
+        self.stopping = None
+        self.app = None
+        self.sock = None
+
+    def bind(self) -> socket.socket:
+        config = self.server_config
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((config.host, config.port))
+        sock.listen(config.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn_worker(self, index) -> int:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = index
+            return pid
+        # Worker process, never returns
+        exit_code = 0
+        try:
+            self.run_worker(index)
+        except BaseException as e:
+            logging.error(f"Worker {index} failed: {e}")
+            exit_code = 1
+        finally:
+            shutdown_logging()
+            os._exit(exit_code)
+
+    def run_worker(self, index):
+        from werkzeug.serving import make_server
+
+        # Ctrl-C reaches the whole process group, the master decides on shutdown
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Threads do not survive a fork: the log writer (with a file of its own, several
+        # processes must not rotate the same file) and the micro-batcher, both stopped by
+        # the master before forking, are restarted
+        config = LoggerConfig.from_env()
+        config.log_file = f"{os.path.splitext(config.log_file)[0]}_{os.getpid()}.log"
+        configure_logging(config)
+        application = sys.modules["application"]
+        if application.micro_batcher is not None:
+            application.micro_batcher.start()
+
+        server = make_server(
+            self.server_config.host,
+            self.server_config.port,
+            self.app,
+            threaded=True,
+            fd=self.sock.fileno(),
+        )
+        # shutdown() waits for serve_forever, which therefore runs in another thread
+        signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+        logging.info(f"Worker {index} serving, pid {os.getpid()}")
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(0.5)
+
+    def signal_workers(self, signum):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, *_):
+        if self.stopping is None:
+            self.stopping = time.monotonic()
+            self.signal_workers(signal.SIGTERM)
+
+    def initiate_server(self):
+        """
+        Load the application, fork the workers and supervise them until SIGTERM/SIGINT.
+        """
+        try:
+            config = self.server_config
+            import application
+
+            self.app = application.app
+            # Load what the application deferred, once here and shared by the workers
+            application.prediction_pipeline.artifact_cache.warm_up(deferred=True)
+            self.sock = self.bind()
+            logging.info(
+                f"Prefork server listening on {config.host}:{config.port} with "
+                f"{config.workers} workers"
+            )
+
+            # No thread may run during fork (the child would inherit its locks held)
+            shutdown_logging()
+            if application.micro_batcher is not None:
+                application.micro_batcher.stop(timeout=config.graceful_timeout)
+            gc.collect()
+            gc.freeze()
+            for index in range(config.workers):
+                self.spawn_worker(index)
+            configure_logging()
+
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+            while self.workers:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if not pid:
+                    if (
+                        self.stopping is not None
+                        and time.monotonic() - self.stopping > config.graceful_timeout
+                    ):
+                        self.signal_workers(signal.SIGKILL)
+                    time.sleep(0.1)
+                    continue
+                index = self.workers.pop(pid, None)
+                if index is None or self.stopping is not None:
+                    continue
+                logging.warning(
+                    f"Worker {index} (pid {pid}) exited with status {status}, restarting"
+                )
+                time.sleep(0.1)
+                shutdown_logging()
+                self.spawn_worker(index)
+                configure_logging()
+            self.sock.close()
+            logging.info("Prefork server stopped")
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    PreforkServer().initiate_server()
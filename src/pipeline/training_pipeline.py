@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Callable
+from src.component.data_ingestion import DataIngestion
+from src.component.data_transformation import DataTransformation
+from src.component.model_trainer import ModelTrainer, get_models, get_param_grids
+from src.exception import CustomException
+from src.logger import logging
+from src.metrics import write_metrics
+from src.utils import file_sha256
+
+
+@dataclass
+class TrainingPipelineConfig:
+    # Input hash, output hashes and result of every stage of the last run
+    state_file_path: str = os.path.join("artifacts", "pipeline_state.json")
+    # Run every stage even if its inputs are unchanged
+    force: bool = False
+    # Stages whose upstream stages are done run concurrently on this many threads
+    max_workers: int = 2
+    metrics_file_path: str = os.path.join("artifacts", "training_metrics.prom")
+
+
+@dataclass
+class Stage:
+    """
+    A node of the training graph.
+
+    Attributes:
+        name (str): Unique stage name.
+        upstream (tuple): Names of the stages whose results the stage reads.
+        inputs (Callable): (upstream results) -> (input files, params): the files the
+            stage reads and the settings that change its result, hashed to decide
+            whether it must run.
+        run (Callable): (upstream results) -> JSON-serializable result.
+        outputs (Callable): (result) -> files the stage wrote.
+    """
+
+    name: str
+    upstream: tuple
+    inputs: Callable
+    run: Callable
+    outputs: Callable
+
+
+def _flatten(value) -> list:
+    if isinstance(value, (list, tuple)):
+        return [item for part in value for item in _flatten(part)]
+    return [value]
+
+
+def _as_tuple(value):
+    """
+    Restore the tuples of a stage result read back from JSON.
+    """
+    if isinstance(value, list):
+        return tuple(_as_tuple(item) for item in value)
+    return value
+
+
+class TrainingPipeline:
+    def __init__(self, config=None):
+        """
+        Incremental training pipeline: ingestion, transformation and model search wired
+        as a graph of stages with content-hashed inputs and outputs.
+
+            source CSV -> ingestion (train/test splits)
+                       -> transformation (preprocessor, feature/target arrays)
+                       -> trainer (model and serving artifacts)
+
+        The input hash of a stage covers the sha256 of every file it reads (the outputs
+        of its upstream stages, or the source CSV) and its settings (component config,
+        and for the trainer the models and parameter grids). A stage is skipped when its
+        input hash matches the recorded one and its recorded outputs are still on disk
+        unchanged; its recorded result is then handed downstream. Since downstream
+        stages hash the upstream output files, not the upstream input hash, a stage that
+        reruns but writes identical files does not invalidate what follows: editing only
+        the parameter grids reruns only the trainer.
+
+        Attributes:
+            pipeline_config (TrainingPipelineConfig): State file and concurrency.
+            stages (list): The Stage graph, in a valid execution order.
+            stage_status (dict): {stage name: "ran" or "skipped"} of the last run.
+        """
+        self.pipeline_config = config or TrainingPipelineConfig()
+        self.data_ingestion = DataIngestion()
+        self.data_transformation = DataTransformation()
+        self.model_trainer = ModelTrainer()
+        self.stages = self.get_stages()
+        self.stage_status = {}
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def get_stages(self) -> list:
+        ingestion_config = self.data_ingestion.ingestion_config
+        transformation_config = self.data_transformation.data_transformation_config
+        trainer_config = self.model_trainer.model_trainer_config
+
+        def ingestion_outputs(result):
+            return _flatten(result) + [ingestion_config.raw_data_path]
+
+        def transformation_inputs(results):
+            return list(results["ingestion"]), asdict(transformation_config)
+
+        def run_transformation(results):
+            train_path, test_path = results["ingestion"]
+            return self.data_transformation.initiate_data_transformation(
+                train_path, test_path
+            )
+
+        def trainer_inputs(results):
+            train_set, test_set, preprocessor_path = results["transformation"]
+            params = {
+                "config": asdict(trainer_config),
+                "models": {
+                    model_name: model.get_params()
+                    for model_name, model in get_models().items()
+                },
+                "param_grids": get_param_grids(),
+            }
+            return _flatten((train_set, test_set, preprocessor_path)), params
+
+        def run_trainer(results):
+            train_set, test_set, _ = results["transformation"]
+            return self.model_trainer.initiate_model_trainer(train_set, test_set)
+
+        def trainer_outputs(result):
+            return [
+                trainer_config.trained_model_file_path,
+                trainer_config.compiled_model_file_path,
+                trainer_config.prediction_table_file_path,
+                os.path.join(trainer_config.bundle_root, "CURRENT"),
+            ]
+
+        return [
+            Stage(
+                name="ingestion",
+                upstream=(),
+                inputs=lambda results: (
+                    [ingestion_config.source_data_path],
+                    asdict(ingestion_config),
+                ),
+                run=lambda results: self.data_ingestion.initiate_data_ingestion(),
+                outputs=ingestion_outputs,
+            ),
+            Stage(
+                name="transformation",
+                upstream=("ingestion",),
+                inputs=transformation_inputs,
+                run=run_transformation,
+                outputs=lambda result: _flatten(result),
+            ),
+            Stage(
+                name="trainer",
+                upstream=("transformation",),
+                inputs=trainer_inputs,
+                run=run_trainer,
+                outputs=trainer_outputs,
+            ),
+        ]
+
+    def path_sha256(self, path) -> str:
+        """
+        sha256 of a file, or of the names and contents of the files of a directory
+        (Parquet partitions), memoized for the run. None if the path does not exist.
+        """
+        with self._lock:
+            if path in self._hashes:
+                return self._hashes[path]
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for file_name in sorted(os.listdir(path)):
+                file_path = os.path.join(path, file_name)
+                if os.path.isfile(file_path):
+                    digest.update(file_name.encode())
+                    digest.update(file_sha256(file_path).encode())
+            value = digest.hexdigest()
+        elif os.path.isfile(path):
+            value = file_sha256(path)
+        else:
+            value = None
+        with self._lock:
+            self._hashes[path] = value
+        return value
+
+    def input_hash(self, stage, results) -> str:
+        input_files, params = stage.inputs(results)
+        payload = {
+            "stage": stage.name,
+            "files": {path: self.path_sha256(path) for path in input_files},
+            "params": params,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def is_up_to_date(self, recorded, input_hash) -> bool:
+        if self.pipeline_config.force or not recorded:
+            return False
+        if recorded["input_hash"] != input_hash:
+            return False
+        return all(
+            self.path_sha256(path) == sha256
+            for path, sha256 in recorded["outputs"].items()
+        )
+
+    def load_state(self) -> dict:
+        path = self.pipeline_config.state_file_path
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file_obj:
+            return json.load(file_obj)
+
+    def save_state(self, state):
+        path = self.pipeline_config.state_file_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(state, file_obj, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def execute_stage(self, stage, results, state):
+        """
+        Run the stage unless it is up to date.
+
+        Returns:
+            The stage result, recorded or freshly computed.
+        """
+        input_hash = self.input_hash(stage, results)
+        recorded = state.get(stage.name)
+        if self.is_up_to_date(recorded, input_hash):
+            logging.info(f"Stage {stage.name} is up to date, skipped")
+            self.stage_status[stage.name] = "skipped"
+            return _as_tuple(recorded["result"])
+
+        logging.info(f"Running stage {stage.name}")
+        result = stage.run(results)
+        outputs = {}
+        for path in stage.outputs(result):
+            with self._lock:
+                self._hashes.pop(path, None)
+            # Optional artifacts (compiled model, bundle...) are recorded if written
+            sha256 = self.path_sha256(path)
+            if sha256 is not None:
+                outputs[path] = sha256
+        with self._lock:
+            state[stage.name] = {
+                "input_hash": input_hash,
+                "outputs": outputs,
+                "result": result,
+            }
+            # Saved after every stage, a failing stage keeps the finished ones
+            self.save_state(state)
+        self.stage_status[stage.name] = "ran"
+        return result
+
+    def initiate_training_pipeline(self) -> dict:
+        """
+        Run the stages whose inputs changed since the last run, concurrently when their
+        upstream stages are done.
+
+        Returns:
+            dict: {stage name: result}, the trainer result being the test r2 score.
+        """
+        try:
+            state = self.load_state()
+            results = {}
+            pending = {stage.name: stage for stage in self.stages}
+            running = {}
+            self.stage_status = {}
+            self._hashes = {}
+            with ThreadPoolExecutor(self.pipeline_config.max_workers) as executor:
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        if all(upstream in results for upstream in stage.upstream):
+                            upstream_results = {
+                                upstream: results[upstream]
+                                for upstream in stage.upstream
+                            }
+                            running[
+                                executor.submit(
+                                    self.execute_stage, stage, upstream_results, state
+                                )
+                            ] = name
+                            del pending[name]
+                    if not running:
+                        raise ValueError(
+                            f"Stages {list(pending)} depend on unknown stages"
+                        )
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+
+            logging.info(f"Training pipeline finished: {self.stage_status}")
+            # Stage durations of the run, for the node exporter textfile collector
+            write_metrics(self.pipeline_config.metrics_file_path)
+            return results
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the training stages whose inputs changed."
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Run every stage regardless of hashes"
+    )
+    args = parser.parse_args()
+    TrainingPipeline(
+        TrainingPipelineConfig(force=args.force)
+    ).initiate_training_pipeline()
@@ -0,0 +1,281 @@
+import hashlib
+import os
+import sys
+import time
+from dataclasses import dataclass
+import dill
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+from src.search.candidates import (
+    expand_candidates,
+    fit_candidate,
+    score_model,
+    select_best_params,
+)
+from src.search.folds import FoldStore
+
+
+@dataclass
+class EvaluationCacheConfig:
+    cache_dir: str = os.path.join("artifacts", "evaluation_cache")
+    # Least recently used entries are evicted above this total size
+    max_bytes: int = 1024**3
+
+
+def array_digest(*arrays) -> str:
+    """
+    sha256 of the shape, dtype and content of arrays (dense or scipy sparse).
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        parts = (
+            [array.data, array.indices, array.indptr]
+            if hasattr(array, "indptr")
+            else [array]
+        )
+        digest.update(f"{type(array).__name__}{array.shape}{array.dtype}".encode())
+        for part in parts:
+            digest.update(np.ascontiguousarray(part).data)
+    return digest.hexdigest()
+
+
+class EvaluationCache:
+    def __init__(self, config=None):
+        """
+        On-disk, content-addressed memo of model search results.
+
+        Entries (the score of a candidate on a fold, or a fitted estimator) are keyed by
+        the hash of the training data, the estimator class, its full parameters and what
+        was computed, so reruns on unchanged data/grids only evaluate the candidates not
+        seen before.
+        The directory is bounded by max_bytes, least recently used entries are evicted.
+
+        Attributes:
+            cache_config (EvaluationCacheConfig): Directory and size bound of the cache.
+        """
+        self.cache_config = config or EvaluationCacheConfig()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Total size of the entries, computed on the first write
+        self._total_bytes = None
+
+    def key(self, data_key, estimator, params, kind) -> str:
+        """
+        Key of one result.
+
+        Arg:
+            data_key (str): array_digest of the training arrays.
+            estimator (object): The unfitted estimator of the model.
+            params (dict): The candidate params, None for the default model.
+            kind (str): What is cached, e.g. "kfold3-0" (score on a fold) or "refit".
+
+        Returns:
+            str: The hex key.
+        """
+        all_params = estimator.get_params(deep=False)
+        all_params.update(params or {})
+        description = repr(
+            (
+                data_key,
+                f"{type(estimator).__module__}.{type(estimator).__qualname__}",
+                sorted((name, repr(value)) for name, value in all_params.items()),
+                kind,
+            )
+        )
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.cache_config.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Returns:
+            object: The cached value, or None on a miss.
+        """
+        file_path = self._path(key)
+        try:
+            with open(file_path, "rb") as file_obj:
+                value = dill.load(file_obj)
+        except (OSError, EOFError, dill.UnpicklingError):
+            self.misses += 1
+            return None
+        # Mark as recently used for the eviction order
+        os.utime(file_path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        try:
+            file_path = self._path(key)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f"{file_path}.tmp"
+            with open(tmp_path, "wb") as file_obj:
+                dill.dump(value, file_obj)
+            os.replace(tmp_path, file_path)
+
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += os.path.getsize(file_path)
+            if self._total_bytes > self.cache_config.max_bytes:
+                self.evict()
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _entries(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.cache_config.cache_dir):
+            for file_name in files:
+                if file_name.endswith(".pkl"):
+                    stat = os.stat(os.path.join(root, file_name))
+                    entries.append(
+                        (stat.st_mtime, stat.st_size, os.path.join(root, file_name))
+                    )
+        return entries
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in entries:
+            if total <= self.cache_config.max_bytes:
+                break
+            os.remove(file_path)
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+def cached_score(cache, data_key, estimator, params, fold_store, fold, kind) -> float:
+    """
+    Validation r2 of a candidate on one fold, from the cache or computed and stored.
+
+    Arg:
+        cache (EvaluationCache): The cache, None to always compute.
+        data_key (str): array_digest of the training set.
+        fold_store (FoldStore): The folds of the search.
+        fold (int): Index of the fold in fold_store.
+        kind (str): Identifies the fold, e.g. "kfold3-0".
+
+    Returns:
+        float: The validation score.
+    """
+    if cache is None:
+        return fold_store.score(estimator, params, fold)
+    key = cache.key(data_key, estimator, params, kind)
+    score = cache.get(key)
+    if score is None:
+        score = fold_store.score(estimator, params, fold)
+        cache.put(key, score)
+    return score
+
+
+def cached_fit(cache, data_key, estimator, params, X, y):
+    """
+    A fitted estimator (params None for the default model), from the cache or fitted
+    and stored. With cache None it is always fitted.
+    """
+    if cache is None:
+        return fit_candidate(estimator, params, X, y)
+    key = cache.key(data_key, estimator, params, "refit")
+    model = cache.get(key)
+    if model is None:
+        model = fit_candidate(estimator, params, X, y)
+        cache.put(key, model)
+    return model
+
+
+def cached_evaluate_model(
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    models,
+    param,
+    cache=None,
+    cv=3,
+    measure_inference=False,
+) -> dict:
+    """
+    evaluate_model with every candidate's fold scores and refitted estimator memoized.
+
+    Equivalent to one GridSearchCV(cv=3) per model (same folds, mean r2, first candidate
+    wins ties, refit on the full training set), run candidate by candidate so that each
+    result can be looked up in and stored to the EvaluationCache.
+
+    Arg:
+        X_train, y_train, X_test, y_test (array): The train and test sets.
+        models (dict): {model name: estimator}.
+        param (dict): {model name: parameter grid}.
+        cache (EvaluationCache): The cache, defaults to artifacts/evaluation_cache.
+        cv (int): Number of folds.
+        measure_inference (bool): Add the inference latencies and size of each model.
+
+    Returns:
+        dict: Same as evaluate_model.
+    """
+    try:
+        cache = cache or EvaluationCache()
+        start = time.perf_counter()
+        data_key = array_digest(X_train, y_train)
+        fold_store = FoldStore.kfold(X_train, y_train, cv)
+
+        scored = {model_name: [] for model_name in models}
+        for model_name, params in expand_candidates(models, param):
+            if params is None:
+                continue
+            fold_scores = [
+                cached_score(
+                    cache,
+                    data_key,
+                    models[model_name],
+                    params,
+                    fold_store,
+                    fold,
+                    f"kfold{cv}-{fold}",
+                )
+                for fold in range(len(fold_store))
+            ]
+            scored[model_name].append((params, fold_scores))
+
+        model_scores = {}
+        for model_name, model in models.items():
+            best_params = (
+                select_best_params(scored[model_name])[0]
+                if scored[model_name]
+                else None
+            )
+            fitted = cached_fit(cache, data_key, model, best_params, X_train, y_train)
+            model_scores[model_name] = score_model(
+                fitted,
+                best_params,
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                measure_inference,
+            )
+
+        logging.info(
+            f"Cached model search done in {time.perf_counter() - start:.2f}s, "
+            f"cache stats: {cache.stats()}"
+        )
+        return model_scores
+    except Exception as e:
+        raise CustomException(e, sys)
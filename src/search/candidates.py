@@ -0,0 +1,101 @@
+import sys
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold, ParameterGrid
+from src.exception import CustomException
+
+
+def expand_candidates(models, param) -> list:
+    """
+    List the (model name, params) candidates of a search, in GridSearchCV order.
+
+    Models without a parameter grid get a single candidate with params None, meaning
+    "fit the default model, no cross-validation", as in evaluate_model.
+
+    Arg:
+        models (dict): {model name: estimator}.
+        param (dict): {model name: parameter grid}.
+
+    Returns:
+        list: (model name, params) tuples.
+    """
+    candidates = []
+    for model_name in models:
+        if model_name in param and param[model_name]:
+            for params in ParameterGrid(param[model_name]):
+                candidates.append((model_name, params))
+        else:
+            candidates.append((model_name, None))
+    return candidates
+
+
+def cv_splits(n_samples, cv=3) -> list:
+    """
+    The (train indices, validation indices) folds GridSearchCV(cv=cv) uses for a regressor.
+    """
+    return list(KFold(n_splits=cv).split(np.empty((n_samples, 1))))
+
+
+def fit_candidate(estimator, params, X, y):
+    """
+    Fit a clone of the estimator with params (or the defaults if params is None) on X, y.
+    """
+    model = clone(estimator)
+    if params:
+        model.set_params(**params)
+    return model.fit(X, y)
+
+
+def select_best_params(candidate_scores) -> tuple:
+    """
+    Pick the candidate with the best mean validation score.
+
+    Ties go to the first candidate, as in GridSearchCV; nan scores never win.
+
+    Arg:
+        candidate_scores (list): (params, fold scores) tuples in candidate order.
+
+    Returns:
+        tuple: (best params, best mean score)
+    """
+    best_params, best_score = None, -np.inf
+    for params, fold_scores in candidate_scores:
+        mean_score = np.mean(fold_scores)
+        if not np.isnan(mean_score) and (
+            best_params is None or mean_score > best_score
+        ):
+            best_params, best_score = params, mean_score
+    if best_params is None:
+        raise ValueError("All candidates failed to fit")
+    return best_params, best_score
+
+
+def score_model(
+    model, best_params, X_train, y_train, X_test, y_test, measure_inference=False
+) -> dict:
+    """
+    Build the model_report entry of a fitted model.
+
+    Arg:
+        measure_inference (bool): Also time its single-row and batch predictions on
+            X_test and measure its pickle size (see selection.measure_inference).
+
+    Returns:
+        dict: {"Best params", "Best estimator", "Train r2 score", "Test r2 score"} and
+            the inference measurements if requested.
+    """
+    try:
+        scores = {
+            "Best params": best_params,
+            "Best estimator": model,
+            "Train r2 score": r2_score(y_train, model.predict(X_train)),
+            "Test r2 score": r2_score(y_test, model.predict(X_test)),
+        }
+        if measure_inference:
+            from src.search.selection import measure_inference as measure
+
+            scores.update(measure(model, X_test))
+        return scores
+    except Exception as e:
+        raise CustomException(e, sys)
@@ -0,0 +1,142 @@
+import os
+import sys
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from src.exception import CustomException
+from src.logger import logging
+from src.utils import load_array, save_array
+
+
+def _take(array, index):
+    """
+    Rows of array at index: a view if the index is one contiguous range, else a copy.
+    """
+    index = np.asarray(index)
+    if (
+        len(index)
+        and index[-1] - index[0] + 1 == len(index)
+        and np.all(np.diff(index) == 1)
+    ):
+        return array[index[0] : index[-1] + 1]
+    return array[index]
+
+
+class FoldStore:
+    def __init__(self, X, y, folds):
+        """
+        The cross-validation folds of one search, materialized once.
+
+        Every candidate of every model is scored on the same folds. Instead of slicing
+        X and y again for every (candidate, fold) fit, as GridSearchCV does, the train
+        and validation rows of each fold are extracted on first use and reused; the
+        validation targets' total sum of squares is precomputed too, so scoring a fold
+        is a predict and a vectorized r2.
+
+        Attributes:
+            X, y (array): The training set the folds index.
+            folds (list): (train indices, validation indices) tuples.
+        """
+        self.X = X
+        self.y = y
+        self.folds = list(folds)
+        self._materialized = {}
+
+    @classmethod
+    def kfold(cls, X, y, cv=3):
+        """
+        The folds GridSearchCV(cv=cv) uses for a regressor on X, y.
+        """
+        from src.search.candidates import cv_splits
+
+        return cls(X, y, cv_splits(len(y), cv))
+
+    def __len__(self) -> int:
+        return len(self.folds)
+
+    def fold(self, index) -> tuple:
+        """
+        Returns:
+            tuple: (X_train, y_train, X_validation, y_validation, validation sum of
+                squares) of the fold.
+        """
+        if index not in self._materialized:
+            train_index, validation_index = self.folds[index]
+            y_validation = np.asarray(_take(self.y, validation_index))
+            self._materialized[index] = (
+                _take(self.X, train_index),
+                np.asarray(_take(self.y, train_index)),
+                _take(self.X, validation_index),
+                y_validation,
+                float(((y_validation - y_validation.mean()) ** 2).sum()),
+            )
+        return self._materialized[index]
+
+    def score(self, estimator, params, index) -> float:
+        """
+        Fit a clone of the estimator with params on the fold and return its validation r2.
+
+        Like GridSearchCV (error_score=nan), a failing fit scores nan instead of raising.
+        """
+        X_train, y_train, X_validation, y_validation, total = self.fold(index)
+        model = clone(estimator).set_params(**params)
+        try:
+            model.fit(X_train, y_train)
+            predictions = np.ravel(model.predict(X_validation))
+        except Exception as e:
+            logging.warning(f"Fit failed for {type(estimator).__name__} {params}: {e}")
+            return np.nan
+        if total == 0:
+            # Constant validation target, r2_score defines the edge cases
+            return r2_score(y_validation, predictions)
+        return 1.0 - float(((y_validation - predictions) ** 2).sum()) / total
+
+    def save(self, directory) -> str:
+        """
+        Write every fold's arrays to directory, for FoldStore.load in other processes.
+
+        Returns:
+            str: The directory.
+        """
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for index in range(len(self)):
+                X_train, y_train, X_validation, y_validation, _ = self.fold(index)
+                for name, array in (
+                    ("X_train", X_train),
+                    ("y_train", y_train),
+                    ("X_validation", X_validation),
+                    ("y_validation", y_validation),
+                ):
+                    save_array(
+                        os.path.join(directory, f"fold{index}_{name}.npy"), array
+                    )
+            return directory
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def load(cls, directory, n_folds):
+        """
+        Open folds written by save, memory-mapped (sparse ones are loaded).
+        """
+        try:
+            store = cls(None, None, [None] * n_folds)
+            for index in range(n_folds):
+                arrays = {}
+                for name in ("X_train", "y_train", "X_validation", "y_validation"):
+                    path = os.path.join(directory, f"fold{index}_{name}.npy")
+                    if not os.path.exists(path):
+                        path = f"{os.path.splitext(path)[0]}.npz"
+                    arrays[name] = load_array(path)
+                y_validation = arrays["y_validation"]
+                store._materialized[index] = (
+                    arrays["X_train"],
+                    arrays["y_train"],
+                    arrays["X_validation"],
+                    y_validation,
+                    float(((y_validation - y_validation.mean()) ** 2).sum()),
+                )
+            return store
+        except Exception as e:
+            raise CustomException(e, sys)
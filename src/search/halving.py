@@ -0,0 +1,233 @@
+import math
+import sys
+import time
+from dataclasses import dataclass
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+from src.search.cache import array_digest, cached_fit, cached_score
+from src.search.candidates import (
+    cv_splits,
+    expand_candidates,
+    score_model,
+    select_best_params,
+)
+from src.search.folds import FoldStore
+
+
+@dataclass
+class HalvingSearchConfig:
+    # Only the best 1/factor of the candidates of a model survive each round
+    factor: int = 3
+    # Training samples used in the first round, defaults to what lets the last round use them all
+    min_resources: int = None
+    # Stop starting new rounds once this many seconds have elapsed
+    time_budget: float = None
+    # Stop starting new rounds once this many fold fits have been run
+    max_fits: int = None
+    # Stop searching a model whose best mean r2 trails the overall best by more than this
+    model_margin: float = 0.2
+    cv: int = 3
+    random_state: int = 42
+
+
+def _resources(n_samples, max_candidates, config) -> list:
+    """
+    Number of training samples used in each round: grows by factor from min_resources and
+    ends at n_samples, with no more rounds than the largest grid needs.
+    """
+    needed_rounds = 1 + int(math.log(max_candidates, config.factor))
+    min_resources = config.min_resources or n_samples // config.factor ** (
+        needed_rounds - 1
+    )
+    # Every fold needs a handful of rows to fit and score on
+    min_resources = min(n_samples, max(min_resources, config.cv * 10))
+    possible_rounds = 1 + int(math.log(n_samples / min_resources, config.factor))
+    n_rounds = min(needed_rounds, possible_rounds)
+    return [
+        min(n_samples, min_resources * config.factor**round_index)
+        for round_index in range(n_rounds - 1)
+    ] + [n_samples]
+
+
+def halving_evaluate_model(
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    models,
+    param,
+    config=None,
+    cache=None,
+    measure_inference=False,
+) -> dict:
+    """
+    Successive-halving variant of evaluate_model, for a bounded search time.
+
+    All candidates start on a small random subsample of the training set (models with
+    smaller grids join in later rounds). After each round only the best 1/factor
+    candidates of every model move on, with factor times more samples; the last round
+    uses the full training set. A candidate whose fold score trails the model's best
+    complete candidate by more than model_margin skips its remaining folds, and a model
+    whose best candidate trails the overall best by more than model_margin stops early
+    with its current best. Once the time or fit budget is spent no new candidate is
+    started, and each model keeps the best candidate it has scored so far.
+
+    The best params of every model are refitted on the full training set and reported in
+    the evaluate_model format. The search itself differs from the full grid: candidates
+    are dropped on the scores of subsamples and of partial folds, and the budget can stop
+    it early, so the params, scores and best model can differ from the "grid" search
+    mode. Use "grid" when the full grid result is needed; the search_halving benchmark
+    of benchmarks.suite reports the time of both modes and whether they agree.
+
+    Arg:
+        X_train, y_train, X_test, y_test (array): The train and test sets.
+        models (dict): {model name: estimator}.
+        param (dict): {model name: parameter grid}.
+        config (HalvingSearchConfig): Halving and budget settings.
+        cache (EvaluationCache): Optional memo of fold scores and refitted models.
+        measure_inference (bool): Add the inference latencies and size of each model.
+
+    Returns:
+        dict: Same as evaluate_model, plus "Search rounds" and "Search fits" per model.
+    """
+    try:
+        config = config or HalvingSearchConfig()
+        start = time.perf_counter()
+        n_samples = len(y_train)
+        order = np.random.RandomState(config.random_state).permutation(n_samples)
+        data_key = array_digest(X_train, y_train) if cache is not None else None
+
+        survivors = {}
+        for model_name, params in expand_candidates(models, param):
+            if params is not None:
+                survivors.setdefault(model_name, []).append(params)
+        resources = _resources(
+            n_samples, max(map(len, survivors.values()), default=1), config
+        )
+        n_rounds = len(resources)
+        # Smaller grids join in later rounds, every model's last round uses all samples
+        model_rounds = {
+            model_name: min(n_rounds, 1 + int(math.log(len(candidates), config.factor)))
+            for model_name, candidates in survivors.items()
+        }
+
+        best_params = {model_name: None for model_name in models}
+        rounds = {model_name: 0 for model_name in models}
+        fits = {model_name: 0 for model_name in models}
+        for model_name, candidates in survivors.items():
+            # Until scored (or if the budget runs out first), a model keeps its first
+            # candidate; a single candidate needs no cross-validation at all
+            best_params[model_name] = candidates[0]
+        active = {model_name for model_name, c in survivors.items() if len(c) > 1}
+        total_fits = 0
+
+        def budget_spent():
+            elapsed = time.perf_counter() - start
+            if config.time_budget and elapsed > config.time_budget:
+                return True
+            return bool(config.max_fits and total_fits >= config.max_fits)
+
+        for round_index, n_resources in enumerate(resources):
+            if not active:
+                break
+            if budget_spent():
+                logging.info(f"Search budget spent after {round_index} rounds")
+                break
+
+            subsample = order[:n_resources]
+            # The folds of the round are extracted once for all its candidates
+            fold_store = FoldStore(
+                X_train,
+                y_train,
+                [
+                    (subsample[train_index], subsample[validation_index])
+                    for train_index, validation_index in cv_splits(
+                        n_resources, config.cv
+                    )
+                ],
+            )
+            round_best = {}
+            for model_name in sorted(active, key=list(models).index):
+                if round_index < n_rounds - model_rounds[model_name]:
+                    continue
+                scored = []
+                model_best = -np.inf
+                for params in survivors[model_name]:
+                    # Out of budget: the unscored candidates are dropped
+                    if scored and budget_spent():
+                        break
+                    fold_scores = []
+                    for fold in range(len(fold_store)):
+                        fold_scores.append(
+                            cached_score(
+                                cache,
+                                data_key,
+                                models[model_name],
+                                params,
+                                fold_store,
+                                fold,
+                                f"halving{config.random_state}-{n_resources}-kfold{config.cv}-{fold}",
+                            )
+                        )
+                        # Early stop: skip the remaining folds of a clearly weak candidate
+                        if not fold_scores[-1] >= model_best - config.model_margin:
+                            break
+                    fits[model_name] += len(fold_scores)
+                    total_fits += len(fold_scores)
+                    if len(fold_scores) == len(fold_store):
+                        model_best = max(model_best, np.mean(fold_scores))
+                    scored.append((params, fold_scores))
+                rounds[model_name] += 1
+                best_params[model_name], round_best[model_name] = select_best_params(
+                    scored
+                )
+
+                # Cut by at least factor, and enough to get down to one candidate by the
+                # model's last round
+                rounds_left = n_rounds - round_index - 1
+                factor = config.factor
+                if rounds_left:
+                    factor = max(factor, math.ceil(len(scored) ** (1 / rounds_left)))
+                keep = max(1, math.ceil(len(scored) / factor))
+                ranked = sorted(
+                    range(len(scored)),
+                    key=lambda i: -np.nan_to_num(np.mean(scored[i][1]), nan=-np.inf),
+                )
+                survivors[model_name] = [scored[i][0] for i in sorted(ranked[:keep])]
+
+            leader = max(round_best.values(), default=-np.inf)
+            for model_name, score in round_best.items():
+                if (
+                    len(survivors[model_name]) == 1
+                    or score < leader - config.model_margin
+                ):
+                    active.discard(model_name)
+            logging.info(
+                f"Halving round {round_index + 1}/{len(resources)}: {n_resources} samples, "
+                f"{sum(len(survivors[m]) for m in active)} candidates left, "
+                f"{time.perf_counter() - start:.2f}s elapsed"
+            )
+
+        model_scores = {}
+        for model_name, model in models.items():
+            fitted = cached_fit(
+                cache, data_key, model, best_params[model_name], X_train, y_train
+            )
+            model_scores[model_name] = score_model(
+                fitted,
+                best_params[model_name],
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                measure_inference,
+            )
+            model_scores[model_name]["Search rounds"] = rounds[model_name]
+            model_scores[model_name]["Search fits"] = fits[model_name]
+        logging.info(
+            f"Halving search done in {time.perf_counter() - start:.2f}s with {total_fits} fold fits"
+        )
+        return model_scores
+    except Exception as e:
+        raise CustomException(e, sys)
@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from src.exception import CustomException
+from src.logger import logging
+from src.search.cache import array_digest
+from src.utils import load_array, save_array
+from src.search.candidates import (
+    expand_candidates,
+    fit_candidate,
+    score_model,
+    select_best_params,
+)
+from src.search.folds import FoldStore
+
+# Environment variables read by the native thread pools of numpy/sklearn/xgboost/catboost
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+# Estimator parameters controlling their own threading
+THREAD_PARAMS = ("n_jobs", "thread_count")
+
+
+@dataclass
+class ParallelSearchConfig:
+    # Number of worker processes, defaults to the number of cores
+    n_jobs: int = None
+    # Cap on the total number of threads across all workers, defaults to the number of cores
+    max_threads: int = None
+    cv: int = 3
+
+    def workers(self) -> int:
+        return self.n_jobs or os.cpu_count() or 1
+
+    def threads_per_worker(self) -> int:
+        max_threads = self.max_threads or os.cpu_count() or 1
+        return max(1, max_threads // self.workers())
+
+
+# Per-worker state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(X_path, y_path, folds_dir, cv, threads):
+    """
+    Open the shared training arrays and folds (memory-mapped, not copied) and cap
+    native threads.
+    """
+    for env_var in THREAD_ENV_VARS:
+        os.environ[env_var] = str(threads)
+    from threadpoolctl import threadpool_limits
+
+    _worker["thread_limits"] = threadpool_limits(limits=threads)
+    _worker["threads"] = threads
+    _worker["X"] = load_array(X_path)
+    _worker["y"] = load_array(y_path)
+    _worker["folds"] = FoldStore.load(folds_dir, cv)
+
+
+def _thread_params(estimator) -> dict:
+    params = estimator.get_params()
+    return {key: params[key] for key in THREAD_PARAMS if key in params}
+
+
+def _limit_threads(estimator, threads):
+    limits = {key: threads for key in _thread_params(estimator)}
+    return estimator.set_params(**limits) if limits else estimator
+
+
+def _restore_thread_params(model, thread_params):
+    if not thread_params:
+        return model
+    if type(model).__name__.startswith("CatBoost"):
+        # A fitted CatBoost model refuses set_params; its thread_count does not change
+        # the trained model, only later fits from its params (e.g. a warm start)
+        model._init_params.update(thread_params)
+        return model
+    return model.set_params(**thread_params)
+
+
+def _run_fold(estimator, params, fold):
+    start = time.time()
+    estimator = _limit_threads(estimator, _worker["threads"])
+    score = _worker["folds"].score(estimator, params, fold)
+    return score, start, time.time()
+
+
+def _run_refit(estimator, params):
+    start = time.time()
+    # The refitted model is served: it leaves the worker with the estimator's own
+    # threading, the worker's cap only applies to the fit
+    original = {
+        key: value
+        for key, value in _thread_params(estimator).items()
+        if key not in (params or {})
+    }
+    estimator = _limit_threads(estimator, _worker["threads"])
+    model = fit_candidate(estimator, params, _worker["X"], _worker["y"])
+    model = _restore_thread_params(model, original)
+    return model, start, time.time()
+
+
+def parallel_evaluate_model(
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    models,
+    param,
+    config=None,
+    cache=None,
+    measure_inference=False,
+) -> dict:
+    """
+    Parallel equivalent of evaluate_model.
+
+    Every (model, param set, fold) fit is one task of a single process pool, so the
+    slow grids (e.g. Gradient Boosting) are spread over all workers instead of running
+    one after another. X_train/y_train are written once to memory-mapped .npy files that
+    every worker maps read-only. The total thread count is capped: each worker gets
+    max_threads // n_jobs threads for its BLAS/OpenMP pools and for the estimators' own
+    n_jobs/thread_count.
+
+    The best params per model are chosen as GridSearchCV(cv=3) does (same KFold folds,
+    mean r2, first candidate wins ties) and refitted on the full training set.
+
+    Arg:
+        X_train, y_train, X_test, y_test (array): The train and test sets.
+        models (dict): {model name: estimator}.
+        param (dict): {model name: parameter grid}.
+        config (ParallelSearchConfig): Worker and thread settings.
+        cache (EvaluationCache): Optional memo, only the fits missing from it are run.
+        measure_inference (bool): Add the inference latencies and size of each model.
+
+    Returns:
+        dict: Same as evaluate_model, plus "Search wall time (s)" per model.
+    """
+    config = config or ParallelSearchConfig()
+    shared_dir = tempfile.mkdtemp(prefix="model_search_")
+    try:
+        # Sparse features go to .npz, which every worker loads instead of mapping
+        X_path = save_array(os.path.join(shared_dir, "X_train.npy"), X_train)
+        y_path = save_array(os.path.join(shared_dir, "y_train.npy"), y_train)
+        # The fold arrays are extracted once here and mapped by every worker
+        folds_dir = FoldStore.kfold(X_train, y_train, config.cv).save(
+            os.path.join(shared_dir, "folds")
+        )
+
+        candidates = expand_candidates(models, param)
+        data_key = array_digest(X_train, y_train) if cache is not None else None
+
+        def cache_key(model_name, params, kind):
+            return cache.key(data_key, models[model_name], params, kind)
+
+        logging.info(
+            f"Parallel search: {len(candidates)} candidates x {config.cv} folds on "
+            f"{config.workers()} workers, {config.threads_per_worker()} threads each"
+        )
+
+        fold_scores = defaultdict(list)
+        timings = defaultdict(list)
+        # spawn: forking after the parent initialised OpenMP can deadlock the workers
+        with ProcessPoolExecutor(
+            max_workers=config.workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                X_path,
+                y_path,
+                folds_dir,
+                config.cv,
+                config.threads_per_worker(),
+            ),
+        ) as executor:
+            futures = {}
+            for index, (model_name, params) in enumerate(candidates):
+                if params is None:
+                    continue
+                for fold in range(config.cv):
+                    kind = f"kfold{config.cv}-{fold}"
+                    if cache is not None:
+                        score = cache.get(cache_key(model_name, params, kind))
+                        if score is not None:
+                            fold_scores[index].append((fold, score))
+                            continue
+                    future = executor.submit(
+                        _run_fold, models[model_name], params, fold
+                    )
+                    futures[future] = (model_name, index, fold)
+
+            for future in as_completed(futures):
+                model_name, index, fold = futures[future]
+                score, start, end = future.result()
+                fold_scores[index].append((fold, score))
+                timings[model_name].append((start, end))
+                if cache is not None:
+                    params = candidates[index][1]
+                    cache.put(
+                        cache_key(model_name, params, f"kfold{config.cv}-{fold}"),
+                        score,
+                    )
+
+            best_params = {}
+            for model_name in models:
+                scored = [
+                    (params, [score for _, score in sorted(fold_scores[index])])
+                    for index, (name, params) in enumerate(candidates)
+                    if name == model_name and params is not None
+                ]
+                best_params[model_name] = (
+                    select_best_params(scored)[0] if scored else None
+                )
+
+            fitted = {}
+            refits = {}
+            for model_name in models:
+                if cache is not None:
+                    model = cache.get(
+                        cache_key(model_name, best_params[model_name], "refit")
+                    )
+                    if model is not None:
+                        fitted[model_name] = model
+                        continue
+                future = executor.submit(
+                    _run_refit, models[model_name], best_params[model_name]
+                )
+                refits[future] = model_name
+            for future in as_completed(refits):
+                model_name = refits[future]
+                fitted[model_name], start, end = future.result()
+                timings[model_name].append((start, end))
+                if cache is not None:
+                    cache.put(
+                        cache_key(model_name, best_params[model_name], "refit"),
+                        fitted[model_name],
+                    )
+
+        model_scores = {}
+        for model_name in models:
+            model_scores[model_name] = score_model(
+                fitted[model_name],
+                best_params[model_name],
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                measure_inference,
+            )
+            starts, ends = (
+                zip(*timings[model_name]) if timings[model_name] else ((0,), (0,))
+            )
+            wall_time = max(ends) - min(starts)
+            model_scores[model_name]["Search wall time (s)"] = wall_time
+            logging.info(
+                f"{model_name}: {len(timings[model_name])} fits, wall time {wall_time:.2f}s, "
+                f"fit time {sum(end - start for start, end in timings[model_name]):.2f}s"
+            )
+        return model_scores
+    except Exception as e:
+        raise CustomException(e, sys)
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
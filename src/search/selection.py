@@ -0,0 +1,144 @@
+import sys
+import time
+import dill
+import numpy as np
+from src.exception import CustomException
+from src.logger import logging
+
+SELECTION_POLICIES = ("best_r2", "latency_budget", "pareto")
+
+SINGLE_LATENCY = "Single-row latency (ms)"
+BATCH_LATENCY = "Batch latency (ms)"
+MODEL_SIZE = "Model size (bytes)"
+
+
+def measure_inference(model, X, single_rows=50, batch_size=1000, repeat=3) -> dict:
+    """
+    Measure the serving cost of a fitted model.
+
+    Arg:
+        model (object): The fitted model.
+        X (array): Rows to predict (e.g. the test features).
+        single_rows (int): One-row predict calls timed, the median is reported.
+        batch_size (int): Rows of the timed batch predict call (best of repeat).
+        repeat (int): Timed batch predict calls.
+
+    Returns:
+        dict: {"Single-row latency (ms)", "Batch latency (ms)", "Batch rows",
+            "Model size (bytes)"}, the size being that of its dill pickle.
+    """
+    try:
+        n_rows = X.shape[0]
+        model.predict(X[:1])  # first call may build caches
+        single = []
+        for i in range(min(single_rows, n_rows)):
+            row = X[i : i + 1]
+            start = time.perf_counter()
+            model.predict(row)
+            single.append(time.perf_counter() - start)
+
+        batch = X[:batch_size]
+        batch_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.predict(batch)
+            batch_times.append(time.perf_counter() - start)
+
+        return {
+            SINGLE_LATENCY: float(np.median(single)) * 1000,
+            BATCH_LATENCY: min(batch_times) * 1000,
+            "Batch rows": batch.shape[0],
+            MODEL_SIZE: len(dill.dumps(model)),
+        }
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def pareto_front(model_report) -> list:
+    """
+    Models no other model beats on test r2, single-row latency and size at once.
+
+    Arg:
+        model_report (dict): evaluate_model report with the measure_inference entries.
+
+    Returns:
+        list: The model names on the front, in report order.
+    """
+
+    def costs(scores):
+        return (-scores["Test r2 score"], scores[SINGLE_LATENCY], scores[MODEL_SIZE])
+
+    front = []
+    for model_name, scores in model_report.items():
+        own = costs(scores)
+        dominated = any(
+            all(a <= b for a, b in zip(costs(other), own)) and costs(other) != own
+            for other_name, other in model_report.items()
+            if other_name != model_name
+        )
+        if not dominated:
+            front.append(model_name)
+    return front
+
+
+def select_model(
+    model_report,
+    policy="best_r2",
+    latency_budget_ms=None,
+    size_budget_bytes=None,
+    r2_tolerance=0.01,
+) -> str:
+    """
+    Choose the model to serve from the evaluate_model report.
+
+    Policies:
+        "best_r2": the best test r2 score.
+        "latency_budget": the best test r2 score among the models whose single-row
+            latency is within latency_budget_ms and size within size_budget_bytes
+            (budgets left None are not checked). If none fits, the fastest model.
+        "pareto": among the pareto_front models within r2_tolerance of the best test
+            r2 score, the one with the lowest single-row latency.
+
+    Returns:
+        str: The name of the selected model.
+    """
+    if policy not in SELECTION_POLICIES:
+        raise ValueError(f"Unknown selection policy {policy}, use {SELECTION_POLICIES}")
+
+    def r2(model_name):
+        score = model_report[model_name]["Test r2 score"]
+        return -np.inf if np.isnan(score) else score
+
+    def latency(model_name):
+        return model_report[model_name][SINGLE_LATENCY]
+
+    names = list(model_report)
+    if policy == "best_r2":
+        return max(names, key=r2)
+
+    if policy == "latency_budget":
+        within = [
+            model_name
+            for model_name in names
+            if (latency_budget_ms is None or latency(model_name) <= latency_budget_ms)
+            and (
+                size_budget_bytes is None
+                or model_report[model_name][MODEL_SIZE] <= size_budget_bytes
+            )
+        ]
+        if not within:
+            fastest = min(names, key=latency)
+            logging.warning(
+                f"No model within the latency budget {latency_budget_ms} ms and size "
+                f"budget {size_budget_bytes} bytes, selecting the fastest: {fastest}"
+            )
+            return fastest
+        return max(within, key=r2)
+
+    best = max(r2(model_name) for model_name in names)
+    close = [
+        model_name
+        for model_name in pareto_front(model_report)
+        if r2(model_name) >= best - r2_tolerance
+    ]
+    return min(close, key=latency)
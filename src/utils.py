@@ -1,10 +1,38 @@
+import hashlib
 import os
 import sys
-from sklearn.metrics import r2_score
+from contextlib import contextmanager
 import dill
+import numpy as np
+import pandas as pd
 from src.exception import CustomException
 from src.logger import logging
-from sklearn.model_selection import GridSearchCV
+
+
+@contextmanager
+def atomic_write_path(file_path):
+    """
+    Write a file through a temporary file next to it, moved over file_path once
+    complete, so readers never see a partially written file.
+
+    Arg:
+        file_path (str): The path of the file to write.
+
+    Yields:
+        str: The temporary path to write to. It keeps the extension of file_path, to
+            which np.save and scipy's save_npz would otherwise add theirs.
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    root, extension = os.path.splitext(file_path)
+    tmp_path = f"{root}.tmp{extension}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 def save_object(file_path, obj) -> object:
@@ -19,11 +47,9 @@ def save_object(file_path, obj) -> object:
     """
 
     try:
-        dir_path = os.path.dirname(file_path)
-        os.makedirs(dir_path, exist_ok=True)
-
-        with open(file_path, "wb") as file_obj:
-            dill.dump(obj, file_obj)
+        with atomic_write_path(file_path) as tmp_path:
+            with open(tmp_path, "wb") as file_obj:
+                dill.dump(obj, file_obj)
 
     except Exception as e:
         raise CustomException(e, sys)
@@ -48,7 +74,144 @@ def load_object(file_path) -> str:
         raise CustomException(e, sys)
 
 
-def evaluate_model(X_train, y_train, X_test, y_test, models, param) -> dict:
+def save_array(file_path, array) -> str:
+    """
+    Save a dense array as .npy (memory-mappable) or a scipy sparse matrix as .npz.
+
+    Arg:
+        file_path (str): The path to the .npy file; the extension becomes .npz for
+            sparse matrices.
+        array (np.ndarray | scipy.sparse matrix): The array to be saved.
+
+    Returns:
+        str: The path the array was written to.
+    """
+    try:
+        root, _ = os.path.splitext(file_path)
+        is_sparse = hasattr(array, "tocsr")
+        file_path = f"{root}.npz" if is_sparse else f"{root}.npy"
+
+        with atomic_write_path(file_path) as tmp_path:
+            if is_sparse:
+                from scipy import sparse
+
+                sparse.save_npz(tmp_path, array.tocsr(), compressed=False)
+            else:
+                np.save(tmp_path, np.ascontiguousarray(array))
+        return file_path
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def load_array(file_path, mmap_mode="r"):
+    """
+    Open an array written by save_array. Dense arrays are memory-mapped, not read.
+
+    Arg:
+        file_path (str): The path to the .npy or .npz file.
+        mmap_mode (str): np.load memory-map mode, None to read into memory.
+
+    Returns:
+        np.ndarray | scipy.sparse.csr_matrix: The array.
+    """
+    try:
+        if file_path.endswith(".npz"):
+            from scipy import sparse
+
+            return sparse.load_npz(file_path)
+        return np.load(file_path, mmap_mode=mmap_mode)
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def read_dataframe(path) -> pd.DataFrame:
+    """
+    Read a dataset written by data ingestion: a CSV file, or a Parquet file or
+    directory of Parquet partitions.
+
+    Arg:
+        path (str): The path to the file or partition directory.
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+    try:
+        if os.path.isdir(path) or path.endswith(".parquet"):
+            return pd.read_parquet(path)
+        return pd.read_csv(path)
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def iter_dataframe(path, chunk_size=100_000, columns=None):
+    """
+    Read a dataset written by data ingestion chunk by chunk.
+
+    Arg:
+        path (str): A CSV file, or a Parquet file or directory of Parquet partitions.
+        chunk_size (int): Maximum number of rows per chunk.
+        columns (list): Only read these columns, all by default.
+
+    Yields:
+        pd.DataFrame: The chunks, in file order.
+    """
+    try:
+        if not (os.path.isdir(path) or path.endswith(".parquet")):
+            yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+            return
+
+        import pyarrow.parquet as pq
+
+        file_paths = (
+            sorted(
+                os.path.join(path, file_name)
+                for file_name in os.listdir(path)
+                if file_name.endswith(".parquet")
+            )
+            if os.path.isdir(path)
+            else [path]
+        )
+        for file_path in file_paths:
+            parquet_file = pq.ParquetFile(file_path)
+            for batch in parquet_file.iter_batches(
+                batch_size=chunk_size, columns=columns
+            ):
+                yield batch.to_pandas()
+    except Exception as e:
+        raise CustomException(e, sys)
+
+
+def file_sha256(file_path, chunk_size=1 << 20) -> str:
+    """
+    Compute the sha256 hex digest of a file, reading it in chunks.
+
+    Arg:
+        file_path (str): The path to the file.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def evaluate_model(
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    models,
+    param,
+    search_mode="grid",
+    n_jobs=None,
+    search_config=None,
+    cache=None,
+    measure_inference=False,
+) -> dict:
     """
     Evaluate multiple models on a given dataset and return a dict {model : score}.
     Arg:
@@ -57,11 +220,77 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param) -> dict:
         X_test (array): The features for the testing set.
         y_test (array): The target variable for the testing set.
         models (dict): A dictionary of models to evaluate, where the key is the model model_name and the value is the model object.
+        search_mode (str): "grid" searches every model's grid on 3 shared folds, one
+            model after another.
+            "parallel" spreads every (model, param set, fold) fit over a process pool.
+            "halving" runs a budgeted successive-halving search over all models.
+        n_jobs (int): Number of worker processes in "parallel" mode, defaults to the number of cores.
+        search_config (object): ParallelSearchConfig or HalvingSearchConfig of the chosen mode.
+        cache (EvaluationCache): Optional on-disk memo of fold scores and fitted models;
+            only candidates missing from it are evaluated.
+        measure_inference (bool): Also report each fitted model's single-row and batch
+            prediction latency on X_test and its pickle size, for the selection policies.
 
     Returns:
-        dict: A dictionary containing the model model_name as the key and a dictionary with keys "Train r2 score" and "Test r2 score" as the value.
+        dict: A dictionary containing the model model_name as the key and a dictionary with keys "Train r2 score" and "Test r2 score" as the value,
+            plus "Best params" and "Best estimator", the estimator fitted with them on the full training set.
     """
     try:
+        if search_mode == "parallel":
+            from src.search.parallel import (
+                ParallelSearchConfig,
+                parallel_evaluate_model,
+            )
+
+            return parallel_evaluate_model(
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                models,
+                param,
+                config=search_config or ParallelSearchConfig(n_jobs=n_jobs),
+                cache=cache,
+                measure_inference=measure_inference,
+            )
+        if search_mode == "halving":
+            from src.search.halving import halving_evaluate_model
+
+            return halving_evaluate_model(
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                models,
+                param,
+                config=search_config,
+                cache=cache,
+                measure_inference=measure_inference,
+            )
+        if search_mode != "grid":
+            raise ValueError(f"Unknown search mode {search_mode}")
+        if cache is not None:
+            # Search the candidates one by one through the cache
+            from src.search.cache import cached_evaluate_model
+
+            return cached_evaluate_model(
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                models,
+                param,
+                cache=cache,
+                measure_inference=measure_inference,
+            )
+
+        from sklearn.metrics import r2_score
+        from sklearn.model_selection import ParameterGrid
+        from src.search.candidates import fit_candidate, select_best_params
+        from src.search.folds import FoldStore
+
+        # The folds are sliced once and shared by every candidate of every model
+        fold_store = FoldStore.kfold(X_train, y_train, 3)
         model_scores = {}
         for model_name, model in models.items():
             best_model = None
@@ -70,15 +299,19 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param) -> dict:
                 # Check if there are parameters assigned to model
                 if model_name in param and param[model_name]:
                     logging.info(f"Tuning hyperparameters for {model_name}")
-                    grid_search = GridSearchCV(
-                        estimator=model, param_grid=param[model_name], cv=3
-                    )
-                    grid_search.fit(X_train, y_train)
-
-                    best_model = grid_search.best_estimator_  # Get the best model
-                    best_params = (
-                        grid_search.best_params_
-                    )  # Get the best hyperparameters
+                    # Same folds, mean r2 and tie-breaking as GridSearchCV(cv=3)
+                    candidate_scores = [
+                        (
+                            params,
+                            [
+                                fold_store.score(model, params, fold)
+                                for fold in range(len(fold_store))
+                            ],
+                        )
+                        for params in ParameterGrid(param[model_name])
+                    ]
+                    best_params, _ = select_best_params(candidate_scores)
+                    best_model = fit_candidate(model, best_params, X_train, y_train)
                 else:
                     logging.info(
                         f"No hyperparameters specified for {model_name}. Using default model."
@@ -100,9 +333,14 @@ def evaluate_model(X_train, y_train, X_test, y_test, models, param) -> dict:
                 # concentate the rest of the model score
                 model_scores[model_name] = {
                     "Best params": best_params,
+                    "Best estimator": best_model,
                     "Train r2 score": train_score,
                     "Test r2 score": test_score,
                 }
+                if measure_inference:
+                    from src.search.selection import measure_inference as measure
+
+                    model_scores[model_name].update(measure(best_model, X_test))
             except Exception as e:
                 logging.error(
                     f"Error occurred while evaluating model {model_name}: {e}"
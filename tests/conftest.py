@@ -0,0 +1,38 @@
+import os
+import tempfile
+import pytest
+
+# The logger is configured when src is first imported, keep its files out of the tree
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="student-performance-logs-"))
+
+
+@pytest.fixture(scope="session")
+def students():
+    """
+    Synthetic student records as read from the CSV: categories as strings, scores as
+    numbers.
+    """
+    from benchmarks.synthetic_data import CATEGORICAL_COLUMNS, generate_students
+
+    df = generate_students(600, seed=0)
+    return df.astype({column: object for column in CATEGORICAL_COLUMNS})
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch, students):
+    """
+    A project directory, made the working directory, with the serving artifacts of a
+    linear model fitted on the students: artifacts/preprocessing.pkl and model.pkl.
+    """
+    from sklearn.linear_model import LinearRegression
+    from src.component.data_transformation import DataTransformation
+    from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+    from src.utils import save_object
+
+    monkeypatch.chdir(tmp_path)
+    preprocessor = DataTransformation().get_data_transformer()
+    X = preprocessor.fit_transform(students[FEATURE_COLUMNS])
+    model = LinearRegression().fit(X, students["math_score"])
+    save_object(os.path.join("artifacts", "preprocessing.pkl"), preprocessor)
+    save_object(os.path.join("artifacts", "model.pkl"), model)
+    return tmp_path
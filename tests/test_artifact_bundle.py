@@ -0,0 +1,107 @@
+import logging
+import os
+import numpy as np
+from src.artifact_bundle import (
+    CURRENT_FILE,
+    ArtifactBundleConfig,
+    current_bundle_dir,
+    load_bundle_object,
+    prune_bundles,
+    write_bundle,
+)
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+from src.utils import load_object, save_object
+
+
+def bundle_names(config) -> set:
+    return {name for name in os.listdir(config.bundle_root) if name != CURRENT_FILE}
+
+
+def test_keeps_the_newest_bundles(tmp_path):
+    config = ArtifactBundleConfig(bundle_root=str(tmp_path), keep_bundles=2)
+    bundle_dirs = [
+        write_bundle({"model": np.full(10, version)}, config=config)
+        for version in range(4)
+    ]
+
+    assert bundle_names(config) == {os.path.basename(d) for d in bundle_dirs[2:]}
+    assert current_bundle_dir(config) == bundle_dirs[-1]
+    assert load_bundle_object(bundle_dirs[-1], "model")[0] == 3
+
+
+def test_never_deletes_the_current_bundle(tmp_path):
+    config = ArtifactBundleConfig(bundle_root=str(tmp_path), keep_bundles=None)
+    bundle_dirs = [
+        write_bundle({"model": np.full(10, version)}, config=config)
+        for version in range(4)
+    ]
+    # Rolled back to the oldest bundle
+    with open(tmp_path / CURRENT_FILE, "w") as file_obj:
+        file_obj.write(os.path.basename(bundle_dirs[0]))
+
+    config.keep_bundles = 1
+    deleted = prune_bundles(config)
+
+    assert sorted(deleted) == sorted(bundle_dirs[1:3])
+    assert bundle_names(config) == {
+        os.path.basename(bundle_dirs[0]),
+        os.path.basename(bundle_dirs[3]),
+    }
+
+
+def retrain(config):
+    """
+    Save a new model.pkl, as a training run does.
+    """
+    model = load_object(config.model_path)
+    model.intercept_ += 1.0
+    save_object(config.model_path, model)
+    return model
+
+
+def test_training_without_a_bundle_retires_the_current_one(project_dir, students):
+    from src.component.model_trainer import ModelTrainer
+
+    cache_config = ArtifactCacheConfig(check_interval=0)
+    objects = {
+        "model": load_object(cache_config.model_path),
+        "preprocessor": load_object(cache_config.preprocessor_path),
+    }
+    write_bundle(objects, config=ArtifactBundleConfig())
+    cache = ArtifactCache(cache_config)
+    assert cache.get().manifest is not None
+
+    trainer = ModelTrainer()
+    trainer.model_trainer_config.write_bundle = False
+    trainer.model_trainer_config.build_prediction_table = False
+    model = retrain(cache_config)
+    X = objects["preprocessor"].transform(students[FEATURE_COLUMNS])
+    y = students["math_score"]
+    trainer.publish_model(model, {}, X, y, X, y)
+
+    assert current_bundle_dir(ArtifactBundleConfig()) is None
+    snapshot = cache.get()
+    assert snapshot.manifest is None
+    np.testing.assert_allclose(snapshot.model.predict(X[:5]), model.predict(X[:5]))
+
+
+def test_newer_pkl_files_than_the_bundle_are_reported(project_dir, caplog):
+    cache_config = ArtifactCacheConfig(check_interval=0)
+    write_bundle(
+        {
+            "model": load_object(cache_config.model_path),
+            "preprocessor": load_object(cache_config.preprocessor_path),
+        },
+        config=ArtifactBundleConfig(),
+    )
+    cache = ArtifactCache(cache_config)
+    cache.get()
+    retrain(cache_config)
+
+    with caplog.at_level(logging.WARNING):
+        cache.get()
+        cache.get()
+    warnings = [r for r in caplog.records if "newer than the artifact" in r.message]
+    assert len(warnings) == 1
+    assert cache.get().manifest is not None
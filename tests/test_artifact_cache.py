@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pytest
+from src.component.compiled_preprocessor import compile_preprocessor
+from src.component.model_export import export_model
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+from src.utils import file_sha256, load_object, save_object
+
+
+def make_cache(**kwargs) -> ArtifactCache:
+    return ArtifactCache(ArtifactCacheConfig(use_bundle=False, **kwargs))
+
+
+def retrain(config):
+    """
+    Save a new model.pkl, as a training run does.
+    """
+    model = load_object(config.model_path)
+    model.intercept_ += 1.0
+    save_object(config.model_path, model)
+    return model
+
+
+def test_reloads_when_an_artifact_changes(project_dir):
+    cache = make_cache(check_interval=0)
+    first = cache.get()
+    assert first.version == 1
+
+    # Same content, new mtime: no reload
+    os.utime(cache.cache_config.model_path, ns=(0, 0))
+    assert cache.get().version == 1
+
+    model = retrain(cache.cache_config)
+    snapshot = cache.get()
+    assert snapshot.version == 2
+    assert snapshot.model.intercept_ == model.intercept_
+    # The previous snapshot is left untouched for the requests holding it
+    assert first.model.intercept_ == model.intercept_ - 1.0
+
+
+def test_no_reload_within_the_check_interval(project_dir):
+    cache = make_cache(check_interval=3600)
+    first = cache.get()
+    retrain(cache.cache_config)
+
+    assert cache.get() is first
+    assert cache.reload().version == 2
+
+
+def test_stale_derived_artifacts_are_dropped(project_dir, students):
+    cache = make_cache(check_interval=0)
+    config = cache.cache_config
+    preprocessor = load_object(config.preprocessor_path)
+    save_object(
+        config.compiled_model_path,
+        export_model(
+            load_object(config.model_path),
+            source_sha256=file_sha256(config.model_path),
+        ),
+    )
+    save_object(
+        config.compiled_preprocessor_path,
+        compile_preprocessor(preprocessor, source_sha256="an older preprocessor"),
+    )
+    snapshot = cache.get()
+    assert snapshot.compiled_model is not None
+    assert snapshot.model is snapshot.compiled_model
+    assert snapshot.compiled_preprocessor is None
+
+    # Retrained without exporting: the compiled model is not the model any more
+    model = retrain(config)
+    snapshot = cache.get()
+    assert snapshot.compiled_model is None
+    X = preprocessor.transform(students[FEATURE_COLUMNS].head(5))
+    np.testing.assert_array_equal(snapshot.model.predict(X), model.predict(X))
+
+
+def test_deferred_preprocessor_loaded_on_first_use(project_dir):
+    cache = make_cache(check_interval=0)
+    config = cache.cache_config
+    save_object(
+        config.compiled_preprocessor_path,
+        compile_preprocessor(
+            load_object(config.preprocessor_path),
+            source_sha256=file_sha256(config.preprocessor_path),
+        ),
+    )
+    snapshot = cache.get()
+    assert "preprocessor" not in snapshot.objects
+    assert "preprocessor" not in snapshot.load_times
+
+    preprocessor = snapshot.preprocessor
+    assert snapshot.objects["preprocessor"] is preprocessor
+    assert "preprocessor" in snapshot.load_times
+    assert snapshot.preprocessor is preprocessor
+
+
+def test_deferred_preprocessor_replaced_before_first_use(project_dir):
+    cache = make_cache(check_interval=0)
+    config = cache.cache_config
+    preprocessor = load_object(config.preprocessor_path)
+    save_object(
+        config.compiled_preprocessor_path,
+        compile_preprocessor(
+            preprocessor, source_sha256=file_sha256(config.preprocessor_path)
+        ),
+    )
+    snapshot = cache.get()
+    preprocessor.sparse_threshold = 0.5
+    save_object(config.preprocessor_path, preprocessor)
+
+    # Not served with the other artifacts of the snapshot, the next one serves it
+    with pytest.raises(ValueError, match="changed since the snapshot was loaded"):
+        snapshot.preprocessor
+    snapshot = cache.get()
+    assert snapshot.version == 2
+    assert snapshot.preprocessor.sparse_threshold == 0.5
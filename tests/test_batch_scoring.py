@@ -0,0 +1,45 @@
+import json
+import numpy as np
+import pandas as pd
+from src.pipeline.artifact_cache import ArtifactCache
+from src.pipeline.batch_scoring import BatchScoring, BatchScoringConfig, iter_chunks
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS, PredictionPipeline
+
+
+def test_iter_chunks_resumes_at_a_chunk(tmp_path, students):
+    path = str(tmp_path / "students.csv")
+    students.to_csv(path, index=False)
+    chunks = list(iter_chunks(path, 100, start_chunk=4))
+    assert [index for index, _ in chunks] == [4, 5]
+    pd.testing.assert_frame_equal(
+        chunks[0][1].reset_index(drop=True),
+        pd.read_csv(path).iloc[400:500].reset_index(drop=True),
+    )
+
+
+def test_invalid_rows_are_reported_not_fatal(project_dir, students):
+    records = students.astype({"writing_score": object})
+    records.loc[5, "writing_score"] = "n/a"
+    records.loc[150, "gender"] = "unknown"
+    records.loc[151, "reading_score"] = 250
+    records.to_csv("students.csv", index=False)
+
+    summary = BatchScoring(
+        BatchScoringConfig(
+            input_path="students.csv", output_path="scored.csv", chunk_size=100
+        )
+    ).initiate_batch_scoring()
+    assert summary["rows"] == len(students)
+    assert summary["invalid_rows"] == summary["total_invalid_rows"] == 3
+
+    scored = pd.read_csv("scored.csv")
+    invalid = scored["predicted_math_score"].isna()
+    assert sorted(np.flatnonzero(invalid)) == [5, 150, 151]
+    expected = PredictionPipeline(ArtifactCache()).predict_batch(
+        students[FEATURE_COLUMNS]
+    )
+    np.testing.assert_allclose(
+        scored["predicted_math_score"][~invalid], expected[~invalid]
+    )
+    with open("scored.csv.progress.json") as file_obj:
+        assert json.load(file_obj)["invalid_rows"] == 3
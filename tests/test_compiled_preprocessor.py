@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.component.compiled_preprocessor import compile_preprocessor
+from src.component.data_transformation import DataTransformation
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+from src.exception import CustomException
+
+
+def fitted_preprocessor(students, dtype="float64", sparse=False):
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.feature_dtype, config.sparse_features = dtype, sparse
+    features = students[FEATURE_COLUMNS].copy()
+    # Fitted with missing values, as the imputers see them in the raw export
+    features.loc[::7, "reading_score"] = np.nan
+    features.loc[::11, "test_preparation_course"] = np.nan
+    return transformation.get_data_transformer().fit(features)
+
+
+def sklearn_transform(preprocessor, records) -> np.ndarray:
+    """
+    The sklearn preprocessor on records as served in a batch: None normalized to NaN,
+    which is all the imputers recognise (see validate_batch).
+    """
+    df = pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS)
+    df = df.astype(object).where(df.notna(), np.nan)
+    for column in ("writing_score", "reading_score"):
+        df[column] = pd.to_numeric(df[column])
+    output = preprocessor.transform(df)
+    return output.toarray() if hasattr(output, "toarray") else output
+
+
+def edge_records(students) -> list:
+    records = students[FEATURE_COLUMNS].head(20).to_dict(orient="records")
+    records[0]["writing_score"] = None
+    records[1]["reading_score"] = np.nan
+    records[2]["test_preparation_course"] = None
+    records[3]["test_preparation_course"] = np.nan
+    records[4]["gender"] = None
+    records[5]["lunch"] = np.nan
+    records[6].update(writing_score=np.nan, reading_score=None, race_ethnicity=None)
+    return records
+
+
+@pytest.mark.parametrize(
+    "dtype, sparse", [("float64", False), ("float32", False), ("float32", True)]
+)
+def test_matches_sklearn_with_missing_values(students, dtype, sparse):
+    preprocessor = fitted_preprocessor(students, dtype, sparse)
+    compiled = compile_preprocessor(preprocessor)
+    records = edge_records(students)
+
+    expected = sklearn_transform(preprocessor, records)
+    actual = compiled.transform(records)
+    assert actual.dtype == expected.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(actual, expected)
+    for record, row in zip(records, expected):
+        np.testing.assert_array_equal(compiled.transform_record(record)[0], row)
+
+
+def test_unknown_category_fails_like_sklearn(students):
+    preprocessor = fitted_preprocessor(students)
+    compiled = compile_preprocessor(preprocessor)
+    record = dict(edge_records(students)[10], race_ethnicity="group Z")
+
+    with pytest.raises(ValueError, match="unknown categor"):
+        sklearn_transform(preprocessor, [record])
+    with pytest.raises(ValueError, match="unknown category"):
+        compiled.transform_record(record)
+
+
+def test_ignored_unknown_category_matches_sklearn(students):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    categorical = [column for column in FEATURE_COLUMNS if "score" not in column]
+    preprocessor = ColumnTransformer(
+        [
+            (
+                "numerical_pipeline",
+                Pipeline([("imputer", SimpleImputer()), ("scaler", StandardScaler())]),
+                ["writing_score", "reading_score"],
+            ),
+            (
+                "categorical_pipeline",
+                Pipeline(
+                    [
+                        ("imputer", SimpleImputer(strategy="most_frequent")),
+                        ("one_hot_encoder", OneHotEncoder(handle_unknown="ignore")),
+                        ("scaler", StandardScaler(with_mean=False)),
+                    ]
+                ),
+                categorical,
+            ),
+        ]
+    ).fit(students[FEATURE_COLUMNS])
+    compiled = compile_preprocessor(preprocessor)
+    records = edge_records(students)
+    records[8]["gender"] = "unknown"
+    records[9].update(lunch="free", parental_level_of_education="doctorate")
+
+    np.testing.assert_array_equal(
+        compiled.transform(records), sklearn_transform(preprocessor, records)
+    )
+
+
+def test_uncompilable_step_is_rejected(students):
+    from sklearn.preprocessing import MinMaxScaler
+
+    preprocessor = fitted_preprocessor(students)
+    preprocessor.transformers_[0][1].steps[1] = ("scaler", MinMaxScaler())
+    with pytest.raises(CustomException, match="Cannot compile step"):
+        compile_preprocessor(preprocessor)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from src.component.data_ingestion import DataIngestion, hash_split_mask
+from src.component.data_transformation import DataTransformation
+from src.utils import load_array, read_dataframe
+
+
+def test_hash_split_mask_bounds(students):
+    assert hash_split_mask(students, 1.0, "student-split-42").all()
+    assert not hash_split_mask(students, 0.0, "student-split-42").any()
+    fraction = hash_split_mask(students, 0.3, "student-split-42").mean()
+    assert 0.2 < fraction < 0.4
+
+
+def test_streaming_ingestion_keeps_rows_missing_a_score(project_dir, students):
+    source = students.astype({"reading_score": object})
+    source.loc[[3, 10], "reading_score"] = None
+    source.to_csv("stud.csv", index=False)
+
+    ingestion = DataIngestion()
+    config = ingestion.ingestion_config
+    config.source_data_path, config.streaming, config.chunk_size = "stud.csv", True, 250
+    train_path, test_path = ingestion.initiate_data_ingestion()
+    ingested = pd.concat([read_dataframe(train_path), read_dataframe(test_path)])
+    assert len(ingested) == len(students)
+    assert ingested["reading_score"].isna().sum() == 2
+
+    # The numerical imputer fills them
+    (train_features, _), _, _ = DataTransformation().initiate_data_transformation(
+        train_path, test_path
+    )
+    assert np.isfinite(load_array(train_features)).all()
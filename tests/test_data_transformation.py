@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from src.component.data_transformation import DataTransformation
+from src.component.incremental_preprocessor import fit_preprocessor_incrementally
+from src.component.numeric_mode import is_sparse
+from src.exception import CustomException
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+
+
+def test_incremental_transformation_rejects_an_empty_set(project_dir, students):
+    students.to_csv("train.csv", index=False)
+    students.head(0).to_csv("test.csv", index=False)
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.incremental, config.chunk_size = True, 200
+    with pytest.raises(CustomException, match="test.csv has no rows"):
+        transformation.initiate_data_transformation("train.csv", "test.csv")
+
+
+def chunks_of(df, chunk_size):
+    return (df.iloc[i : i + chunk_size] for i in range(0, len(df), chunk_size))
+
+
+@pytest.mark.parametrize(
+    "dtype, sparse", [("float64", False), ("float32", False), ("float32", True)]
+)
+@pytest.mark.parametrize("chunk_size", [1, 7, 128, 600])
+def test_incremental_fit_matches_fit(students, dtype, sparse, chunk_size):
+    features = students[FEATURE_COLUMNS].copy()
+    features.loc[::7, "reading_score"] = np.nan
+    features.loc[::5, "writing_score"] = np.nan
+    features.loc[::11, "test_preparation_course"] = np.nan
+    features.loc[::13, "gender"] = np.nan
+    # A category first seen in the last chunks
+    features.loc[590:, "parental_level_of_education"] = "doctorate"
+
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.feature_dtype, config.sparse_features = dtype, sparse
+    expected = transformation.get_data_transformer().fit(features)
+    actual = fit_preprocessor_incrementally(
+        transformation.get_data_transformer(), chunks_of(features, chunk_size)
+    )
+
+    expected_output = expected.transform(features)
+    actual_output = actual.transform(features)
+    assert is_sparse(actual_output) == is_sparse(expected_output) == sparse
+    assert actual_output.dtype == expected_output.dtype == np.dtype(dtype)
+    if sparse:
+        expected_output, actual_output = (
+            expected_output.toarray(),
+            actual_output.toarray(),
+        )
+    np.testing.assert_allclose(
+        actual_output,
+        expected_output,
+        rtol=0,
+        atol=1e-12 if dtype == "float64" else 1e-5,
+    )
+    assert list(actual.get_feature_names_out()) == list(
+        expected.get_feature_names_out()
+    )
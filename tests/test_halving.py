@@ -0,0 +1,34 @@
+from benchmarks.suite import search_candidates
+from src.component.data_transformation import DataTransformation
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+from src.search.selection import select_model
+from src.utils import evaluate_model
+
+
+def test_halving_selects_the_grid_best_model(students):
+    train, test = students.iloc[:480], students.iloc[480:]
+    preprocessor = DataTransformation().get_data_transformer()
+    X_train = preprocessor.fit_transform(train[FEATURE_COLUMNS])
+    X_test = preprocessor.transform(test[FEATURE_COLUMNS])
+    models, params = search_candidates()
+
+    reports = {
+        search_mode: evaluate_model(
+            X_train,
+            train["math_score"],
+            X_test,
+            test["math_score"],
+            models=models,
+            param=params,
+            search_mode=search_mode,
+        )
+        for search_mode in ("grid", "halving")
+    }
+
+    assert list(reports["halving"]) == list(reports["grid"]) == list(models)
+    assert select_model(reports["halving"]) == select_model(reports["grid"])
+    # A model without a grid is fitted alike by both modes
+    assert (
+        reports["halving"]["Linear Regression"]["Test r2 score"]
+        == reports["grid"]["Linear Regression"]["Test r2 score"]
+    )
@@ -0,0 +1,74 @@
+import logging
+import queue
+import threading
+import time
+from src.logger import DroppingQueueListener, SamplingFilter
+
+
+def make_record(message, lineno=10, **extra):
+    record = logging.LogRecord(
+        "werkzeug", logging.INFO, "serving.py", lineno, message, None, None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_formatted_messages_of_one_call_site_are_sampled_together():
+    sampling_filter = SamplingFilter({"werkzeug": 10})
+    kept = [
+        sampling_filter.filter(make_record(f"GET /predict_data {i} ms"))
+        for i in range(100)
+    ]
+    assert sum(kept) == 10
+    assert len(sampling_filter._counts) == 1
+
+
+def test_sample_key_and_bounded_counts():
+    sampling_filter = SamplingFilter({"werkzeug": 2}, max_keys=5)
+    for i in range(50):
+        sampling_filter.filter(make_record("request", lineno=i))
+        assert len(sampling_filter._counts) <= 5
+    keyed = [
+        sampling_filter.filter(make_record(f"row {i}", lineno=i, sample_key="rows"))
+        for i in range(4)
+    ]
+    assert keyed == [True, False, True, False]
+
+
+def test_warnings_are_never_sampled():
+    sampling_filter = SamplingFilter({"werkzeug": 100})
+    record = make_record("slow request")
+    record.levelno = logging.WARNING
+    assert all(sampling_filter.filter(record) for _ in range(5))
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.unblock = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        self.started.set()
+        self.unblock.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def test_stop_with_a_full_queue_drops_the_oldest_records():
+    handler = BlockingHandler()
+    log_queue = queue.Queue(maxsize=2)
+    listener = DroppingQueueListener(log_queue, handler, stop_timeout=0.05)
+    listener.start()
+    log_queue.put_nowait(make_record("first"))
+    assert handler.started.wait(5)
+    # The writer is stuck on the first record, the queue fills up
+    for message in ("second", "third"):
+        log_queue.put_nowait(make_record(message))
+
+    threading.Timer(0.2, handler.unblock.set).start()
+    start = time.monotonic()
+    listener.stop()
+    assert time.monotonic() - start < 2
+    assert listener.dropped == 1
+    assert handler.messages == ["first", "third"]
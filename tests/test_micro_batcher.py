@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
+import pytest
+from src.pipeline.micro_batcher import MicroBatcher, MicroBatcherConfig
+
+
+class DoublingPipeline:
+    def predict_records(self, records):
+        return np.array([2.0 * record["value"] for record in records])
+
+
+class BlockingPipeline(DoublingPipeline):
+    def __init__(self):
+        self.called = threading.Event()
+        self.release = threading.Event()
+
+    def predict_records(self, records):
+        self.called.set()
+        self.release.wait(5)
+        return super().predict_records(records)
+
+
+def test_predict_times_out_when_the_worker_stalls():
+    pipeline = BlockingPipeline()
+    batcher = MicroBatcher(pipeline).start()
+    with pytest.raises(FutureTimeoutError):
+        batcher.predict({"value": 1}, timeout=0.05)
+    pipeline.release.set()
+    assert batcher.predict({"value": 2}, timeout=5) == 4.0
+    batcher.stop(timeout=5)
+
+
+@pytest.mark.parametrize("invalid", [False, True])
+def test_cancelled_future_in_a_batch_is_skipped(invalid):
+    pipeline = BlockingPipeline()
+    batcher = MicroBatcher(
+        pipeline, MicroBatcherConfig(max_batch_size=5, max_wait_ms=500)
+    ).start()
+    first = batcher.submit({"value": 0})
+    # The worker is scoring the first batch while the next one is queued
+    assert pipeline.called.wait(5)
+    values = [1, 2, 3, None if invalid else 4, 5]
+    futures = [batcher.submit({"value": value}) for value in values]
+    assert futures[2].cancel()
+    pipeline.release.set()
+
+    assert first.result(timeout=5) == 0.0
+    assert [futures[i].result(timeout=5) for i in (0, 1, 4)] == [2.0, 4.0, 10.0]
+    assert futures[2].cancelled()
+    if invalid:
+        with pytest.raises(TypeError):
+            futures[3].result(timeout=5)
+    else:
+        assert futures[3].result(timeout=5) == 8.0
+    assert batcher.predict({"value": 6}, timeout=5) == 12.0
+    assert batcher.get_stats()["failures"] == int(invalid)
+    batcher.stop(timeout=5)
+
+
+def test_stop_does_not_block_on_a_full_queue():
+    pipeline = BlockingPipeline()
+    batcher = MicroBatcher(
+        pipeline, MicroBatcherConfig(max_batch_size=1, max_queue_size=2)
+    ).start()
+    first = batcher.submit({"value": 0})
+    assert pipeline.called.wait(5)
+    queued = [batcher.submit({"value": value}) for value in (1, 2)]
+
+    start = time.monotonic()
+    batcher.stop(timeout=0.1)
+    assert time.monotonic() - start < 2
+    pipeline.release.set()
+    assert [f.result(timeout=5) for f in [first, *queued]] == [0.0, 2.0, 4.0]
+
+
+def test_stop_scores_queued_records_and_start_restarts():
+    batcher = MicroBatcher(DoublingPipeline()).start()
+    futures = [batcher.submit({"value": value}) for value in range(5)]
+    batcher.stop(timeout=5)
+    assert [future.result(timeout=0) for future in futures] == [0, 2, 4, 6, 8]
+    assert batcher.predict({"value": 4}, timeout=5) == 8.0
+    batcher.stop(timeout=5)
+
+
+def test_restarts_in_a_forked_child():
+    batcher = MicroBatcher(DoublingPipeline()).start()
+    assert batcher.predict({"value": 1}, timeout=5) == 2.0
+    # As the prefork master does before forking its workers
+    batcher.stop(timeout=5)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            batcher.start()
+            os._exit(0 if batcher.predict({"value": 3}, timeout=5) == 6.0 else 1)
+        except BaseException:
+            os._exit(1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
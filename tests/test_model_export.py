@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pytest
+from src.component.data_transformation import DataTransformation
+from src.component.model_export import export_model, verify_exported_model
+from src.component.model_trainer import ModelTrainer
+from src.exception import CustomException
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+
+
+def get_supported_models() -> dict:
+    """
+    {model name: (unfitted estimator, maximum difference of the export)}. XGBoost
+    sums its trees in float32 (relative error ~1e-7 of scores up to 100), the other
+    exports reproduce the float64 sums.
+    """
+    from catboost import CatBoostRegressor
+    from sklearn.ensemble import (
+        ExtraTreesRegressor,
+        GradientBoostingRegressor,
+        RandomForestRegressor,
+    )
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.tree import DecisionTreeRegressor
+    from xgboost import XGBRegressor
+
+    return {
+        "Linear Regression": (LinearRegression(), 1e-10),
+        "Ridge": (Ridge(), 1e-10),
+        "Decision Tree": (DecisionTreeRegressor(random_state=0), 1e-10),
+        "Random Forest": (RandomForestRegressor(20, random_state=0), 1e-10),
+        "Extra Trees": (ExtraTreesRegressor(20, random_state=0), 1e-10),
+        "Gradient Boosting": (GradientBoostingRegressor(random_state=0), 1e-10),
+        "XGBoost": (XGBRegressor(n_estimators=50, random_state=0), 1e-4),
+        "CatBoost": (
+            CatBoostRegressor(iterations=50, verbose=False, allow_writing_files=False),
+            1e-10,
+        ),
+    }
+
+
+@pytest.fixture(scope="module")
+def features(students):
+    preprocessor = DataTransformation().get_data_transformer()
+    return preprocessor.fit_transform(students[FEATURE_COLUMNS]), students["math_score"]
+
+
+@pytest.mark.parametrize("model_name", list(get_supported_models()))
+def test_export_matches_the_model(features, model_name):
+    model, atol = get_supported_models()[model_name]
+    X, y = features
+    model.fit(X, y)
+
+    exported = export_model(model, source_sha256="sha")
+    assert exported.source_sha256 == "sha"
+    np.testing.assert_allclose(
+        exported.predict(X), np.ravel(model.predict(X)), rtol=0, atol=atol
+    )
+    assert verify_exported_model(exported, model, X, atol=atol) <= atol
+
+
+@pytest.mark.parametrize("model_name", ["AdaBoost", "K-Nearest Neighbors"])
+def test_unsupported_models_are_rejected(features, model_name):
+    from src.component.model_trainer import get_models
+
+    model = get_models()[model_name].fit(*features)
+    with pytest.raises(CustomException, match="is not supported"):
+        export_model(model)
+
+
+@pytest.mark.parametrize("model_name", ["AdaBoost", "K-Nearest Neighbors"])
+def test_publish_serves_the_original_unsupported_model(
+    project_dir, students, model_name
+):
+    from src.component.model_trainer import get_models
+    from src.utils import load_object
+
+    cache_config = ArtifactCacheConfig(use_bundle=False)
+    preprocessor = load_object(cache_config.preprocessor_path)
+    X = preprocessor.transform(students[FEATURE_COLUMNS])
+    y = students["math_score"]
+    model = get_models()[model_name].fit(X, y)
+
+    trainer = ModelTrainer()
+    trainer.model_trainer_config.build_prediction_table = False
+    trainer.model_trainer_config.write_bundle = False
+    trainer.publish_model(model, {}, X, y, X, y)
+
+    assert not os.path.exists(cache_config.compiled_model_path)
+    served = ArtifactCache(cache_config).get().model
+    assert type(served) is type(model)
+    np.testing.assert_array_equal(served.predict(X[:10]), model.predict(X[:10]))
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from src.component.compiled_preprocessor import compile_preprocessor
+from src.component.data_transformation import DataTransformation
+from src.component.numeric_mode import densify_for, is_sparse
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS, PredictionPipeline
+from src.utils import file_sha256, save_object
+
+
+def get_models():
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.linear_model import LinearRegression
+    from xgboost import XGBRegressor
+
+    return {
+        "Linear Regression": LinearRegression(),
+        "Gradient Boosting": GradientBoostingRegressor(n_estimators=20, random_state=0),
+        "XGBoost": XGBRegressor(n_estimators=20, random_state=0),
+    }
+
+
+@pytest.mark.parametrize("model_name", list(get_models()))
+def test_sparse_batch_matches_compiled_single_records(tmp_path, students, model_name):
+    """
+    A model trained on sparse float32 features scores a batch (sparse, sklearn
+    preprocessor) and single records (dense, compiled preprocessor) alike.
+    """
+    transformation = DataTransformation()
+    config = transformation.data_transformation_config
+    config.feature_dtype, config.sparse_features = "float32", True
+    preprocessor = transformation.get_data_transformer()
+    features = students[FEATURE_COLUMNS]
+    X = preprocessor.fit_transform(features)
+    assert is_sparse(X)
+
+    # Trained as the trainer trains it
+    model = get_models()[model_name]
+    model.fit(densify_for(model, X), students["math_score"])
+
+    preprocessor_path = str(tmp_path / "preprocessing.pkl")
+    save_object(preprocessor_path, preprocessor)
+    save_object(str(tmp_path / "model.pkl"), model)
+    save_object(
+        str(tmp_path / "compiled_preprocessing.pkl"),
+        compile_preprocessor(
+            preprocessor, source_sha256=file_sha256(preprocessor_path)
+        ),
+    )
+    pipeline = PredictionPipeline(
+        ArtifactCache(
+            ArtifactCacheConfig(
+                model_path=str(tmp_path / "model.pkl"),
+                preprocessor_path=preprocessor_path,
+                compiled_preprocessor_path=str(tmp_path / "compiled_preprocessing.pkl"),
+                compiled_model_path=str(tmp_path / "compiled_model.pkl"),
+                prediction_table_path=str(tmp_path / "prediction_table.npy"),
+                use_bundle=False,
+            )
+        )
+    )
+    assert pipeline.artifact_cache.get().compiled_preprocessor is not None
+
+    batch = pipeline.predict_batch(features)
+    records = features.to_dict(orient="records")
+    np.testing.assert_allclose(pipeline.predict_records(records), batch, atol=1e-4)
+    np.testing.assert_allclose(
+        [pipeline.predict_record(record) for record in records[:20]],
+        batch[:20],
+        atol=1e-4,
+    )
@@ -0,0 +1,45 @@
+import numpy as np
+from src.component.data_transformation import DataTransformation
+from src.pipeline.prediction_pipeline import FEATURE_COLUMNS
+from src.search.parallel import ParallelSearchConfig, parallel_evaluate_model
+
+
+def test_refitted_models_keep_their_thread_params(students):
+    from catboost import CatBoostRegressor
+    from sklearn.ensemble import RandomForestRegressor
+    from xgboost import XGBRegressor
+
+    train, test = students.iloc[:480], students.iloc[480:]
+    preprocessor = DataTransformation().get_data_transformer()
+    X_train = preprocessor.fit_transform(train[FEATURE_COLUMNS])
+    X_test = preprocessor.transform(test[FEATURE_COLUMNS])
+    models = {
+        "Random Forest": RandomForestRegressor(n_estimators=8, random_state=0),
+        "XGBoost": XGBRegressor(n_estimators=8, n_jobs=3),
+        "CatBoost": CatBoostRegressor(
+            iterations=8, thread_count=3, verbose=False, allow_writing_files=False
+        ),
+    }
+    params = {
+        "Random Forest": {"max_depth": [4, None]},
+        "XGBoost": {"learning_rate": [0.1, 0.3]},
+        "CatBoost": {},
+    }
+
+    # One thread per worker during the search
+    report = parallel_evaluate_model(
+        X_train,
+        train["math_score"],
+        X_test,
+        test["math_score"],
+        models,
+        params,
+        config=ParallelSearchConfig(n_jobs=2, max_threads=2),
+    )
+
+    expected = {"Random Forest": None, "XGBoost": 3, "CatBoost": 3}
+    for model_name, threads in expected.items():
+        model = report[model_name]["Best estimator"]
+        thread_param = "thread_count" if model_name == "CatBoost" else "n_jobs"
+        assert model.get_params()[thread_param] == threads
+        assert np.isfinite(model.predict(X_test)).all()
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from src.component.prediction_table import PredictionTable, save_prediction_table
+from src.pipeline.artifact_cache import ArtifactCache, ArtifactCacheConfig
+from src.utils import file_sha256, load_object, save_object
+
+
+def small_table(predictions, config) -> PredictionTable:
+    return PredictionTable(
+        categorical_columns=["gender"],
+        categories=[["female", "male"]],
+        numerical_columns=["writing_score"],
+        score_range=(0, 2),
+        fill_values={"gender": "female", "writing_score": 1},
+        predictions=np.asarray(predictions, dtype="float32"),
+        source_sha256=file_sha256(config.model_path),
+        preprocessor_sha256=file_sha256(config.preprocessor_path),
+    )
+
+
+def test_table_reloaded_after_a_reload_between_its_two_files(project_dir, monkeypatch):
+    config = ArtifactCacheConfig(check_interval=0, use_bundle=False)
+    cache = ArtifactCache(config)
+    save_prediction_table(
+        small_table(np.zeros(6), config), config.prediction_table_path
+    )
+    assert cache.get().prediction_table.predictions[0] == 0.0
+
+    # Retrained: the new model is saved, then its table
+    model = load_object(config.model_path)
+    model.intercept_ += 1.0
+    save_object(config.model_path, model)
+
+    replaced, os_replace = [], os.replace
+
+    def reload_after_replace(src, dst):
+        os_replace(src, dst)
+        # A server checking its artifacts between the two writes
+        replaced.append((os.path.basename(dst), cache.reload().prediction_table))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "replace", reload_after_replace)
+        save_prediction_table(
+            small_table(np.ones(6), config), config.prediction_table_path
+        )
+
+    # New predictions under the old metadata: stale for the new model, not served
+    assert [name for name, _ in replaced] == [
+        "prediction_table.npy",
+        "prediction_table.json",
+    ]
+    assert replaced[0][1] is None
+    table = cache.get().prediction_table
+    assert table is not None
+    np.testing.assert_array_equal(table.predictions, 1.0)
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+import pytest
+from scipy import sparse
+from src.exception import CustomException
+from src.utils import load_array, load_object, save_array, save_object
+
+
+class Unpicklable:
+    def __reduce__(self):
+        raise TypeError("cannot pickle")
+
+
+def test_failed_save_keeps_the_previous_file(tmp_path):
+    file_path = str(tmp_path / "model.pkl")
+    save_object(file_path, {"version": 1})
+    with pytest.raises(CustomException, match="cannot pickle"):
+        save_object(file_path, Unpicklable())
+
+    assert load_object(file_path) == {"version": 1}
+    assert os.listdir(tmp_path) == ["model.pkl"]
+
+
+def test_save_array_round_trip(tmp_path):
+    dense = np.arange(12, dtype=np.float32).reshape(3, 4)
+    matrix = sparse.random(5, 4, density=0.3, format="csr", random_state=0)
+
+    dense_path = save_array(str(tmp_path / "dense.npy"), dense)
+    sparse_path = save_array(str(tmp_path / "features.npy"), matrix)
+
+    assert sparse_path.endswith("features.npz")
+    np.testing.assert_array_equal(load_array(dense_path), dense)
+    np.testing.assert_array_equal(load_array(sparse_path).toarray(), matrix.toarray())
+    assert sorted(os.listdir(tmp_path)) == ["dense.npy", "features.npz"]